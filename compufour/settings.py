@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from core.logs import niveis_por_modulo
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +52,8 @@ X_FRAME_OPTIONS = "SAMEORIGIN"
 SILENCED_SYSTEM_CHECKS = ["security.W019"]
 
 MIDDLEWARE = [
+    "core.middleware.MetricasMiddleware",
+    "core.middleware.CadastrosReferenciaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -56,6 +61,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ConsultasPorRequisicaoMiddleware",
+    "core.middleware.RastreamentoSinaisMiddleware",
+    "core.middleware.PerfilSobDemandaMiddleware",
 ]
 
 ROOT_URLCONF = "compufour.urls"
@@ -85,7 +93,9 @@ WSGI_APPLICATION = "compufour.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        # COMPUFOUR_DB permite apontar para outro arquivo (ex.: a massa de
+        # manage.py generate_dataset) sem mexer no banco do dia a dia.
+        "NAME": os.environ.get("COMPUFOUR_DB") or BASE_DIR / "db.sqlite3",
     }
 }
 
@@ -142,6 +152,87 @@ STATICFILES_DIRS = [
     BASE_DIR / "core" / "static",
 ]
 
+# Relatórios gerados em segundo plano (ver core/relatorios.py).
+# Ficam fora do MEDIA público: o download passa pelo admin, que confere o dono.
+RELATORIOS_ROOT = BASE_DIR / "relatorios_gerados"
+# Relatórios EXECUTANDO há mais que isso (segundos) são dados como abandonados
+# por um worker que morreu e marcados como erro.
+RELATORIOS_TEMPO_MAXIMO = int(os.environ.get("COMPUFOUR_RELATORIOS_TEMPO_MAXIMO", "1800"))
+
+# Diagnóstico de desempenho (ver core/diagnostico.py e core/middleware.py).
+# AMOSTRAGEM_CONSULTAS: fração das requisições instrumentadas (0 desliga).
+# AMOSTRAGEM_SINAIS: fração das cascatas de sinais rastreadas (core/rastreamento.py).
+DIAGNOSTICO_ROOT = BASE_DIR / "diagnostico"
+DIAGNOSTICO = {
+    "AMOSTRAGEM_CONSULTAS": float(os.environ.get("COMPUFOUR_AMOSTRAGEM_CONSULTAS", "0.1")),
+    "AMOSTRAGEM_SINAIS": float(os.environ.get("COMPUFOUR_AMOSTRAGEM_SINAIS", "0.1")),
+    "MAX_BYTES": 5 * 1024 * 1024,
+    "ARQUIVOS": 3,
+}
+
+# Paginação dos changelists (ver core/paginacao.py). Sem filtros nem busca,
+# tabelas com mais de ESTIMAR_CONTAGEM_ACIMA linhas (segundo o ANALYZE do
+# SQLite) mostram a contagem estimada em vez de rodar COUNT(*).
+PAGINACAO = {
+    "ESTIMAR_CONTAGEM_ACIMA": int(os.environ.get("COMPUFOUR_ESTIMAR_CONTAGEM_ACIMA", "1000000")),
+}
+
+# Autocomplete do admin (ver core/autocomplete.py). Termos que casam com mais
+# de MAXIMO_IDS registros no índice em memória voltam à busca no banco.
+AUTOCOMPLETE = {
+    "MAXIMO_IDS": int(os.environ.get("COMPUFOUR_AUTOCOMPLETE_MAXIMO_IDS", "2000")),
+}
+
+# Métricas em /metrics (ver core/metricas.py). Com vários workers, aponte
+# COMPUFOUR_METRICAS_DIR para um diretório comum a todos. Sem TOKEN, /metrics
+# só responde a 127.0.0.1 e a usuários da equipe; com TOKEN, exige
+# "Authorization: Bearer <token>".
+METRICAS = {
+    "DIRETORIO": os.environ.get("COMPUFOUR_METRICAS_DIR") or None,
+    "INTERVALO": 5,
+    "TOKEN": os.environ.get("COMPUFOUR_METRICAS_TOKEN") or None,
+}
+
+# Logs. Os módulos de core usam logging.getLogger(__name__); o nível padrão
+# (COMPUFOUR_LOG_NIVEL) é WARNING e cada módulo pode ser ajustado em
+# COMPUFOUR_LOG_MODULOS, por exemplo "core.signals=DEBUG" para registrar a
+# trilha dos lançamentos em logs/compufour.log (JSON, com rotação).
+LOGS_ROOT = BASE_DIR / "logs"
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "core.logs.FormatadorJson"},
+        "simples": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "simples",
+            "level": os.environ.get("COMPUFOUR_LOG_CONSOLE", "WARNING"),
+        },
+        "arquivo": {
+            "class": "core.logs.ArquivoRotativoHandler",
+            "formatter": "json",
+            "filename": LOGS_ROOT / "compufour.log",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+        },
+    },
+    "loggers": niveis_por_modulo(
+        os.environ.get("COMPUFOUR_LOG_MODULOS"),
+        padrao={
+            "core": {
+                "handlers": ["console", "arquivo"],
+                "level": os.environ.get("COMPUFOUR_LOG_NIVEL", "WARNING"),
+                "propagate": False,
+            },
+        },
+    ),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -232,7 +323,7 @@ JAZZMIN_SETTINGS = {
         "core": [
             {
                 "name": "Relatórios",
-                "url": "/admin/core/relatorios/",
+                "url": "/admin/core/relatorio/",
                 "icon": "fas fa-chart-line",
                 "permissions": ["core.view_relatorio"],
             },
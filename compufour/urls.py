@@ -20,10 +20,13 @@ from django.urls import path, include
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import metricas
 
 urlpatterns = [
     path('', lambda request: redirect('admin:index'), name='home'),
     #path('grappelli/', include('grappelli.urls')), # grappelli URLS
+    path("admin/diagnostico/", include('core.admin_diagnostico')),
     path("admin/", admin.site.urls),
     path('core/', include('core.urls')),
+    path('metrics', metricas, name='metricas'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -201,4 +201,5 @@ from .admin_romaneio import *
 from .admin_venda import *
 from .admin_venda_item import *
 from .admin_convenio_grupo_mercadoria import *
-from .admin_cliente_convenio_grupo_mercadoria import *
\ No newline at end of file
+from .admin_cliente_convenio_grupo_mercadoria import *
+from .admin_relatorio import *
\ No newline at end of file
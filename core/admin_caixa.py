@@ -4,6 +4,8 @@ from django.utils.html import format_html
 from django import forms
 from rangefilter.filters import DateRangeFilter
 from .models import Caixa
+from .busca import BuscaTextualAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 
 
 class CaixaForm(forms.ModelForm):
@@ -18,7 +20,7 @@ class CaixaForm(forms.ModelForm):
 
 
 @admin.register(Caixa)
-class CaixaAdmin(admin.ModelAdmin):
+class CaixaAdmin(ContagemLeveAdminMixin, BuscaTextualAdminMixin, admin.ModelAdmin):
     form = CaixaForm
     list_display = (
         'empresa',
@@ -36,7 +38,9 @@ class CaixaAdmin(admin.ModelAdmin):
         'plano_conta'
     )
     search_fields = ('caixa_historico',)
+    autocomplete_fields = ('plano_conta',)
     ordering = ('caixa_data_emissao', 'caixa_id')
+    paginacao_keyset = True
 
     class Media:
         js = ('admin/js/jquery.init.js', 'admin/js/core.js', 'admin/js/admin/DateTimeShortcuts.js')
@@ -52,6 +56,19 @@ class CaixaAdmin(admin.ModelAdmin):
         )
         return qs
 
+    def ajustar_pagina_keyset(self, request, changelist, pagina):
+        # Na paginação por chave a janela do saldo acumulado só soma as linhas
+        # da página; acrescenta o saldo das linhas filtradas anteriores.
+        linhas = list(pagina)
+        if linhas:
+            anterior = changelist.anteriores(linhas[0]).aggregate(
+                total=Sum(F('caixa_valor_entrada') - F('caixa_valor_saida'))
+            )['total'] or 0
+            for linha in linhas:
+                if linha.saldo_acumulado is not None:
+                    linha.saldo_acumulado += anterior
+        return linhas
+
     @admin.display(description='Saldo do Movimento (R$)')
     def saldo_do_movimento(self, obj):
         saldo = obj.saldo
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django import forms
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils.html import format_html
 from .models import Cfop
+from .autocomplete import AutocompleteIndexadoAdminMixin
 
 
 class CfopAdminForm(forms.ModelForm):
@@ -56,12 +57,17 @@ class CfopTipoFilter(admin.SimpleListFilter):
 
 
 @admin.register(Cfop)
-class CfopAdmin(admin.ModelAdmin):
+class CfopAdmin(AutocompleteIndexadoAdminMixin, admin.ModelAdmin):
     form = CfopAdminForm
     list_display = ('cfop_id', 'cfop_codigo_colored', 'cfop_operacao', 'tipo_display', 'cfop_integracao', 'disponibilidade_display', 'usos_compra', 'usos_venda')
     list_display_links = ('cfop_id', 'cfop_codigo_colored')
     list_editable = ('cfop_integracao',)
     search_fields = ('cfop_codigo', 'cfop_operacao', 'cfop_integracao')
+    # Mesmas opções dos formulários de itens (core/forms.py e VendaItemInlineForm)
+    restricoes_autocomplete = {
+        ('vendaitem', 'cfop'): Q(cfop_disponivel_venda=True),
+        ('compraitem', 'cfop'): Q(cfop_disponivel_compra=True),
+    }
     search_help_text = 'Busque pelo Código, Descrição ou integração.'
     list_filter = (CfopTipoFilter, 'cfop_integracao')
     ordering = ('cfop_codigo',)
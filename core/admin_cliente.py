@@ -2,10 +2,13 @@ from django.contrib import admin
 from django import forms
 from django.db.models import Count
 from .models import Cliente, ClienteConvenioGrupoMercadoria
+from .autocomplete import AutocompleteIndexadoAdminMixin
+from .escolhas import EscolhasCompartilhadasInlineFormSet
 
 
 class ClienteConvenioGrupoMercadoriaInline(admin.TabularInline):
     model = ClienteConvenioGrupoMercadoria
+    formset = EscolhasCompartilhadasInlineFormSet
     extra = 1
 
 
@@ -71,7 +74,7 @@ class ClienteConvenioCountFilter(admin.SimpleListFilter):
 
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(AutocompleteIndexadoAdminMixin, admin.ModelAdmin):
     form = ClienteAdminForm
     list_display = ('cliente_id', 'cliente_nome', 'convenios_cadastrados')
     list_display_links = ('cliente_id',)
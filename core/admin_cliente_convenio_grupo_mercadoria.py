@@ -2,4 +2,6 @@ from django.contrib import admin
 from .models import ClienteConvenioGrupoMercadoria
 
 
-admin.site.register(ClienteConvenioGrupoMercadoria)
\ No newline at end of file
+@admin.register(ClienteConvenioGrupoMercadoria)
+class ClienteConvenioGrupoMercadoriaAdmin(admin.ModelAdmin):
+    autocomplete_fields = ('cliente',)
@@ -15,7 +15,12 @@ from django.db.models import Subquery, OuterRef
 from decimal import Decimal
 from rangefilter.filters import DateRangeFilter
 from .models import Compra, CompraItem, Romaneio, VendaItem, PlanoConta
+from .autocomplete import AutocompleteIndexadoAdminMixin
+from .escolhas import EscolhasCompartilhadasInlineFormSet
+from .busca import BuscaTextualAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 from .forms import CompraItemForm
+from .relatorios import RelatorioAssincronoMixin
 
 
 class CompraAdminForm(forms.ModelForm):
@@ -44,7 +49,9 @@ class CompraAdminForm(forms.ModelForm):
 class CompraItemInline(admin.TabularInline):
     model = CompraItem
     form = CompraItemForm
+    formset = EscolhasCompartilhadasInlineFormSet
     extra = 1
+    autocomplete_fields = ('produto', 'cfop')
     template = 'admin/core/compra/compraitem_inline.html'
 
     def get_formset(self, request, obj=None, **kwargs):
@@ -103,11 +110,12 @@ class CompraItemInline(admin.TabularInline):
 
 class RomaneioInline(admin.TabularInline):
     model = Romaneio
+    formset = EscolhasCompartilhadasInlineFormSet
     extra = 0
 
 
 @admin.register(Compra)
-class CompraAdmin(admin.ModelAdmin):
+class CompraAdmin(ContagemLeveAdminMixin, AutocompleteIndexadoAdminMixin, BuscaTextualAdminMixin, RelatorioAssincronoMixin, admin.ModelAdmin):
     form = CompraAdminForm  # Aplica o formulário customizado com filtro de despesas
     
     list_display = (
@@ -142,6 +150,7 @@ class CompraAdmin(admin.ModelAdmin):
     )
     inlines = [CompraItemInline, RomaneioInline]
     actions = ['gerar_pdf_detalhado']
+    acoes_assincronas = ('gerar_pdf_detalhado',)
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -215,7 +224,7 @@ class CompraAdmin(admin.ModelAdmin):
     def total_compra(self, obj):
         total = CompraItem.objects.filter(
             compra=obj,
-            cfop__cfop_integracao__icontains="pagar"
+            cfop__cfop_gera_pagar=True
         ).aggregate(
             total=Sum(
                 ExpressionWrapper(
@@ -238,7 +247,7 @@ class CompraAdmin(admin.ModelAdmin):
     def lucro_display(self, obj):
         total_compra = CompraItem.objects.filter(
             compra=obj,
-            cfop__cfop_integracao__icontains="pagar"
+            cfop__cfop_gera_pagar=True
         ).aggregate(
             total=Sum(
                 ExpressionWrapper(
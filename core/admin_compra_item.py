@@ -1,11 +1,13 @@
 from django.contrib import admin
 from django.db.models import Sum, F, DecimalField, ExpressionWrapper
 from .models import CompraItem
+from .autocomplete import FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 from .forms import CompraItemForm
 
 
 @admin.register(CompraItem)
-class CompraItemAdmin(admin.ModelAdmin):
+class CompraItemAdmin(ContagemLeveAdminMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
     form = CompraItemForm
     
     # Campos que seráo exibidos na lista
@@ -21,14 +23,18 @@ class CompraItemAdmin(admin.ModelAdmin):
     # Adiciona campos de busca
     search_fields = ('compra__empresa__empresa_nome', 'produto__produto_nome', 'compra__compra_numero')
 
+    # Paginação por chave (compra_item_id decrescente)
+    paginacao_keyset = True
+
     # Adiciona filtros na lateral direita
-    list_filter = ('compra__empresa', 'produto', 'cfop')
+    list_filter = ('compra__empresa', ('produto', FiltroAutocomplete), 'cfop')
 
     # Melhora a performance, buscando os objetos relacionados em uma única query
-    list_select_related = ('compra__empresa', 'compra', 'produto', 'cfop')
+    list_select_related = ('compra__empresa', 'compra__fornecedor', 'produto', 'cfop')
 
     # Deixa o campo calculado como "apenas leitura" na tela de edição do item
     readonly_fields = ('valor_total',)
+    autocomplete_fields = ('compra', 'produto', 'cfop')
 
     def get_empresa_nome(self, obj):
         if obj.compra and obj.compra.empresa:
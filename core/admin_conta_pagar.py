@@ -16,6 +16,10 @@ from django.db.models import DecimalField
 from decimal import Decimal
 from rangefilter.filters import DateRangeFilter
 from .models import ContaPagar, Pagamento, Empresa, Fornecedor, Compra, PlanoConta, Caixa
+from .autocomplete import AutocompleteIndexadoAdminMixin, FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .busca import BuscaTextualAdminMixin
+from .paginacao import ContagemLeveAdminMixin
+from . import referencias
 
 
 class PagamentoInline(admin.TabularInline):
@@ -77,7 +81,8 @@ class StatusFilter(admin.SimpleListFilter):
 
 
 @admin.register(ContaPagar)
-class ContaPagarAdmin(admin.ModelAdmin):
+class ContaPagarAdmin(ContagemLeveAdminMixin, AutocompleteIndexadoAdminMixin, BuscaTextualAdminMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
+    contagem_dependencias = (Pagamento,)
     list_display = (
         'empresa',
         'plano_conta',
@@ -91,27 +96,26 @@ class ContaPagarAdmin(admin.ModelAdmin):
         'exibir_status'
     )
     search_fields = ('fornecedor__fornecedor_nome', 'conta_pagar_historico')
+    # No autocomplete (pagamentos) o histórico, texto longo, fica de fora do índice
+    campos_autocomplete = ('conta_pagar_id', 'conta_pagar_numero_documento', 'fornecedor__fornecedor_nome')
+    autocomplete_fields = ('fornecedor', 'compra', 'plano_conta')
     list_filter = (
         StatusFilter,
         ('conta_pagar_data_vencimento', DateRangeFilter),
         ('conta_pagar_data_emissao', DateRangeFilter),
         'empresa',
         'plano_conta',
-        'fornecedor'
+        ('fornecedor', FiltroAutocomplete),
     )
     inlines = [PagamentoInline]
     actions = ['pagar_contas_selecionadas']
 
-    _plano_conta_padrao_cache = None
-
     def _obter_plano_para_pagamento(self, conta):
         if getattr(conta, 'plano_conta_id', None):
-            return conta.plano_conta
+            return referencias.obter(PlanoConta, conta.plano_conta_id)
         if getattr(conta, 'compra', None) and getattr(conta.compra, 'plano_conta_id', None):
-            return conta.compra.plano_conta
-        if self._plano_conta_padrao_cache is None:
-            self._plano_conta_padrao_cache = PlanoConta.objects.filter(pk=1).first()
-        return self._plano_conta_padrao_cache
+            return referencias.obter(PlanoConta, conta.compra.plano_conta_id)
+        return referencias.obter(PlanoConta, 1)
 
     def _historico_pagamento(self, pagamento):
         conta = pagamento.conta_pagar
@@ -205,7 +209,7 @@ class ContaPagarAdmin(admin.ModelAdmin):
                         continue
 
                     if plano_conta_padrao is None:
-                        plano_conta_padrao = PlanoConta.objects.filter(pk=1).first()
+                        plano_conta_padrao = referencias.obter(PlanoConta, 1)
                     plano_caixa = (
                         conta.plano_conta
                         or (getattr(conta, 'compra', None) and getattr(conta.compra, 'plano_conta', None))
@@ -21,6 +21,12 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from io import BytesIO
 from .models import ContasReceber, Recebimento, Empresa, Cliente, Venda, PlanoConta, Caixa
+from .autocomplete import AutocompleteIndexadoAdminMixin, FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .busca import BuscaTextualAdminMixin
+from .paginacao import ContagemLeveAdminMixin
+from .metricas import medir_lancamento
+from .relatorios import RelatorioAssincronoMixin
+from . import referencias
 from rangefilter.filters import DateRangeFilter
 
 
@@ -83,7 +89,8 @@ class StatusRecebimentoFilter(admin.SimpleListFilter):
 
 
 @admin.register(ContasReceber)
-class ContasReceberAdmin(admin.ModelAdmin):
+class ContasReceberAdmin(ContagemLeveAdminMixin, AutocompleteIndexadoAdminMixin, BuscaTextualAdminMixin, RelatorioAssincronoMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
+    contagem_dependencias = (Recebimento,)
     list_display = (
         'empresa',
         'plano_conta',
@@ -97,16 +104,19 @@ class ContasReceberAdmin(admin.ModelAdmin):
         'exibir_status'
     )
     search_fields = ('cliente__cliente_nome', 'contas_receber_historico')
+    # No autocomplete (recebimentos) o histórico, texto longo, fica de fora do índice
+    campos_autocomplete = ('contas_receber_id', 'contas_receber_numero_documento', 'cliente__cliente_nome')
     list_filter = (
         StatusRecebimentoFilter,
         ('contas_receber_data_vencimento', DateRangeFilter),
         ('contas_receber_data_emissao', DateRangeFilter),
         'empresa',
-        'cliente',
+        ('cliente', FiltroAutocomplete),
         'plano_conta',
     )
     inlines = [RecebimentoInline]
     actions = ['receber_contas_selecionadas', 'gerar_relatorio_word']
+    acoes_assincronas = ('gerar_relatorio_word',)
     
     # Campos editáveis no formulário
     fields = (
@@ -127,24 +137,21 @@ class ContasReceberAdmin(admin.ModelAdmin):
     readonly_fields = ()
     
     # Campos com autocomplete (opcional)
-    autocomplete_fields = ['cliente', 'plano_conta']
-
-    _plano_conta_padrao_cache = None
+    autocomplete_fields = ['cliente', 'venda', 'plano_conta']
 
     def _obter_plano_para_recebimento(self, conta):
         if getattr(conta, 'plano_conta_id', None):
-            return conta.plano_conta
+            return referencias.obter(PlanoConta, conta.plano_conta_id)
         if getattr(conta, 'venda', None) and getattr(conta.venda, 'plano_conta_id', None):
-            return conta.venda.plano_conta
-        if self._plano_conta_padrao_cache is None:
-            self._plano_conta_padrao_cache = PlanoConta.objects.filter(pk=1).first()
-        return self._plano_conta_padrao_cache
+            return referencias.obter(PlanoConta, conta.venda.plano_conta_id)
+        return referencias.obter(PlanoConta, 1)
 
     def _historico_recebimento(self, recebimento):
         conta = recebimento.contas_receber
         numero = conta.contas_receber_numero_documento or conta.contas_receber_id
         return f'Recebimento #{recebimento.pk} da conta {numero}'
 
+    @medir_lancamento('Recebimento')
     def _registrar_recebimento_no_caixa(self, request, recebimento):
         valor = recebimento.recebimento_valor_recebido or Decimal('0')
         if valor <= Decimal('0'):
@@ -173,6 +180,7 @@ class ContasReceberAdmin(admin.ModelAdmin):
             },
         )
 
+    @medir_lancamento('Recebimento')
     def _remover_recebimento_caixa(self, recebimento):
         conta = recebimento.contas_receber
         if not getattr(conta, 'pk', None):
@@ -232,7 +240,7 @@ class ContasReceberAdmin(admin.ModelAdmin):
                         continue
 
                     if plano_conta_padrao is None:
-                        plano_conta_padrao = PlanoConta.objects.filter(pk=1).first()
+                        plano_conta_padrao = referencias.obter(PlanoConta, 1)
                     plano_caixa = (
                         conta.plano_conta
                         or (getattr(conta, 'venda', None) and getattr(conta.venda, 'plano_conta', None))
@@ -242,25 +250,26 @@ class ContasReceberAdmin(admin.ModelAdmin):
                         contas_sem_plano += 1
                         continue
 
-                    recebimento = Recebimento.objects.create(
-                        contas_receber=conta,
-                        recebimento_data_recebimento=hoje,
-                        recebimento_valor_recebido=saldo,
-                        recebimento_forma_recebimento='Automatico (admin)',
-                        recebimento_observacao='Recebimento gerado pela acao em massa do admin.',
-                    )
-
-                    historico_recebimento = self._historico_recebimento(recebimento)
-                    Caixa.objects.update_or_create(
-                        empresa=conta.empresa,
-                        caixa_historico=historico_recebimento,
-                        defaults={
-                            'plano_conta': plano_caixa,
-                            'caixa_data_emissao': hoje,
-                            'caixa_valor_entrada': saldo,
-                            'caixa_valor_saida': Decimal('0'),
-                        },
-                    )
+                    with medir_lancamento('Recebimento'):
+                        recebimento = Recebimento.objects.create(
+                            contas_receber=conta,
+                            recebimento_data_recebimento=hoje,
+                            recebimento_valor_recebido=saldo,
+                            recebimento_forma_recebimento='Automatico (admin)',
+                            recebimento_observacao='Recebimento gerado pela acao em massa do admin.',
+                        )
+
+                        historico_recebimento = self._historico_recebimento(recebimento)
+                        Caixa.objects.update_or_create(
+                            empresa=conta.empresa,
+                            caixa_historico=historico_recebimento,
+                            defaults={
+                                'plano_conta': plano_caixa,
+                                'caixa_data_emissao': hoje,
+                                'caixa_valor_entrada': saldo,
+                                'caixa_valor_saida': Decimal('0'),
+                            },
+                        )
                     contas_recebidas += 1
 
             if contas_recebidas:
@@ -0,0 +1,67 @@
+from django import forms
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from .resumos import desempenho_romaneios, primeiro_dia_mes
+
+
+class PeriodoDesempenhoForm(forms.Form):
+    inicio = forms.DateField(label='De', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    fim = forms.DateField(label='Até', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+
+    def clean(self):
+        dados = super().clean()
+        if dados.get('inicio') and dados.get('fim') and dados['inicio'] > dados['fim']:
+            raise forms.ValidationError('A data inicial deve ser anterior à data final.')
+        return dados
+
+
+class DesempenhoRomaneioAdminMixin:
+    """
+    Adiciona ao changelist (Funcionário/Veículo) o relatório de desempenho dos
+    romaneios, lido do resumo mensal RomaneioDesempenhoMensal.
+    """
+    dimensao_desempenho = None
+    change_list_template = 'admin/core/desempenho_change_list.html'
+
+    def _nome_url_desempenho(self):
+        return f'core_{self.model._meta.model_name}_desempenho'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        extra = [
+            path('desempenho/', self.admin_site.admin_view(self.desempenho_view), name=self._nome_url_desempenho()),
+        ]
+        return extra + urls
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        if self.has_view_permission(request):
+            extra_context = {
+                **extra_context,
+                'desempenho_url': reverse(f'admin:{self._nome_url_desempenho()}'),
+            }
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def desempenho_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        hoje = timezone.localdate()
+        form = PeriodoDesempenhoForm(request.GET or None, initial={'inicio': primeiro_dia_mes(hoje), 'fim': hoje})
+        inicio, fim = primeiro_dia_mes(hoje), hoje
+        if form.is_bound and form.is_valid():
+            inicio, fim = form.cleaned_data['inicio'], form.cleaned_data['fim']
+        linhas = None
+        if not form.is_bound or form.is_valid():
+            linhas = desempenho_romaneios(self.dimensao_desempenho, inicio, fim)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Desempenho por {self.model._meta.verbose_name.lower()}',
+            'form': form,
+            'linhas': linhas,
+            'inicio': primeiro_dia_mes(inicio),
+            'fim': fim,
+        }
+        return TemplateResponse(request, 'admin/core/desempenho_romaneio.html', context)
@@ -0,0 +1,123 @@
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .diagnostico import resumir_consultas
+from .middleware import ARMAZEM_CONSULTAS, ARMAZEM_PERFIS, diretorio_perfis
+from .rastreamento import ARMAZEM_SINAIS, arvore_rastro, resumir_sinais
+
+
+def _exigir_superusuario(request):
+    if not request.user.is_superuser:
+        raise PermissionDenied
+
+
+def painel_consultas(request):
+    """Consultas SQL por requisição: percentis por view a partir das amostras do middleware."""
+    _exigir_superusuario(request)
+    if request.method == 'POST' and request.POST.get('limpar'):
+        ARMAZEM_CONSULTAS.limpar()
+        messages.success(request, 'Amostras de consultas apagadas.')
+        return redirect('diagnostico_consultas')
+
+    registros = ARMAZEM_CONSULTAS.ler()
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Diagnóstico: consultas por requisição',
+        'linhas': resumir_consultas(registros),
+        'total_amostras': len(registros),
+        'recentes': list(reversed(registros[-20:])),
+    }
+    return TemplateResponse(request, 'admin/diagnostico/consultas.html', context)
+
+
+def painel_sinais(request):
+    """Rastros das cascatas de sinais: custo por receptor e as cascatas mais lentas."""
+    _exigir_superusuario(request)
+    if request.method == 'POST' and request.POST.get('limpar'):
+        ARMAZEM_SINAIS.limpar()
+        messages.success(request, 'Rastros de sinais apagados.')
+        return redirect('diagnostico_sinais')
+
+    registros = ARMAZEM_SINAIS.ler()
+    selecionado = request.GET.get('rastro')
+    if selecionado:
+        rastros = [r for r in registros if r.get('rastro') == selecionado]
+    else:
+        rastros = sorted(registros, key=lambda r: r.get('duracao_ms', 0), reverse=True)[:10]
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Diagnóstico: cascatas de sinais',
+        'linhas': resumir_sinais(registros),
+        'total_rastros': len(registros),
+        'rastros': [{**r, 'arvore': arvore_rastro(r)} for r in rastros],
+        'selecionado': selecionado,
+    }
+    return TemplateResponse(request, 'admin/diagnostico/sinais.html', context)
+
+
+def _perfis_visiveis(request):
+    """Superusuários veem todos os perfis; o restante da equipe, só os próprios."""
+    perfis = ARMAZEM_PERFIS.ler(limite=500)
+    if not request.user.is_superuser:
+        perfis = [perfil for perfil in perfis if perfil.get('usuario_id') == request.user.pk]
+    return perfis
+
+
+def _obter_perfil(request, perfil_id):
+    for perfil in _perfis_visiveis(request):
+        if perfil.get('id') == perfil_id:
+            return perfil
+    raise Http404('Perfil não encontrado.')
+
+
+def painel_perfis(request):
+    """Perfis gerados com ?_perfil=1 (ou o cabeçalho X-Compufour-Perfil)."""
+    if request.method == 'POST' and request.POST.get('limpar'):
+        _exigir_superusuario(request)
+        ARMAZEM_PERFIS.limpar()
+        for arquivo in diretorio_perfis().glob('*.prof'):
+            arquivo.unlink(missing_ok=True)
+        messages.success(request, 'Perfis apagados.')
+        return redirect('diagnostico_perfis')
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Diagnóstico: perfis sob demanda',
+        'perfis': list(reversed(_perfis_visiveis(request)))[:100],
+    }
+    return TemplateResponse(request, 'admin/diagnostico/perfis.html', context)
+
+
+def detalhe_perfil(request, perfil_id):
+    perfil = _obter_perfil(request, perfil_id)
+    context = {
+        **admin.site.each_context(request),
+        'title': f'Perfil {perfil_id}',
+        'perfil': perfil,
+        'tem_arquivo': (diretorio_perfis() / f'{perfil_id}.prof').exists(),
+    }
+    return TemplateResponse(request, 'admin/diagnostico/perfil.html', context)
+
+
+def download_perfil(request, perfil_id):
+    _obter_perfil(request, perfil_id)
+    arquivo = diretorio_perfis() / f'{perfil_id}.prof'
+    if not arquivo.exists():
+        raise Http404('Arquivo do perfil não está mais disponível.')
+    return FileResponse(arquivo.open('rb'), as_attachment=True, filename=arquivo.name)
+
+
+urlpatterns = [
+    path('consultas/', admin.site.admin_view(painel_consultas), name='diagnostico_consultas'),
+    path('sinais/', admin.site.admin_view(painel_sinais), name='diagnostico_sinais'),
+    path('perfis/', admin.site.admin_view(painel_perfis), name='diagnostico_perfis'),
+    path('perfis/<slug:perfil_id>/', admin.site.admin_view(detalhe_perfil), name='diagnostico_perfil'),
+    path(
+        'perfis/<slug:perfil_id>/download/',
+        admin.site.admin_view(download_perfil),
+        name='diagnostico_perfil_download',
+    ),
+]
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django import forms
 from django.db.models import Count
 from .models import Fornecedor
+from .autocomplete import AutocompleteIndexadoAdminMixin
 
 
 class FornecedorAdminForm(forms.ModelForm):
@@ -66,7 +67,7 @@ class FornecedorProdutoCountFilter(admin.SimpleListFilter):
 
 
 @admin.register(Fornecedor)
-class FornecedorAdmin(admin.ModelAdmin):
+class FornecedorAdmin(AutocompleteIndexadoAdminMixin, admin.ModelAdmin):
     form = FornecedorAdminForm
     list_display = ('fornecedor_id', 'fornecedor_nome', 'produtos_cadastrados')
     list_display_links = ('fornecedor_id',)
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django import forms
 from django.db.models import Count, Max
 from rangefilter.filters import DateRangeFilter
+from .admin_desempenho import DesempenhoRomaneioAdminMixin
 from .models import Funcionario
 
 
@@ -67,7 +68,8 @@ class FuncionarioRomaneioCountFilter(admin.SimpleListFilter):
 
 
 @admin.register(Funcionario)
-class FuncionarioAdmin(admin.ModelAdmin):
+class FuncionarioAdmin(DesempenhoRomaneioAdminMixin, admin.ModelAdmin):
+    dimensao_desempenho = 'funcionario'
     form = FuncionarioAdminForm
     list_display = ('funcionario_id', 'funcionario_nome', 'total_romaneios', 'ultima_operacao')
     list_display_links = ('funcionario_id',)
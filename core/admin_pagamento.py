@@ -3,10 +3,12 @@ from django.utils.html import format_html
 from decimal import Decimal
 from rangefilter.filters import DateRangeFilter
 from .models import Pagamento
+from .paginacao import ContagemLeveAdminMixin
+from .versoes import invalidar_por_modelo
 
 
 @admin.register(Pagamento)
-class PagamentoAdmin(admin.ModelAdmin):
+class PagamentoAdmin(ContagemLeveAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para Pagamento com list_display, filtros e busca completos.
     """
@@ -43,6 +45,7 @@ class PagamentoAdmin(admin.ModelAdmin):
     
     # Campos somente leitura (calculados)
     readonly_fields = ('get_info_conta_completa',)
+    autocomplete_fields = ('conta_pagar',)
     
     # Campos exibidos no formulário
     fields = (
@@ -59,6 +62,7 @@ class PagamentoAdmin(admin.ModelAdmin):
     
     # Ordenação padrão
     ordering = ('-pagamento_data_pagamento', '-pagamento_id')
+    paginacao_keyset = True
     
     # Melhorar performance com select_related
     list_select_related = ('conta_pagar', 'conta_pagar__fornecedor', 'conta_pagar__empresa', 'conta_pagar__plano_conta')
@@ -166,6 +170,8 @@ class PagamentoAdmin(admin.ModelAdmin):
         hoje = timezone.now().date()
         
         count = queryset.update(pagamento_data_pagamento=hoje)
+        # update() não dispara sinais: a contagem do changelist (filtrada pela data) ficaria velha.
+        invalidar_por_modelo(Pagamento)
         
         self.message_user(
             request,
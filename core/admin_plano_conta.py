@@ -1,11 +1,17 @@
 from django.contrib import admin
 from django import forms
-from django.db.models import Count, Max, Sum, Value, DecimalField
+from django.db.models import Count, Max, Sum, Value, DecimalField, Q
+from django.core.exceptions import PermissionDenied
 from django.db.models.functions import Coalesce
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from decimal import Decimal
 from rangefilter.filters import DateRangeFilter
-from .models import PlanoConta
+from .models import Empresa, PlanoConta
+from .autocomplete import AutocompleteIndexadoAdminMixin
+from .resumos import montar_dre
 
 
 class PlanoContaAdminForm(forms.ModelForm):
@@ -34,6 +40,19 @@ class PlanoContaAdminForm(forms.ModelForm):
         }
 
 
+class DreForm(forms.Form):
+    inicio = forms.DateField(label='De', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    fim = forms.DateField(label='Até', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    empresa = forms.ModelChoiceField(label='Empresa', queryset=Empresa.objects.all(), required=False, empty_label='Todas')
+    nivel = forms.IntegerField(label='Nível máximo', min_value=1, required=False, help_text='Em branco: todos os níveis.')
+
+    def clean(self):
+        dados = super().clean()
+        if dados.get('inicio') and dados.get('fim') and dados['inicio'] > dados['fim']:
+            raise forms.ValidationError('A data inicial deve ser anterior à data final.')
+        return dados
+
+
 class PlanoContaInicialFilter(admin.SimpleListFilter):
     title = 'Inicial do nome'
     parameter_name = 'plano_conta_nome_inicial'
@@ -103,12 +122,18 @@ class PlanoContaTipoFilter(admin.SimpleListFilter):
 
 
 @admin.register(PlanoConta)
-class PlanoContaAdmin(admin.ModelAdmin):
+class PlanoContaAdmin(AutocompleteIndexadoAdminMixin, admin.ModelAdmin):
     form = PlanoContaAdminForm
     list_display = ('plano_conta_id', 'plano_conta_numero', 'plano_conta_nome', 'tipo_conta_display', 'total_lancamentos', 'ultima_movimentacao', 'valor_entradas', 'valor_saidas', 'saldo_total')
     list_display_links = ('plano_conta_id', 'plano_conta_numero')
     list_editable = ('plano_conta_nome',)
     search_fields = ('plano_conta_numero', 'plano_conta_nome',)
+    # Mesmas opções dos formulários de venda (receitas) e compra (despesas)
+    restricoes_autocomplete = {
+        ('venda', 'plano_conta'): Q(plano_conta_numero__startswith='1'),
+        ('vendaitem', 'plano_conta'): Q(plano_conta_numero__startswith='1'),
+        ('compra', 'plano_conta'): Q(plano_conta_numero__startswith='3'),
+    }
     search_help_text = 'Busque pelo número ou nome do plano de contas.'
     list_filter = (
         PlanoContaTipoFilter,
@@ -118,9 +143,10 @@ class PlanoContaAdmin(admin.ModelAdmin):
     )
     ordering = ('plano_conta_numero', 'plano_conta_nome',)
     list_per_page = 25
-    readonly_fields = ('plano_conta_id', 'tipo_conta_display', 'total_lancamentos_readonly', 'ultima_movimentacao_readonly', 'valor_entradas_readonly', 'valor_saidas_readonly', 'saldo_total_readonly')
+    change_list_template = 'admin/core/planoconta/change_list.html'
+    readonly_fields = ('plano_conta_id', 'plano_conta_pai', 'plano_conta_nivel', 'tipo_conta_display', 'total_lancamentos_readonly', 'ultima_movimentacao_readonly', 'valor_entradas_readonly', 'valor_saidas_readonly', 'saldo_total_readonly')
     fieldsets = (
-        ('Identificação', {'fields': ('plano_conta_id', 'plano_conta_numero', 'plano_conta_nome', 'tipo_conta_display'), 'classes': ('wide',)}),
+        ('Identificação', {'fields': ('plano_conta_id', 'plano_conta_numero', 'plano_conta_nome', 'tipo_conta_display', 'plano_conta_pai', 'plano_conta_nivel'), 'classes': ('wide',)}),
         ('Indicadores automáticos', {
             'fields': ('total_lancamentos_readonly', 'ultima_movimentacao_readonly', 'valor_entradas_readonly', 'valor_saidas_readonly', 'saldo_total_readonly'),
             'classes': ('collapse',),
@@ -145,6 +171,39 @@ class PlanoContaAdmin(admin.ModelAdmin):
         else:
             return format_html('<span style="color: #666;">⚪ Outros</span>')
 
+    def get_urls(self):
+        urls = super().get_urls()
+        extra = [
+            path('dre/', self.admin_site.admin_view(self.dre_view), name='core_planoconta_dre'),
+        ]
+        return extra + urls
+
+    def dre_view(self, request):
+        """DRE (demonstrativo de resultado) por nível do plano de contas."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        hoje = timezone.localdate()
+        form = DreForm(request.GET or None, initial={'inicio': hoje.replace(day=1), 'fim': hoje})
+        dre = None
+        if form.is_bound and form.is_valid():
+            dados = form.cleaned_data
+            dre = montar_dre(
+                dados['inicio'],
+                dados['fim'],
+                empresa_id=dados['empresa'].pk if dados['empresa'] else None,
+                nivel_maximo=dados['nivel'],
+            )
+        elif not form.is_bound:
+            dre = montar_dre(hoje.replace(day=1), hoje)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'DRE - Demonstrativo de Resultado',
+            'form': form,
+            'dre': dre,
+        }
+        return TemplateResponse(request, 'admin/core/planoconta/dre.html', context)
+
     def get_queryset(self, request):
         zero = Decimal('0')
         qs = super().get_queryset(request)
@@ -3,6 +3,9 @@ from django import forms
 from django.db.models import Case, When, Sum, Value, DecimalField, Count, F
 from django.utils.html import format_html
 from .models import Produto, Cfop
+from .autocomplete import AutocompleteIndexadoAdminMixin, FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .busca import BuscaTextualAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 
 
 class ProdutoAdminForm(forms.ModelForm):
@@ -72,34 +75,19 @@ class ProdutoFaixaPrecoFilter(admin.SimpleListFilter):
         return queryset
 
 
-class ProdutoFornecedorFilter(admin.SimpleListFilter):
-    title = 'Fornecedor'
-    parameter_name = 'fornecedor_id'
-
-    def lookups(self, request, model_admin):
-        from .models import Fornecedor
-        fornecedores = Fornecedor.objects.order_by('fornecedor_nome').values_list('pk', 'fornecedor_nome')
-        return fornecedores
-
-    def queryset(self, request, queryset):
-        valor = self.value()
-        if valor:
-            return queryset.filter(fornecedor_id=valor)
-        return queryset
-
-
 @admin.register(Produto)
-class ProdutoAdmin(admin.ModelAdmin):
+class ProdutoAdmin(ContagemLeveAdminMixin, AutocompleteIndexadoAdminMixin, BuscaTextualAdminMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
     form = ProdutoAdminForm
     list_display = ('produto_id', 'produto_nome', 'produto_preco_custo', 'produto_preco', 'fornecedor', 'grupo_mercadoria', 'unidade_medida', 'estoque_atual', 'valor_estoque_atual')
     list_display_links = ('produto_id', 'produto_nome')
     list_editable = ('produto_preco_custo', 'produto_preco',)
     search_fields = ('produto_nome', 'fornecedor__fornecedor_nome', 'grupo_mercadoria__grupo_mercadoria_nome')
     search_help_text = 'Busque pelo nome do produto, fornecedor ou grupo.'
-    list_filter = (ProdutoFaixaPrecoFilter, ProdutoFornecedorFilter, 'grupo_mercadoria')
+    list_filter = (ProdutoFaixaPrecoFilter, ('fornecedor', FiltroAutocomplete), 'grupo_mercadoria')
     ordering = ('produto_nome',)
     list_per_page = 25
     readonly_fields = ('produto_id', 'estoque_atual_readonly', 'valor_estoque_readonly')
+    autocomplete_fields = ('fornecedor',)
     fieldsets = (
         ('Identificação', {'fields': ('produto_id', 'produto_nome', 'grupo_mercadoria', 'fornecedor'), 'classes': ('wide',)}),
         ('Detalhes Comerciais', {
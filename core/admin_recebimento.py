@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.utils.html import format_html
 from rangefilter.filters import DateRangeFilter
 from .models import Recebimento
+from .paginacao import ContagemLeveAdminMixin
+from .versoes import invalidar_por_modelo
 
 
 @admin.register(Recebimento)
-class RecebimentoAdmin(admin.ModelAdmin):
+class RecebimentoAdmin(ContagemLeveAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para Recebimento com list_display, filtros e busca.
     """
@@ -40,6 +42,7 @@ class RecebimentoAdmin(admin.ModelAdmin):
     
     # Campos somente leitura (calculados)
     readonly_fields = ('get_info_conta_completa',)
+    autocomplete_fields = ('contas_receber',)
     
     # Campos exibidos no formulário
     fields = (
@@ -53,6 +56,7 @@ class RecebimentoAdmin(admin.ModelAdmin):
     
     # Ordenação padrão
     ordering = ('-recebimento_data_recebimento', '-recebimento_id')
+    paginacao_keyset = True
     
     # Melhorar performance com select_related
     list_select_related = ('contas_receber', 'contas_receber__cliente', 'contas_receber__empresa')
@@ -140,6 +144,8 @@ class RecebimentoAdmin(admin.ModelAdmin):
         hoje = timezone.now().date()
         
         count = queryset.update(recebimento_data_recebimento=hoje)
+        # update() não dispara sinais: a contagem do changelist (filtrada pela data) ficaria velha.
+        invalidar_por_modelo(Recebimento)
         
         self.message_user(
             request,
@@ -0,0 +1,128 @@
+from django.contrib import admin
+from django.contrib import messages
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import Relatorio
+
+
+@admin.register(Relatorio)
+class RelatorioAdmin(admin.ModelAdmin):
+    """
+    Página "Meus relatórios": acompanha os relatórios enviados para a fila
+    pelas ações "(em segundo plano)" e disponibiliza o download.
+    """
+    list_display = (
+        'relatorio_id',
+        'relatorio_descricao',
+        'status_display',
+        'progresso_display',
+        'relatorio_criado_em',
+        'relatorio_concluido_em',
+        'download_display',
+    )
+    list_display_links = None
+    list_filter = ('status', 'relatorio_modelo')
+    search_fields = ('relatorio_descricao', 'relatorio_nome_arquivo')
+    ordering = ('-relatorio_criado_em',)
+    list_per_page = 25
+    actions = ['cancelar_relatorios']
+    empty_value_display = '--'
+
+    CORES_STATUS = {
+        Relatorio.StatusChoices.PENDENTE: '#6c757d',
+        Relatorio.StatusChoices.EXECUTANDO: '#007bff',
+        Relatorio.StatusChoices.CONCLUIDO: '#28a745',
+        Relatorio.StatusChoices.ERRO: '#dc3545',
+        Relatorio.StatusChoices.CANCELADO: '#ffc107',
+    }
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request).select_related('usuario')
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(usuario=request.user)
+
+    # Qualquer usuário da equipe acompanha os próprios relatórios;
+    # o queryset acima já restringe o que cada um enxerga.
+    def has_module_permission(self, request):
+        return request.user.is_active and request.user.is_staff
+
+    def has_view_permission(self, request, obj=None):
+        if not (request.user.is_active and request.user.is_staff):
+            return False
+        return obj is None or request.user.is_superuser or obj.usuario_id == request.user.pk
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return self.has_view_permission(request, obj)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        extra = [
+            path(
+                '<int:relatorio_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='core_relatorio_download',
+            ),
+        ]
+        return extra + urls
+
+    def download_view(self, request, relatorio_id):
+        relatorio = get_object_or_404(self.get_queryset(request), pk=relatorio_id)
+        if relatorio.status != Relatorio.StatusChoices.CONCLUIDO or not relatorio.relatorio_arquivo:
+            raise Http404('Relatório ainda não disponível.')
+        return FileResponse(
+            relatorio.relatorio_arquivo.open('rb'),
+            as_attachment=True,
+            filename=relatorio.relatorio_nome_arquivo or None,
+            content_type=relatorio.relatorio_content_type or None,
+        )
+
+    @admin.display(description='Status', ordering='status')
+    def status_display(self, obj):
+        cor = self.CORES_STATUS.get(obj.status, '#6c757d')
+        texto = obj.get_status_display()
+        if obj.status == Relatorio.StatusChoices.ERRO and obj.relatorio_mensagem:
+            return format_html(
+                '<b style="color: {};" title="{}">{}</b>', cor, obj.relatorio_mensagem, texto
+            )
+        return format_html('<b style="color: {};">{}</b>', cor, texto)
+
+    @admin.display(description='Progresso', ordering='relatorio_progresso')
+    def progresso_display(self, obj):
+        progresso = obj.relatorio_progresso or 0
+        return format_html(
+            '<div style="width: 120px; background: #e9ecef; border-radius: 3px;">'
+            '<div style="width: {}%; background: #28a745; color: white; font-size: 10px; '
+            'text-align: center; border-radius: 3px;">{}%</div></div>',
+            progresso,
+            progresso,
+        )
+
+    @admin.display(description='Arquivo')
+    def download_display(self, obj):
+        if obj.status != Relatorio.StatusChoices.CONCLUIDO or not obj.relatorio_arquivo:
+            return '--'
+        url = reverse('admin:core_relatorio_download', args=[obj.pk])
+        return format_html('<a href="{}">&#x2B07; {}</a>', url, obj.relatorio_nome_arquivo or 'Baixar')
+
+    @admin.action(description='Cancelar relatórios selecionados')
+    def cancelar_relatorios(self, request, queryset):
+        cancelados = queryset.filter(
+            status__in=[Relatorio.StatusChoices.PENDENTE, Relatorio.StatusChoices.EXECUTANDO]
+        ).update(
+            status=Relatorio.StatusChoices.CANCELADO,
+            relatorio_concluido_em=timezone.now(),
+        )
+        if cancelados:
+            self.message_user(request, f'{cancelados} relatório(s) cancelado(s).', messages.SUCCESS)
+        else:
+            self.message_user(request, 'Nenhum relatório pendente ou em execução foi selecionado.', messages.WARNING)
@@ -3,6 +3,8 @@ from django.db.models import Sum, Subquery, OuterRef, FloatField, F, ExpressionW
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 from .models import Romaneio, VendaItem
+from .autocomplete import FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 
 
 class StatusRomaneioFilter(admin.SimpleListFilter):
@@ -26,21 +28,23 @@ class StatusRomaneioFilter(admin.SimpleListFilter):
 
 
 @admin.register(Romaneio)
-class RomaneioAdmin(admin.ModelAdmin):
+class RomaneioAdmin(ContagemLeveAdminMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
     list_display = (
         'romaneio_id', 'compra', 'funcionario', 'veiculo', 'romaneio_data_emissao',
         'total_carregado_display', 'total_entregue_display', 'saldo_display', 'status'
     )
+    list_select_related = ('compra', 'funcionario', 'veiculo')
     list_filter = (
         'romaneio_data_emissao',
         'funcionario',
         'veiculo',
-        'compra',
+        ('compra', FiltroAutocomplete),
         'compra__empresa',
-        'compra__fornecedor',
+        ('compra__fornecedor', FiltroAutocomplete),
         'status',
     )
     date_hierarchy = 'romaneio_data_emissao'
+    autocomplete_fields = ('compra',)
     change_list_template = 'admin/core/romaneio/change_list.html'
 
     def get_queryset(self, request):
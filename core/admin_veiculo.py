@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django import forms
 from django.db.models import Count, Max
+from .admin_desempenho import DesempenhoRomaneioAdminMixin
 from .models import Veiculo
 
 
@@ -73,7 +74,8 @@ class VeiculoRomaneioCountFilter(admin.SimpleListFilter):
 
 
 @admin.register(Veiculo)
-class VeiculoAdmin(admin.ModelAdmin):
+class VeiculoAdmin(DesempenhoRomaneioAdminMixin, admin.ModelAdmin):
+    dimensao_desempenho = 'veiculo'
     form = VeiculoAdminForm
     list_display = ('veiculo_id', 'veiculo_modelo', 'veiculo_placa', 'total_romaneios', 'ultima_saida')
     list_display_links = ('veiculo_id', 'veiculo_modelo')
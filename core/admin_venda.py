@@ -6,6 +6,10 @@ from django.db.models import Sum, F, DecimalField, ExpressionWrapper
 from django.utils.html import format_html
 from rangefilter.filters import DateRangeFilter
 from .models import Venda, VendaItem, PlanoConta, Romaneio
+from .autocomplete import AutocompleteIndexadoAdminMixin
+from .escolhas import EscolhasCompartilhadasInlineFormSet
+from .paginacao import ContagemLeveAdminMixin
+from .relatorios import RelatorioAssincronoMixin
 
 
 class VendaAdminForm(forms.ModelForm):
@@ -85,14 +89,13 @@ class VendaItemInlineForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Filtra os CFOPs disponíveis para venda: 
+        # Filtra os CFOPs disponíveis para venda (ver Cfop.atualizar_indicadores):
         # 1. Códigos que iniciam com 5, 6 ou 7
         # 2. OU CFOPs marcados como tipo SAÍDA (tipo=2)
         if 'cfop' in self.fields:
-            from django.db.models import Q
             from .models import Cfop
             self.fields['cfop'].queryset = Cfop.objects.filter(
-                Q(cfop_codigo__regex=r'^[567]') | Q(cfop_tipo=2)
+                cfop_disponivel_venda=True
             ).order_by('cfop_codigo')
             
             # Adiciona um help text explicativo
@@ -131,9 +134,11 @@ class VendaItemInlineForm(forms.ModelForm):
 class VendaItemInline(admin.TabularInline):
     model = VendaItem
     form = VendaItemInlineForm
+    formset = EscolhasCompartilhadasInlineFormSet
     extra = 1
     # Removido 'plano_conta' do inline - será preenchido automaticamente pela Venda
     fields = ('produto', 'cliente', 'cfop', 'venda_item_qtd', 'venda_item_preco', 'venda_item_total', 'venda_item_volume')
+    autocomplete_fields = ('produto', 'cliente', 'cfop')
     template = 'admin/core/venda/vendaitem_inline.html'
 
     def get_formset(self, request, obj=None, **kwargs):
@@ -194,7 +199,7 @@ class VendaItemInline(admin.TabularInline):
 
 
 @admin.register(Venda)
-class VendaAdmin(admin.ModelAdmin):
+class VendaAdmin(ContagemLeveAdminMixin, AutocompleteIndexadoAdminMixin, RelatorioAssincronoMixin, admin.ModelAdmin):
     form = VendaAdminForm  # Aplica o formulário customizado com filtro de receitas
     
     list_display = (
@@ -207,14 +212,18 @@ class VendaAdmin(admin.ModelAdmin):
         'total_itens_display',
         'total_volume_display',
     )
+    # O romaneio traz o rótulo gravado: a coluna não consulta compra, funcionário nem veículo.
+    list_select_related = ('romaneio', 'plano_conta')
     list_filter = (
         ('venda_data_emissao', DateRangeFilter),
         ('venda_data_vencimento', DateRangeFilter),
         'plano_conta'
     )
-    search_fields = ('venda_id', 'romaneio__romaneio_data')
+    search_fields = ('venda_id', 'romaneio__romaneio_data_emissao')
+    autocomplete_fields = ('plano_conta',)
     inlines = [VendaItemInline]
     actions = ['gerar_pdf_detalhado']
+    acoes_assincronas = ('gerar_pdf_detalhado',)
     
     # Define os campos do formulário
     fieldsets = (
@@ -275,7 +284,7 @@ class VendaAdmin(admin.ModelAdmin):
         """Total financeiro da venda"""
         total = VendaItem.objects.filter(
             venda=obj,
-            cfop__cfop_integracao__icontains="receber"
+            cfop__cfop_gera_receber=True
         ).aggregate(
             total=Sum(
                 ExpressionWrapper(
@@ -1,11 +1,13 @@
 from django.contrib import admin
 from django.db.models import Sum, F, DecimalField, ExpressionWrapper
 from .models import VendaItem, PlanoConta
+from .autocomplete import FiltroAutocomplete, FiltroAutocompleteAdminMixin
+from .paginacao import ContagemLeveAdminMixin
 from .forms import VendaItemForm
 
 
 @admin.register(VendaItem)
-class VendaItemAdmin(admin.ModelAdmin):
+class VendaItemAdmin(ContagemLeveAdminMixin, FiltroAutocompleteAdminMixin, admin.ModelAdmin):
     form = VendaItemForm
     
     # Campos que serão exibidos na lista
@@ -22,19 +24,23 @@ class VendaItemAdmin(admin.ModelAdmin):
     # Adiciona campos de busca
     search_fields = (
         'venda__venda_id',
-        'venda__romaneio__romaneio_data',
+        'venda__romaneio__romaneio_data_emissao',
         'cliente__cliente_nome',
         'produto__produto_nome',
     )
 
     # Adiciona filtros na lateral direita
-    list_filter = ('cliente', 'produto', 'cfop', 'venda__venda_data_emissao')
+    list_filter = (('cliente', FiltroAutocomplete), ('produto', FiltroAutocomplete), 'cfop', 'venda__venda_data_emissao')
+
+    # Paginação por chave (vend_item_id decrescente)
+    paginacao_keyset = True
 
     # Melhora a performance, buscando os objetos relacionados em uma única query
     list_select_related = ('venda', 'venda__romaneio', 'cliente', 'produto', 'cfop')
 
     # Deixa o campo calculado como "apenas leitura" na tela de edição do item
     readonly_fields = ('valor_total',)
+    autocomplete_fields = ('venda', 'plano_conta', 'cliente', 'produto', 'cfop')
 
     # Campos exibidos no formulário de edição
     fields = (
@@ -0,0 +1,326 @@
+# core/autocomplete.py
+#
+# Busca dos campos de autocomplete do admin (autocomplete_fields) por um
+# índice em memória, sem icontains sobre a tabela a cada tecla.
+#
+# Cada ModelAdmin com AutocompleteIndexadoAdminMixin ganha um IndiceBusca:
+# os valores dos `search_fields` (inclusive os que atravessam relações, como
+# fornecedor__fornecedor_nome) viram palavras normalizadas (minúsculas, sem
+# acento) numa lista ordenada de palavras, cada uma com os pks em que
+# aparece. Cada palavra digitada casa por prefixo e o resultado é a
+# interseção das palavras. O índice fica num CacheVersionado que é
+# descartado quando o modelo ou algum modelo dos search_fields é gravado.
+#
+# A busca do changelist (?q=) continua com o icontains do Django; o índice só
+# atende às views de autocomplete. Termos muito genéricos (mais de
+# AUTOCOMPLETE['MAXIMO_IDS'] registros) e termos sem nenhum início de palavra
+# correspondente (um pedaço do meio, como "lien" ou "0123" em "C0123")
+# também voltam ao icontains.
+#
+# FiltroAutocomplete é o filtro da lateral para FKs com muitos registros
+# (clientes, fornecedores, compras): em vez de um link por registro, mostra
+# um campo de autocomplete. O rótulo da opção escolhida fica em cache até a
+# próxima gravação do modelo relacionado, e a quantidade de linhas de cada
+# opção só é contada para as opções que aparecem na lista do autocomplete.
+
+import functools
+import re
+import unicodedata
+from bisect import bisect_left
+
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import NotRelationField, get_fields_from_path
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.translation import gettext_lazy as _
+
+from .paginacao import nome_versao_contagem
+from .versoes import CacheVersionado, depender_de
+
+VIEWS_AUTOCOMPLETE = ('autocomplete', 'filtro_autocomplete')
+
+_indices = {}
+_rotulos = {}
+_contagens_opcoes = {}
+_palavra = re.compile(r'\w+')
+
+
+def palavras(texto):
+    """Palavras de `texto` em minúsculas e sem acento."""
+    texto = str(texto)
+    if not texto.isascii():
+        texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return _palavra.findall(texto.lower())
+
+
+def _modelos_do_caminho(model, caminho):
+    """Modelos atravessados pelo caminho de um search_field (ex.: fornecedor__fornecedor_nome)."""
+    modelos = []
+    atual = model
+    for parte in caminho.split('__'):
+        try:
+            campo = atual._meta.get_field(parte)
+        except FieldDoesNotExist:
+            break
+        if not campo.is_relation:
+            break
+        atual = campo.related_model
+        modelos.append(atual)
+    return modelos
+
+
+class IndiceBusca:
+    """Índice de palavras -> pks de um modelo, montado a partir de `campos`."""
+
+    def __init__(self, model, campos):
+        self.model = model
+        self.campos = tuple(campos)
+        self.nome = f'autocomplete:{model._meta.label_lower}'
+        self._cache = CacheVersionado(self.nome, tamanho=1)
+        modelos = {model}
+        for campo in self.campos:
+            modelos.update(_modelos_do_caminho(model, campo))
+        depender_de(self.nome, modelos)
+
+    def _montar(self):
+        por_palavra = {}
+        # Valores repetidos (nome do cliente em cada conta) são quebrados uma vez.
+        palavras_do_valor = functools.lru_cache(maxsize=65536)(lambda valor: frozenset(palavras(valor)))
+        linhas = self.model._default_manager.values_list('pk', *self.campos).iterator(chunk_size=5000)
+        for pk, *valores in linhas:
+            encontradas = set()
+            for valor in valores:
+                if valor is not None:
+                    encontradas.update(palavras_do_valor(valor))
+            for palavra in encontradas:
+                por_palavra.setdefault(palavra, []).append(pk)
+        chaves = sorted(por_palavra)
+        return chaves, [por_palavra[chave] for chave in chaves]
+
+    def buscar(self, termo, maximo):
+        """
+        pks cujas palavras começam por todas as palavras de `termo`, ou None
+        se o termo não tiver palavras, não casar com nenhum registro (pode ser
+        um pedaço do meio de uma palavra, que o icontains acha) ou casar com
+        mais de `maximo` registros.
+        """
+        procuradas = palavras(termo)
+        if not procuradas:
+            return None
+        chaves, pks = self._cache.obter('indice', self._montar)
+        resultado = None
+        # A palavra mais longa costuma ser a mais seletiva.
+        for procurada in sorted(set(procuradas), key=len, reverse=True):
+            encontrados = set()
+            posicao = bisect_left(chaves, procurada)
+            while posicao < len(chaves) and chaves[posicao].startswith(procurada):
+                encontrados.update(pks[posicao])
+                posicao += 1
+            resultado = encontrados if resultado is None else resultado & encontrados
+            if not resultado:
+                return None
+        if len(resultado) > maximo:
+            return None
+        return resultado
+
+
+def requisicao_autocomplete(request):
+    correspondencia = getattr(request, 'resolver_match', None)
+    return correspondencia is not None and correspondencia.url_name in VIEWS_AUTOCOMPLETE
+
+
+class AutocompleteIndexadoAdminMixin:
+    """
+    Atende à view de autocomplete com o IndiceBusca do modelo.
+    `campos_autocomplete` (padrão: os search_fields) define o que é indexado.
+    `restricoes_autocomplete` mapeia (model_name, field_name) do campo de
+    origem para um Q que limita as opções, espelhando o queryset que o
+    formulário de origem usa (por exemplo, só contas de receita na venda).
+    """
+    campos_autocomplete = None
+    restricoes_autocomplete = {}
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        campos = self.campos_autocomplete or [campo.lstrip('^=@') for campo in self.search_fields]
+        _indices[model] = IndiceBusca(model, campos)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not requisicao_autocomplete(request):
+            return super().get_search_results(request, queryset, search_term)
+        restricao = self.restricoes_autocomplete.get((request.GET.get('model_name'), request.GET.get('field_name')))
+        if restricao is not None:
+            queryset = queryset.filter(restricao)
+        if not queryset.ordered:
+            # Sem ordenação no admin, os documentos mais recentes vêm primeiro.
+            queryset = queryset.order_by('-pk')
+        if not search_term:
+            return queryset, False
+        maximo = getattr(settings, 'AUTOCOMPLETE', {}).get('MAXIMO_IDS', 2000)
+        pks = _indices[self.model].buscar(search_term, maximo)
+        if pks is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=pks), False
+
+
+def rotulo(campo, valor):
+    """str() do registro apontado pela FK `campo` com valor `valor`, ou None se não existir."""
+    model = campo.related_model
+    cache = _rotulos.get(model)
+    if cache is None:
+        nome = f'autocomplete:{model._meta.label_lower}'
+        cache = _rotulos[model] = CacheVersionado(nome, tamanho=256)
+        depender_de(nome, (model,))
+
+    def carregar():
+        obj = model._default_manager.filter(**{campo.target_field.attname: valor}).first()
+        return str(obj) if obj is not None else None
+
+    return cache.obter(str(valor), carregar)
+
+
+def contar_opcoes(model, caminho, campo, valores):
+    """
+    {valor: linhas de `model` (o do changelist) cujo `caminho` (ex.:
+    'compra__fornecedor', terminando na FK `campo`) aponta para valor}, só
+    para `valores`; os que faltam no cache são contados numa única consulta.
+    """
+    cache = _contagens_opcoes.get(model)
+    if cache is None:
+        nome = f'{nome_versao_contagem(model)}:opcoes'
+        cache = _contagens_opcoes[model] = CacheVersionado(nome, tamanho=4096)
+        depender_de(nome, (model,))
+    # Num caminho como compra__fornecedor, trocar o fornecedor de uma compra muda as contagens.
+    depender_de(cache.nome, _modelos_do_caminho(model, caminho))
+    chave = f'{caminho}__{campo.target_field.name}'
+
+    def carregar_varios(chaves):
+        linhas = (
+            model._default_manager.filter(**{f'{chave}__in': [valor for _, valor in chaves]})
+            .order_by().values_list(chave).annotate(total=Count('pk'))
+        )
+        return {(caminho, valor): total for valor, total in linhas}
+
+    contagens = cache.obter_varios([(caminho, valor) for valor in valores], carregar_varios)
+    return {valor: total or 0 for (_, valor), total in contagens.items()}
+
+
+class FiltroAutocompleteJsonView(AutocompleteJsonView):
+    """Autocomplete dos filtros da lateral: cada opção traz a quantidade de linhas."""
+
+    def _origem_contagem(self):
+        """
+        (modelo do changelist, caminho do filtro), vindos da URL do widget; as
+        linhas contadas são as do changelist, não as do modelo que tem a FK.
+        Sem parâmetros válidos, conta no modelo da FK (caminho direto).
+        """
+        rotulo_lista, caminho = self.request.GET.get('lista'), self.request.GET.get('caminho')
+        if rotulo_lista and caminho:
+            try:
+                model = apps.get_model(rotulo_lista)
+                campos = get_fields_from_path(model, caminho)
+            except (LookupError, ValueError, FieldDoesNotExist, NotRelationField):
+                campos = None
+            if campos and campos[-1] == self.source_field:
+                model_admin = self.admin_site._registry.get(model)
+                if model_admin is not None and model_admin.has_view_permission(self.request):
+                    return model, caminho
+        return self.source_field.model, self.source_field.name
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        chave = self.source_field.target_field.attname
+        model, caminho = self._origem_contagem()
+        self.contagens = contar_opcoes(
+            model, caminho, self.source_field, [getattr(obj, chave) for obj in context['object_list']],
+        )
+        return context
+
+    def serialize_result(self, obj, to_field_name):
+        resultado = super().serialize_result(obj, to_field_name)
+        resultado['text'] = f"{resultado['text']} ({self.contagens.get(getattr(obj, to_field_name), 0)})"
+        return resultado
+
+
+class SelectFiltroAutocomplete(AutocompleteSelect):
+    """
+    AutocompleteSelect do filtro: usa a view com contagens e o rótulo já
+    conhecido da opção escolhida. O modelo do changelist e o caminho do
+    filtro vão na URL da view, para contar as linhas do changelist.
+    """
+
+    def __init__(self, field, admin_site, rotulo_escolhido, model_lista=None, caminho=None, attrs=None):
+        super().__init__(field, admin_site, attrs=attrs)
+        self.rotulo_escolhido = rotulo_escolhido
+        self.model_lista = model_lista
+        self.caminho = caminho
+
+    def get_url(self):
+        url = reverse('core:filtro_autocomplete')
+        if self.model_lista is not None and self.caminho:
+            url += '?' + urlencode({'lista': self.model_lista._meta.label_lower, 'caminho': self.caminho})
+        return url
+
+    def optgroups(self, name, value, attr=None):
+        opcoes = [self.create_option(name, '', '', False, 0)]
+        if value and self.rotulo_escolhido is not None:
+            opcoes.append(self.create_option(name, value[0], self.rotulo_escolhido, True, 1))
+        return [(None, opcoes, 0)]
+
+
+class FiltroAutocomplete(admin.FieldListFilter):
+    """
+    Filtro da lateral para FKs com muitos registros, usado como
+    ('cliente', FiltroAutocomplete) no list_filter. O modelo relacionado
+    precisa de search_fields no admin; o ModelAdmin precisa do
+    FiltroAutocompleteAdminMixin para carregar os scripts.
+    """
+    template = 'admin/core/filtro_autocomplete.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.admin_site = model_admin.admin_site
+        self.model_lista = model
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        sem_filtro = changelist.get_query_string(remove=[self.lookup_kwarg])
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': sem_filtro,
+            'display': _('All'),
+        }
+        widget = SelectFiltroAutocomplete(
+            self.field, self.admin_site,
+            rotulo(self.field, self.lookup_val) if self.lookup_val else None,
+            model_lista=self.model_lista, caminho=self.field_path,
+            attrs={'data-query-string': sem_filtro, 'style': 'width: 100%;'},
+        )
+        yield {
+            'selected': self.lookup_val is not None,
+            'widget': widget.render(self.lookup_kwarg, self.lookup_val, attrs={'id': f'filtro_{self.lookup_kwarg}'}),
+        }
+
+
+class FiltroAutocompleteAdminMixin:
+    """Carrega no admin os scripts do select2 usados pelo FiltroAutocomplete."""
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media + forms.Media(
+            js=['admin/js/jquery.init.js', 'core/js/filtro_autocomplete.js'],
+        )
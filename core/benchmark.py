@@ -0,0 +1,428 @@
+# core/benchmark.py
+#
+# Medição de desempenho para os comandos benchmark_* (rode-os contra um banco
+# gerado com generate_dataset, apontado por COMPUFOUR_DB).
+#
+# Cada cenário é executado algumas vezes para medir o tempo (mediana e
+# mínimo) e o número de consultas, e uma última vez sob tracemalloc para o
+# pico de memória: o tracemalloc deixa o Python bem mais lento e distorceria
+# os tempos se ficasse ligado durante toda a medição.
+#
+# Os resultados são gravados em JSON ({'meta': ..., 'resultados': {cenario:
+# medida}}) e podem ser comparados com um arquivo anterior (a linha de base)
+# para acusar regressões.
+
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.db import connections, transaction
+from django.test import RequestFactory
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .models import (
+    Cfop, Cliente, Compra, CompraItem, ContaPagar, ContasReceber, Empresa, Fornecedor, PlanoConta, Produto,
+    Venda, VendaItem,
+)
+
+
+class ContadorConsultas:
+    """Conta as consultas executadas em todas as conexões dentro do bloco."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrappers = [conexao.execute_wrapper(self) for conexao in connections.all()]
+        for wrapper in self._wrappers:
+            wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(*exc)
+        return False
+
+
+def medir(funcao, repeticoes=3, aquecimento=1, memoria=True):
+    """
+    Executa `funcao` e devolve tempo (ms), consultas e pico de memória (KiB).
+
+    As consultas são as da última repetição; o valor devolvido pela função na
+    última chamada vai em 'retorno' (útil para conferir o status HTTP).
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    retorno = None
+    consultas = 0
+    for _ in range(max(1, repeticoes)):
+        with ContadorConsultas() as contador:
+            inicio = time.perf_counter()
+            retorno = funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = contador.total
+    medida = {
+        'tempo_ms': round(statistics.median(tempos), 2),
+        'tempo_min_ms': round(min(tempos), 2),
+        'consultas': consultas,
+        'retorno': retorno,
+    }
+    if memoria:
+        ja_ativo = tracemalloc.is_tracing()
+        if not ja_ativo:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            funcao()
+            medida['memoria_pico_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            if not ja_ativo:
+                tracemalloc.stop()
+    return medida
+
+
+def metadados(**extra):
+    return {
+        'gerado_em': timezone.now().isoformat(timespec='seconds'),
+        'banco': str(settings.DATABASES['default']['NAME']),
+        **extra,
+    }
+
+
+def gravar_resultados(caminho, meta, resultados):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(
+        json.dumps({'meta': meta, 'resultados': resultados}, ensure_ascii=False, indent=2, sort_keys=True),
+        encoding='utf-8',
+    )
+
+
+def ler_resultados(caminho):
+    return json.loads(Path(caminho).read_text(encoding='utf-8')).get('resultados', {})
+
+
+def comparar(resultados, base, limite=1.25, tolerancia_ms=5.0):
+    """
+    Lista as regressões em relação à linha de base.
+
+    Um cenário regride quando o tempo (mediana) passa de `limite` vezes o da
+    base e a diferença é maior que `tolerancia_ms` (para não acusar ruído em
+    views muito rápidas), ou quando o número de consultas passa de `limite`
+    vezes o da base. Cenários que não existem na base são ignorados.
+    """
+    regressoes = []
+    for nome, medida in sorted(resultados.items()):
+        anterior = base.get(nome)
+        if not anterior:
+            continue
+        tempo, tempo_base = medida.get('tempo_ms', 0), anterior.get('tempo_ms', 0)
+        if tempo > tempo_base * limite and tempo - tempo_base > tolerancia_ms:
+            regressoes.append(f'{nome}: tempo {tempo_base} ms -> {tempo} ms')
+        consultas, consultas_base = medida.get('consultas', 0), anterior.get('consultas', 0)
+        if consultas > max(consultas_base * limite, consultas_base + 1):
+            regressoes.append(f'{nome}: consultas {consultas_base} -> {consultas}')
+    return regressoes
+
+
+# -----------------------------------------------------------------------------
+# Admin (manage.py benchmark_admin)
+# -----------------------------------------------------------------------------
+
+def _rotulo(model):
+    return f'{model._meta.app_label}.{model._meta.model_name}'
+
+
+def cenarios_admin(site, usuario, modelos=None, lookups_por_filtro=5, busca=None, filtros_campo=False):
+    """
+    Lista (nome, url) das views do admin a medir: para cada ModelAdmin
+    registrado, o changelist, o changelist com cada opção dos filtros
+    SimpleListFilter (até `lookups_por_filtro` por filtro), a busca e a
+    página de edição do registro mais recente; além do índice do admin e
+    das views extras (DRE, desempenho).
+
+    Com `filtros_campo`, inclui também os filtros de campo da lateral
+    (booleanos, FKs, DateRangeFilter, FiltroAutocomplete) e o date_hierarchy,
+    com valores tirados do próprio banco.
+    """
+    cenarios = [('admin:index', reverse(f'{site.name}:index'))]
+    registrados = sorted(site._registry.items(), key=lambda item: _rotulo(item[0]))
+    for model, model_admin in registrados:
+        rotulo = _rotulo(model)
+        if modelos and rotulo not in modelos and model._meta.model_name not in modelos:
+            continue
+        prefixo = f'{site.name}:{model._meta.app_label}_{model._meta.model_name}'
+        changelist = reverse(f'{prefixo}_changelist')
+        cenarios.append((f'{rotulo}:changelist', changelist))
+
+        request = RequestFactory().get(changelist)
+        request.user = usuario
+        for filtro in model_admin.get_list_filter(request):
+            if not (isinstance(filtro, type) and issubclass(filtro, SimpleListFilter)):
+                continue
+            instancia = filtro(request, {}, model, model_admin)
+            for valor, _ in list(instancia.lookup_choices)[:lookups_por_filtro]:
+                consulta = urlencode({instancia.parameter_name: valor})
+                cenarios.append((f'{rotulo}:changelist?{consulta}', f'{changelist}?{consulta}'))
+        if filtros_campo:
+            for consulta in _consultas_filtros_campo(model, model_admin, request, lookups_por_filtro):
+                cenarios.append((f'{rotulo}:changelist?{consulta}', f'{changelist}?{consulta}'))
+
+        if busca and model_admin.get_search_fields(request):
+            cenarios.append((f'{rotulo}:busca', f"{changelist}?{urlencode({'q': busca})}"))
+
+        pk = model._default_manager.order_by('-pk').values_list('pk', flat=True).first()
+        if pk is not None:
+            cenarios.append((f'{rotulo}:change', reverse(f'{prefixo}_change', args=[pk])))
+
+        for extra in ('dre', 'desempenho'):
+            try:
+                cenarios.append((f'{rotulo}:{extra}', reverse(f'{prefixo}_{extra}')))
+            except NoReverseMatch:
+                pass
+    return cenarios
+
+
+def _valor_exemplo(model, caminho, ultimo=True):
+    """Valor não nulo de `caminho` (ex.: 'cliente__cliente_id') no registro mais recente de `model`."""
+    ordem = f'-{caminho}' if ultimo else caminho
+    return (
+        model._default_manager.exclude(**{f'{caminho}__isnull': True})
+        .order_by(ordem).values_list(caminho, flat=True).first()
+    )
+
+
+def _consultas_filtros_campo(model, model_admin, request, lookups_por_filtro):
+    """
+    Query strings dos filtros de campo da lateral: as opções que o próprio
+    filtro oferece ou, nos que não listam opções (intervalo de datas,
+    autocomplete), um valor tirado do banco; e um mês do date_hierarchy.
+    """
+    consultas = []
+    changelist = model_admin.get_changelist_instance(request)
+    for spec in changelist.filter_specs:
+        if isinstance(spec, SimpleListFilter):
+            continue
+        opcoes = [
+            escolha['query_string'].lstrip('?') for escolha in spec.choices(changelist)
+            if not escolha.get('selected') and escolha.get('query_string', '?') != '?'
+        ]
+        if opcoes:
+            consultas += opcoes[:lookups_por_filtro]
+            continue
+        parametros = {}
+        for parametro in spec.expected_parameters():
+            caminho, _, lookup = parametro.rpartition('__')
+            if caminho.endswith('__range'):
+                data = _valor_exemplo(model, caminho[:-len('__range')])
+                if data is not None:
+                    data = data.date() if hasattr(data, 'date') else data
+                    parametros[parametro] = (data if lookup == 'lte' else data - timedelta(days=30)).isoformat()
+            elif lookup == 'exact':
+                valor = _valor_exemplo(model, caminho)
+                if valor is not None:
+                    parametros[parametro] = valor
+        if parametros:
+            consultas.append(urlencode(parametros))
+
+    campo = model_admin.date_hierarchy
+    if campo:
+        data = _valor_exemplo(model, campo)
+        if data is not None:
+            consultas.append(urlencode({f'{campo}__year': data.year, f'{campo}__month': data.month}))
+    return consultas
+
+
+# -----------------------------------------------------------------------------
+# Lançamentos (manage.py benchmark_lancamentos)
+# -----------------------------------------------------------------------------
+
+def medir_escrita(preparar, executar, repeticoes=3, aquecimento=1):
+    """
+    Mede `executar(preparar())`, que devolve quantos objetos foram gravados.
+
+    Cada execução roda num savepoint desfeito em seguida, então todas partem
+    do mesmo banco; só `executar` entra no tempo e nas consultas.
+    """
+    tempos = []
+    consultas = saves = 0
+    for indice in range(aquecimento + max(1, repeticoes)):
+        with transaction.atomic():
+            contexto = preparar()
+            with ContadorConsultas() as contador:
+                inicio = time.perf_counter()
+                saves = executar(contexto)
+                tempo = (time.perf_counter() - inicio) * 1000
+            transaction.set_rollback(True)
+        if indice >= aquecimento:
+            tempos.append(tempo)
+            consultas = contador.total
+    tempo = statistics.median(tempos)
+    saves = max(saves, 1)
+    return {
+        'tempo_ms': round(tempo, 2),
+        'tempo_min_ms': round(min(tempos), 2),
+        'consultas': consultas,
+        'saves': saves,
+        'saves_por_s': round(saves / (tempo / 1000), 1) if tempo else None,
+        'consultas_por_save': round(consultas / saves, 2),
+    }
+
+
+class CenariosLancamento:
+    """
+    Cenários de gravação que disparam a cascata de sinais, montados com
+    cadastros já existentes no banco (os de generate_dataset).
+
+    Os métodos de cenário recebem K (itens por documento ou contas por ação)
+    e devolvem (preparar, executar) para medir_escrita.
+    """
+
+    NOMES = (
+        'compra_criar', 'compra_editar', 'compra_excluir',
+        'venda_criar_receber', 'venda_criar_caixa', 'vendaitem_avulso',
+        'pagar_em_massa', 'receber_em_massa',
+    )
+    EM_MASSA = ('pagar_em_massa', 'receber_em_massa')
+
+    def __init__(self, cliente_http=None):
+        self.cliente_http = cliente_http
+        self.hoje = date.today()
+        self.empresa = Empresa.objects.order_by('pk').first()
+        self.fornecedor = Fornecedor.objects.order_by('pk').first()
+        self.cliente = Cliente.objects.order_by('pk').first()
+        self.produtos = list(Produto.objects.order_by('pk')[:50])
+        self.plano_compra = self._plano('3.01')
+        self.plano_venda = self._plano('1.01')
+        self.cfops = {
+            integracao: Cfop.objects.filter(cfop_integracao=integracao).order_by('pk').first()
+            for integracao in ('pagar', 'receber', 'caixa')
+        }
+        faltando = [
+            nome for nome, valor in (
+                ('empresa', self.empresa), ('fornecedor', self.fornecedor), ('cliente', self.cliente),
+                ('produto', self.produtos), ('plano de contas', self.plano_compra),
+                *((f'CFOP "{integracao}"', cfop) for integracao, cfop in self.cfops.items()),
+            ) if not valor
+        ]
+        if faltando:
+            raise ValueError(f"Cadastros ausentes: {', '.join(faltando)}. Gere a massa com generate_dataset.")
+
+    @staticmethod
+    def _plano(numero):
+        return (
+            PlanoConta.objects.filter(plano_conta_numero=numero).first()
+            or PlanoConta.objects.order_by('pk').first()
+        )
+
+    def _produto(self, indice):
+        return self.produtos[indice % len(self.produtos)]
+
+    # Compras ------------------------------------------------------------
+
+    def _criar_compra(self, k):
+        compra = Compra(
+            empresa=self.empresa, fornecedor=self.fornecedor, plano_conta=self.plano_compra,
+            compra_numero=f'B{k}', compra_data_entrada=self.hoje, compra_prazo_pagamento='30,60,90',
+        )
+        compra.save()
+        for indice in range(k):
+            CompraItem(
+                compra=compra, cfop=self.cfops['pagar'], produto=self._produto(indice),
+                compra_item_qtd=Decimal('10'), compra_item_preco=Decimal('5.50'), compra_item_volume=1,
+            ).save()
+        return compra
+
+    def compra_criar(self, k):
+        def executar(_):
+            self._criar_compra(k)
+            return k + 1
+
+        return (lambda: None), executar
+
+    def compra_editar(self, k):
+        def executar(compra):
+            compra.compra_prazo_pagamento = '28,56'
+            compra.save()
+            for item in CompraItem.objects.filter(compra=compra):
+                item.compra_item_qtd += 1
+                item.save()
+            return k + 1
+
+        return (lambda: self._criar_compra(k)), executar
+
+    def compra_excluir(self, k):
+        def executar(compra):
+            compra.delete()
+            return k + 1
+
+        return (lambda: self._criar_compra(k)), executar
+
+    # Vendas -------------------------------------------------------------
+
+    def _item_venda(self, venda, integracao, indice):
+        VendaItem(
+            venda=venda, cfop=self.cfops[integracao], cliente=self.cliente, produto=self._produto(indice),
+            plano_conta=self.plano_venda, venda_item_qtd=Decimal('2'), venda_item_preco=Decimal('7.90'),
+            venda_item_volume=1,
+        ).save()
+
+    def _criar_venda(self, k, integracao):
+        venda = Venda(plano_conta=self.plano_venda, venda_data_emissao=self.hoje, venda_data_vencimento=self.hoje)
+        venda.save()
+        for indice in range(k):
+            self._item_venda(venda, integracao, indice)
+        return k + 1
+
+    def venda_criar_receber(self, k):
+        return (lambda: None), (lambda _: self._criar_venda(k, 'receber'))
+
+    def venda_criar_caixa(self, k):
+        return (lambda: None), (lambda _: self._criar_venda(k, 'caixa'))
+
+    def vendaitem_avulso(self, k):
+        def executar(_):
+            for indice in range(k):
+                self._item_venda(None, 'receber' if indice % 2 else 'caixa', indice)
+            return k
+
+        return (lambda: None), executar
+
+    # Baixas em massa (ações do admin) -----------------------------------
+
+    def _acao_em_massa(self, model, acao, filtro, k):
+
+        url = reverse(f'admin:core_{model._meta.model_name}_changelist')
+
+        def preparar():
+            return list(model.objects.filter(**filtro).order_by('pk').values_list('pk', flat=True)[:k])
+
+        def executar(pks):
+            resposta = self.cliente_http.post(url, {
+                'action': acao, ACTION_CHECKBOX_NAME: pks, 'post': 'sim', 'index': 0,
+            })
+            if resposta.status_code != 302:
+                raise RuntimeError(f'{acao}: HTTP {resposta.status_code}')
+            return len(pks)
+
+        return preparar, executar
+
+    def pagar_em_massa(self, k):
+        return self._acao_em_massa(ContaPagar, 'pagar_contas_selecionadas', {'pagamento__isnull': True}, k)
+
+    def receber_em_massa(self, k):
+        return self._acao_em_massa(ContasReceber, 'receber_contas_selecionadas', {'recebimento__isnull': True}, k)
@@ -0,0 +1,260 @@
+# core/busca.py
+#
+# Busca dos changelists (?q=) por tabelas FTS5 do SQLite.
+#
+# Os search_fields de Caixa, ContaPagar, ContasReceber, Compra e Produto
+# viravam LIKE '%termo%' em cada campo, com joins (na compra, até itens,
+# produtos e romaneios) que ainda repetiam linhas e exigiam DISTINCT. Aqui
+# cada modelo tem uma tabela busca_<tabela> com uma linha por registro
+# (rowid = chave primária) e o texto de todos os seus search_fields,
+# inclusive os que atravessam relações. O tokenizador unicode61 com
+# remove_diacritics ignora maiúsculas e acentos ("sao joao" acha "São João").
+#
+# Cada palavra digitada casa com o início de uma palavra do texto, e o
+# registro precisa ter todas elas, em qualquer dos campos. Termos sem
+# palavras e o autocomplete (core/autocomplete.py) continuam com a busca do
+# Django.
+#
+# As tabelas são criadas pela migração 0023 e mantidas por triggers, que
+# refazem a linha quando o registro muda, quando um nome relacionado muda
+# (fornecedor, produto, veículo...) e quando itens ou romaneios da compra são
+# incluídos, alterados ou excluídos; valem também para bulk_create e
+# queryset.update(). O SQLite não deixa recriar uma tabela referida por um
+# trigger, o que o Django faz em várias alterações de campo: por isso os
+# triggers são removidos antes de cada migrate e recriados depois
+# (core/signals.py), com o texto refeito se alguma migração foi aplicada.
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .autocomplete import palavras, requisicao_autocomplete
+
+
+def _c(expressao):
+    return f"coalesce({expressao}, '')"
+
+
+# tabela, chave, expressão do texto (alias t), joins, colunas da própria
+# tabela que entram no texto e relações: (tabela, colunas que mudam o texto
+# ou None para inclusão/alteração/exclusão de filhos, SELECT das chaves
+# afetadas com {r} no lugar de new/old).
+INDICES = {
+    'caixa': {
+        'chave': 'caixa_id',
+        'texto': _c('t.caixa_historico'),
+        'joins': '',
+        'colunas': ('caixa_historico',),
+        'relacoes': (),
+    },
+    'conta_pagar': {
+        'chave': 'conta_pagar_id',
+        'texto': f"{_c('f.fornecedor_nome')} || ' ' || {_c('t.conta_pagar_historico')}",
+        'joins': 'LEFT JOIN fornecedor f ON f.fornecedor_id = t.fornecedor_id',
+        'colunas': ('fornecedor_id', 'conta_pagar_historico'),
+        'relacoes': (
+            ('fornecedor', ('fornecedor_nome',), 'SELECT conta_pagar_id FROM conta_pagar WHERE fornecedor_id = {r}.fornecedor_id'),
+        ),
+    },
+    'contas_receber': {
+        'chave': 'contas_receber_id',
+        'texto': f"{_c('c.cliente_nome')} || ' ' || {_c('t.contas_receber_historico')}",
+        'joins': 'LEFT JOIN cliente c ON c.cliente_id = t.cliente_id',
+        'colunas': ('cliente_id', 'contas_receber_historico'),
+        'relacoes': (
+            ('cliente', ('cliente_nome',), 'SELECT contas_receber_id FROM contas_receber WHERE cliente_id = {r}.cliente_id'),
+        ),
+    },
+    'produto': {
+        'chave': 'produto_id',
+        'texto': f"{_c('t.produto_nome')} || ' ' || {_c('f.fornecedor_nome')} || ' ' || {_c('g.grupo_mercadoria_nome')}",
+        'joins': (
+            'LEFT JOIN fornecedor f ON f.fornecedor_id = t.fornecedor_id '
+            'LEFT JOIN grupo_mercadoria g ON g.grupo_mercadoria_id = t.grupo_mercadoria_id'
+        ),
+        'colunas': ('produto_nome', 'fornecedor_id', 'grupo_mercadoria_id'),
+        'relacoes': (
+            ('fornecedor', ('fornecedor_nome',), 'SELECT produto_id FROM produto WHERE fornecedor_id = {r}.fornecedor_id'),
+            (
+                'grupo_mercadoria', ('grupo_mercadoria_nome',),
+                'SELECT produto_id FROM produto WHERE grupo_mercadoria_id = {r}.grupo_mercadoria_id',
+            ),
+        ),
+    },
+    'compra': {
+        'chave': 'compra_id',
+        'texto': " || ' ' || ".join((
+            _c('t.compra_numero'),
+            _c('f.fornecedor_nome'),
+            _c('e.empresa_nome'),
+            _c('pc.plano_conta_nome'),
+            _c('pc.plano_conta_numero'),
+            _c('t.compra_prazo_pagamento'),
+            _c(
+                "(SELECT group_concat(coalesce(p.produto_nome, '') || ' ' || coalesce(g.grupo_mercadoria_nome, ''), ' ') "
+                'FROM compra_item ci JOIN produto p ON p.produto_id = ci.produto_id '
+                'LEFT JOIN grupo_mercadoria g ON g.grupo_mercadoria_id = p.grupo_mercadoria_id '
+                'WHERE ci.compra_id = t.compra_id)'
+            ),
+            _c(
+                "(SELECT group_concat(coalesce(v.veiculo_placa, '') || ' ' || coalesce(fu.funcionario_nome, ''), ' ') "
+                'FROM romaneio r JOIN veiculo v ON v.veiculo_id = r.veiculo_id '
+                'JOIN funcionario fu ON fu.funcionario_id = r.funcionario_id '
+                'WHERE r.compra_id = t.compra_id)'
+            ),
+        )),
+        'joins': (
+            'LEFT JOIN fornecedor f ON f.fornecedor_id = t.fornecedor_id '
+            'LEFT JOIN empresa e ON e.empresa_id = t.empresa_id '
+            'LEFT JOIN plano_conta pc ON pc.plano_conta_id = t.plano_conta_id'
+        ),
+        'colunas': ('compra_numero', 'fornecedor_id', 'empresa_id', 'plano_conta_id', 'compra_prazo_pagamento'),
+        'relacoes': (
+            ('fornecedor', ('fornecedor_nome',), 'SELECT compra_id FROM compra WHERE fornecedor_id = {r}.fornecedor_id'),
+            ('empresa', ('empresa_nome',), 'SELECT compra_id FROM compra WHERE empresa_id = {r}.empresa_id'),
+            (
+                'plano_conta', ('plano_conta_nome', 'plano_conta_numero'),
+                'SELECT compra_id FROM compra WHERE plano_conta_id = {r}.plano_conta_id',
+            ),
+            ('compra_item', None, 'SELECT {r}.compra_id'),
+            (
+                'produto', ('produto_nome', 'grupo_mercadoria_id'),
+                'SELECT compra_id FROM compra_item WHERE produto_id = {r}.produto_id',
+            ),
+            (
+                'grupo_mercadoria', ('grupo_mercadoria_nome',),
+                'SELECT ci.compra_id FROM compra_item ci JOIN produto p ON p.produto_id = ci.produto_id '
+                'WHERE p.grupo_mercadoria_id = {r}.grupo_mercadoria_id',
+            ),
+            ('romaneio', None, 'SELECT {r}.compra_id'),
+            ('veiculo', ('veiculo_placa',), 'SELECT compra_id FROM romaneio WHERE veiculo_id = {r}.veiculo_id'),
+            ('funcionario', ('funcionario_nome',), 'SELECT compra_id FROM romaneio WHERE funcionario_id = {r}.funcionario_id'),
+        ),
+    },
+}
+
+# Colunas dos filhos cuja alteração muda o texto do pai.
+COLUNAS_FILHOS = {
+    'compra_item': ('compra_id', 'produto_id'),
+    'romaneio': ('compra_id', 'veiculo_id', 'funcionario_id'),
+}
+
+
+def tabela_busca(tabela):
+    return f'busca_{tabela}'
+
+
+def _mudou(colunas):
+    return ' OR '.join(f'old.{coluna} IS NOT new.{coluna}' for coluna in colunas)
+
+
+def _inserir(tabela, filtro):
+    indice = INDICES[tabela]
+    return (
+        f"INSERT INTO {tabela_busca(tabela)}(rowid, texto) SELECT t.{indice['chave']}, {indice['texto']} "
+        f"FROM {tabela} t {indice['joins']} WHERE t.{indice['chave']} {filtro};"
+    )
+
+
+def _refazer(tabela, selecao):
+    return f'DELETE FROM {tabela_busca(tabela)} WHERE rowid IN ({selecao}); ' + _inserir(tabela, f'IN ({selecao})')
+
+
+def sql_triggers(tabela):
+    """CREATE TRIGGER que mantêm busca_<tabela> em dia."""
+    indice, fts, chave = INDICES[tabela], tabela_busca(tabela), INDICES[tabela]['chave']
+    comandos = [
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabela} BEGIN {_inserir(tabela, f"= new.{chave}")} END;',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabela} BEGIN DELETE FROM {fts} WHERE rowid = old.{chave}; END;',
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {', '.join(indice['colunas'])} ON {tabela} "
+        f"WHEN {_mudou(indice['colunas'])} "
+        f'BEGIN DELETE FROM {fts} WHERE rowid = old.{chave}; {_inserir(tabela, f"= new.{chave}")} END;',
+    ]
+    for relacionada, colunas, selecao in indice['relacoes']:
+        nome = f'{fts}_{relacionada}'
+        novo, antigo = selecao.format(r='new'), selecao.format(r='old')
+        if colunas is None:
+            filhos = COLUNAS_FILHOS[relacionada]
+            comandos += [
+                f'CREATE TRIGGER {nome}_ai AFTER INSERT ON {relacionada} BEGIN {_refazer(tabela, novo)} END;',
+                f'CREATE TRIGGER {nome}_ad AFTER DELETE ON {relacionada} BEGIN {_refazer(tabela, antigo)} END;',
+                f"CREATE TRIGGER {nome}_au AFTER UPDATE OF {', '.join(filhos)} ON {relacionada} WHEN {_mudou(filhos)} "
+                f'BEGIN {_refazer(tabela, antigo)} {_refazer(tabela, novo)} END;',
+            ]
+        else:
+            comandos.append(
+                f"CREATE TRIGGER {nome}_au AFTER UPDATE OF {', '.join(colunas)} ON {relacionada} "
+                f'WHEN {_mudou(colunas)} BEGIN {_refazer(tabela, novo)} END;'
+            )
+    return comandos
+
+
+def _tabelas_existentes(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'busca%'")
+    return {nome for nome, in cursor.fetchall()}
+
+
+def remover_triggers(using='default'):
+    """Remove os triggers das tabelas de busca (antes de um migrate)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'busca%'")
+        for nome, in cursor.fetchall():
+            cursor.execute(f'DROP TRIGGER {nome}')
+
+
+def instalar(using='default', refazer_texto=False):
+    """
+    Recria os triggers das tabelas de busca existentes e, com
+    `refazer_texto`, preenche as tabelas de novo a partir dos modelos.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        existentes = _tabelas_existentes(cursor)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'busca%'")
+        triggers = {nome for nome, in cursor.fetchall()}
+        for tabela in INDICES:
+            if tabela_busca(tabela) not in existentes:
+                continue
+            for comando in sql_triggers(tabela):
+                if comando.split()[2] not in triggers:
+                    cursor.execute(comando)
+            if refazer_texto:
+                cursor.execute(f'DELETE FROM {tabela_busca(tabela)}')
+                cursor.execute(_inserir(tabela, 'IS NOT NULL'))
+
+
+_disponiveis = {}
+
+
+def disponivel(model, using='default'):
+    """Indica se o modelo tem tabela de busca neste banco."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or model._meta.db_table not in INDICES:
+        return False
+    if using not in _disponiveis:
+        with connection.cursor() as cursor:
+            _disponiveis[using] = _tabelas_existentes(cursor)
+    return tabela_busca(model._meta.db_table) in _disponiveis[using]
+
+
+def expressao(termo):
+    """Consulta FTS5 em que cada palavra de `termo` casa por prefixo, ou None se não houver palavras."""
+    procuradas = palavras(termo)
+    if not procuradas:
+        return None
+    return ' '.join(f'"{palavra}"*' for palavra in procuradas)
+
+
+class BuscaTextualAdminMixin:
+    """Busca do changelist pela tabela FTS5 do modelo (ver o topo do módulo)."""
+
+    def get_search_results(self, request, queryset, search_term):
+        consulta = expressao(search_term)
+        if consulta is None or requisicao_autocomplete(request) or not disponivel(self.model, queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        fts = tabela_busca(self.model._meta.db_table)
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (consulta,))), False
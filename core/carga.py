@@ -0,0 +1,369 @@
+# core/carga.py
+#
+# Gerador de carga HTTP (manage.py teste_carga), feito só com asyncio e a
+# biblioteca padrão.
+#
+# Cada usuário virtual faz login no admin e repete fluxos sorteados por peso:
+# navegar por changelists com filtros, abrir vendas, gravar uma venda com
+# muitos itens, consultar os endpoints de preço e dar baixa em contas. Cada
+# requisição é registrada com o nome do passo, a latência e o resultado; no
+# fim saem a vazão, os percentis de latência e as taxas de erro, com os
+# "database is locked" do SQLite contados à parte.
+#
+# As requisições usam "Connection: close" (uma conexão por requisição): é o
+# que funciona igual com runserver, gunicorn ou uwsgi, e em localhost o custo
+# da conexão é desprezível perto do da view.
+
+import asyncio
+import random
+import re
+import time
+from datetime import date
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.urls import reverse
+
+from .diagnostico import percentil
+from .models import Cfop, Cliente, ContaPagar, ContasReceber, PlanoConta, Produto, Venda
+
+PESOS_PADRAO = {
+    'navegar': 40,
+    'abrir_venda': 25,
+    'precos': 20,
+    'salvar_venda': 10,
+    'baixas': 5,
+}
+
+CHANGELISTS = (
+    ('caixa', ''),
+    ('caixa', 'p=5'),
+    ('contapagar', 'status_pagamento=pendente_atrasada'),
+    ('contasreceber', 'status_recebimento=pendente_a_vencer'),
+    ('contasreceber', 'status_recebimento=recebida'),
+    ('produto', ''),
+    ('compra', ''),
+    ('venda', ''),
+    ('vendaitem', ''),
+    ('pagamento', ''),
+    ('recebimento', ''),
+)
+
+_BLOQUEIO = b'database is locked'
+_METRICA_BLOQUEIOS = re.compile(rb'^compufour_sqlite_bloqueios_total(?:\{\})? (\S+)$', re.M)
+
+
+# -----------------------------------------------------------------------------
+# Cliente HTTP mínimo
+# -----------------------------------------------------------------------------
+
+class Resposta:
+    def __init__(self, status, cabecalhos, corpo):
+        self.status = status
+        self.cabecalhos = cabecalhos
+        self.corpo = corpo
+
+
+class ClienteHttp:
+    """HTTP/1.1 sobre asyncio.open_connection, com cookies e token CSRF."""
+
+    def __init__(self, url_base, timeout=60):
+        partes = urlsplit(url_base)
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def requisitar(self, metodo, caminho, dados=None):
+        corpo = urlencode(dados or {}, doseq=True).encode() if metodo == 'POST' else b''
+        linhas = [
+            f'{metodo} {caminho} HTTP/1.1',
+            f'Host: {self.host}:{self.porta}',
+            'Connection: close',
+            'User-Agent: compufour-teste-carga',
+        ]
+        if self.cookies:
+            linhas.append('Cookie: ' + '; '.join(f'{nome}={valor}' for nome, valor in self.cookies.items()))
+        if metodo == 'POST':
+            linhas += [
+                'Content-Type: application/x-www-form-urlencoded',
+                f'Content-Length: {len(corpo)}',
+                f"X-CSRFToken: {self.cookies.get('csrftoken', '')}",
+                f'Referer: http://{self.host}:{self.porta}{caminho}',
+            ]
+        pedido = ('\r\n'.join(linhas) + '\r\n\r\n').encode() + corpo
+        return await asyncio.wait_for(self._trocar(pedido), self.timeout)
+
+    async def _trocar(self, pedido):
+        leitor, escritor = await asyncio.open_connection(self.host, self.porta)
+        try:
+            escritor.write(pedido)
+            await escritor.drain()
+            bruto = await leitor.read()
+        finally:
+            escritor.close()
+        cabeca, _, corpo = bruto.partition(b'\r\n\r\n')
+        linhas = cabeca.decode('latin-1').split('\r\n')
+        status = int(linhas[0].split()[1])
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            nome, _, valor = linha.partition(':')
+            nome, valor = nome.strip().lower(), valor.strip()
+            if nome == 'set-cookie':
+                for morsel in SimpleCookie(valor).values():
+                    self.cookies[morsel.key] = morsel.value
+            cabecalhos[nome] = valor
+        if cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+            corpo = _juntar_blocos(corpo)
+        return Resposta(status, cabecalhos, corpo)
+
+
+def _juntar_blocos(corpo):
+    partes = []
+    while corpo:
+        tamanho, _, resto = corpo.partition(b'\r\n')
+        tamanho = int(tamanho.split(b';')[0] or b'0', 16)
+        if not tamanho:
+            break
+        partes.append(resto[:tamanho])
+        corpo = resto[tamanho + 2:]
+    return b''.join(partes)
+
+
+# -----------------------------------------------------------------------------
+# Estatísticas
+# -----------------------------------------------------------------------------
+
+class Estatisticas:
+    def __init__(self):
+        self.passos = {}
+        self.fluxos = {}
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    def registrar(self, passo, latencia, erro=None, bloqueio=False):
+        dados = self.passos.setdefault(passo, {'latencias': [], 'erros': {}, 'bloqueios': 0})
+        dados['latencias'].append(latencia)
+        if erro:
+            dados['erros'][erro] = dados['erros'].get(erro, 0) + 1
+        if bloqueio:
+            dados['bloqueios'] += 1
+
+    def contar_fluxo(self, fluxo):
+        self.fluxos[fluxo] = self.fluxos.get(fluxo, 0) + 1
+
+    def resumo(self):
+        duracao = (self.fim or time.perf_counter()) - self.inicio
+        passos = {}
+        for passo, dados in sorted(self.passos.items()):
+            latencias = sorted(dados['latencias'])
+            erros = sum(dados['erros'].values())
+            passos[passo] = {
+                'requisicoes': len(latencias),
+                'por_segundo': round(len(latencias) / duracao, 2),
+                **{f'p{p}_ms': round(percentil(latencias, p) * 1000, 1) for p in (50, 90, 95, 99)},
+                'max_ms': round(latencias[-1] * 1000, 1),
+                'erros': erros,
+                'taxa_erro': round(erros / len(latencias), 4),
+                'bloqueios': dados['bloqueios'],
+                'tipos_erro': dados['erros'],
+            }
+        total = sum(linha['requisicoes'] for linha in passos.values())
+        erros = sum(linha['erros'] for linha in passos.values())
+        todas = sorted(latencia for dados in self.passos.values() for latencia in dados['latencias'])
+        return {
+            'duracao_s': round(duracao, 2),
+            'requisicoes': total,
+            'por_segundo': round(total / duracao, 2) if duracao else 0,
+            'fluxos': self.fluxos,
+            'erros': erros,
+            'taxa_erro': round(erros / total, 4) if total else 0,
+            'bloqueios': sum(linha['bloqueios'] for linha in passos.values()),
+            **{f'p{p}_ms': round((percentil(todas, p) or 0) * 1000, 1) for p in (50, 95, 99)},
+            'passos': passos,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Dados usados pelos fluxos
+# -----------------------------------------------------------------------------
+
+def montar_catalogo(amostra=500):
+    """Ids e URLs usados pelos fluxos, lidos do banco antes de começar a carga."""
+
+    def ids(queryset):
+        return list(queryset.order_by('-pk').values_list('pk', flat=True)[:amostra])
+
+    return {
+        'changelists': [
+            reverse(f'admin:core_{modelo}_changelist') + (f'?{consulta}' if consulta else '')
+            for modelo, consulta in CHANGELISTS
+        ],
+        'venda_add': reverse('admin:core_venda_add'),
+        'venda_change': reverse('admin:core_venda_change', args=[0]).replace('/0/', '/{}/'),
+        'vendas': ids(Venda.objects.all()),
+        'produtos': ids(Produto.objects.all()),
+        'clientes': ids(Cliente.objects.all()),
+        'cfops_venda': ids(Cfop.objects.filter(cfop_integracao__in=('receber', 'caixa'))),
+        'plano_receita': PlanoConta.objects.filter(plano_conta_numero__startswith='1').values_list('pk', flat=True).last(),
+        'contas_receber': ids(ContasReceber.objects.filter(recebimento__isnull=True)),
+        'contas_pagar': ids(ContaPagar.objects.filter(pagamento__isnull=True)),
+        'contasreceber_changelist': reverse('admin:core_contasreceber_changelist'),
+        'contapagar_changelist': reverse('admin:core_contapagar_changelist'),
+        'preco_produto': reverse('core:get_preco_produto'),
+        'preco_convenio': reverse('core:get_preco_convenio'),
+        'precos_lote': reverse('core:get_precos_lote'),
+        'login': reverse('admin:login'),
+    }
+
+
+# -----------------------------------------------------------------------------
+# Usuários virtuais e fluxos
+# -----------------------------------------------------------------------------
+
+class UsuarioVirtual:
+    def __init__(self, numero, url_base, catalogo, estatisticas, itens_por_venda=20, pausa=0.0, seed=None):
+        self.numero = numero
+        self.http = ClienteHttp(url_base)
+        self.catalogo = catalogo
+        self.estatisticas = estatisticas
+        self.itens_por_venda = itens_por_venda
+        self.pausa = pausa
+        self.random = random.Random(seed)
+
+    async def passo(self, nome, metodo, caminho, dados=None, esperado=(200,)):
+        inicio = time.perf_counter()
+        erro, bloqueio = None, False
+        try:
+            resposta = await self.http.requisitar(metodo, caminho, dados)
+        except asyncio.TimeoutError:
+            erro = 'timeout'
+        except (OSError, ValueError, IndexError) as exc:
+            erro = exc.__class__.__name__
+        else:
+            bloqueio = _BLOQUEIO in resposta.corpo
+            if bloqueio:
+                erro = 'database is locked'
+            elif resposta.status not in esperado:
+                erro = f'HTTP {resposta.status}'
+        self.estatisticas.registrar(nome, time.perf_counter() - inicio, erro, bloqueio)
+        return erro is None
+
+    async def login(self, usuario, senha):
+        caminho = self.catalogo['login']
+        await self.http.requisitar('GET', caminho)
+        return await self.passo('login', 'POST', caminho, {
+            'username': usuario,
+            'password': senha,
+            'csrfmiddlewaretoken': self.http.cookies.get('csrftoken', ''),
+            'next': '/admin/',
+        }, esperado=(302,))
+
+    async def executar(self, fluxos, pesos, prazo):
+        while time.perf_counter() < prazo:
+            nome = self.random.choices(fluxos, weights=pesos)[0]
+            await getattr(self, f'fluxo_{nome}')()
+            self.estatisticas.contar_fluxo(nome)
+            if self.pausa:
+                await asyncio.sleep(self.random.uniform(0, self.pausa))
+
+    async def fluxo_navegar(self):
+        await self.passo('changelist', 'GET', self.random.choice(self.catalogo['changelists']))
+
+    async def fluxo_abrir_venda(self):
+        if self.catalogo['vendas']:
+            pk = self.random.choice(self.catalogo['vendas'])
+            await self.passo('venda_change', 'GET', self.catalogo['venda_change'].format(pk))
+
+    async def fluxo_precos(self):
+        catalogo = self.catalogo
+        produto = self.random.choice(catalogo['produtos'])
+        cliente = self.random.choice(catalogo['clientes'])
+        await self.passo('preco_produto', 'POST', catalogo['preco_produto'], {'produto_id': produto})
+        await self.passo('preco_convenio', 'POST', catalogo['preco_convenio'], {
+            'cliente_id': cliente, 'produto_id': produto,
+        }, esperado=(200, 404))
+        pares = ','.join(f'{cliente}:{self.random.choice(catalogo["produtos"])}' for _ in range(10))
+        await self.passo('precos_lote', 'GET', f"{catalogo['precos_lote']}?{urlencode({'pares': pares})}")
+
+    async def fluxo_salvar_venda(self):
+        catalogo = self.catalogo
+        if not (catalogo['plano_receita'] and catalogo['cfops_venda']):
+            return
+        await self.passo('venda_add', 'GET', catalogo['venda_add'])
+        hoje = date.today().isoformat()
+        prefixo = 'vendaitem_set'
+        dados = {
+            'plano_conta': catalogo['plano_receita'],
+            'venda_data_emissao': hoje,
+            'venda_data_vencimento': hoje,
+            f'{prefixo}-TOTAL_FORMS': self.itens_por_venda,
+            f'{prefixo}-INITIAL_FORMS': 0,
+            f'{prefixo}-MIN_NUM_FORMS': 0,
+            f'{prefixo}-MAX_NUM_FORMS': 1000,
+            'csrfmiddlewaretoken': self.http.cookies.get('csrftoken', ''),
+            '_save': 'Salvar',
+        }
+        for indice in range(self.itens_por_venda):
+            dados.update({
+                f'{prefixo}-{indice}-produto': self.random.choice(catalogo['produtos']),
+                f'{prefixo}-{indice}-cliente': self.random.choice(catalogo['clientes']),
+                f'{prefixo}-{indice}-cfop': self.random.choice(catalogo['cfops_venda']),
+                f'{prefixo}-{indice}-venda_item_qtd': self.random.randint(1, 20),
+                f'{prefixo}-{indice}-venda_item_preco': f'{self.random.uniform(2, 60):.2f}',
+                f'{prefixo}-{indice}-venda_item_volume': 1,
+            })
+        await self.passo('venda_salvar', 'POST', catalogo['venda_add'], dados, esperado=(302,))
+
+    async def fluxo_baixas(self):
+        catalogo = self.catalogo
+        if self.random.random() < 0.5:
+            contas, acao, url = catalogo['contas_receber'], 'receber_contas_selecionadas', catalogo['contasreceber_changelist']
+        else:
+            contas, acao, url = catalogo['contas_pagar'], 'pagar_contas_selecionadas', catalogo['contapagar_changelist']
+        selecionadas = [contas.pop() for _ in range(min(5, len(contas)))]
+        if not selecionadas:
+            return
+        await self.passo(acao, 'POST', url, {
+            'action': acao,
+            ACTION_CHECKBOX_NAME: selecionadas,
+            'post': 'sim',
+            'index': 0,
+            'csrfmiddlewaretoken': self.http.cookies.get('csrftoken', ''),
+        }, esperado=(302,))
+
+
+async def _bloqueios_no_servidor(url_base):
+    """Valor de compufour_sqlite_bloqueios_total em /metrics (None se indisponível)."""
+    try:
+        resposta = await ClienteHttp(url_base, timeout=10).requisitar('GET', '/metrics')
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        return None
+    encontrado = _METRICA_BLOQUEIOS.search(resposta.corpo) if resposta.status == 200 else None
+    return float(encontrado.group(1)) if encontrado else None
+
+
+async def executar_carga(url_base, catalogo, usuario, senha, usuarios=10, duracao=60, pesos=None,
+                         itens_por_venda=20, pausa=0.0, rampa=0.0, seed=42):
+    """Roda a carga e devolve o resumo (ver Estatisticas.resumo)."""
+    pesos = pesos or PESOS_PADRAO
+    fluxos = list(pesos)
+    estatisticas = Estatisticas()
+    bloqueios_antes = await _bloqueios_no_servidor(url_base)
+
+    async def rodar(numero):
+        await asyncio.sleep(rampa * numero / max(usuarios, 1))
+        virtual = UsuarioVirtual(numero, url_base, catalogo, estatisticas, itens_por_venda, pausa, seed + numero)
+        if await virtual.login(usuario, senha):
+            await virtual.executar(fluxos, [pesos[fluxo] for fluxo in fluxos], prazo)
+
+    prazo = time.perf_counter() + rampa + duracao
+    await asyncio.gather(*(rodar(numero) for numero in range(usuarios)))
+    estatisticas.fim = time.perf_counter()
+
+    resumo = estatisticas.resumo()
+    bloqueios_depois = await _bloqueios_no_servidor(url_base)
+    if bloqueios_antes is not None and bloqueios_depois is not None:
+        resumo['bloqueios_servidor'] = bloqueios_depois - bloqueios_antes
+    return resumo
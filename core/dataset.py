@@ -0,0 +1,462 @@
+# core/dataset.py
+#
+# Massa de dados sintética para testes de desempenho (manage.py generate_dataset).
+#
+# Tudo é gerado com um random.Random(seed), então a mesma escala, semente e
+# data final produzem sempre o mesmo banco. Os documentos são gravados com
+# bulk_create e chaves primárias explícitas: nenhum sinal é disparado. Os
+# lançamentos que os sinais fariam (contas a pagar, contas a receber, caixa
+# de vendas, pagamentos e recebimentos) são montados em lote com os mesmos
+# históricos e números de documento usados em core/signals.py e core/models.py.
+# No fim, os resumos são reconstruídos com core.resumos.RESUMOS. Os cadastros
+# de referência gravados em lote são invalidados em core.referencias.
+
+import random
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import referencias
+from .models import (
+    Caixa, Cfop, Cliente, ClienteConvenioGrupoMercadoria, Compra, CompraItem, ContaPagar, ContasReceber,
+    Convenio, ConvenioGrupoMercadoria, Empresa, Fornecedor, Funcionario, GrupoMercadoria, Pagamento,
+    PlanoConta, Produto, Recebimento, Romaneio, RotuloGravadoMixin, Veiculo, Venda, VendaItem,
+)
+from .versoes import invalidar_por_modelo
+
+CENTAVO = Decimal('0.01')
+
+# Quantidades por unidade de escala. Com --scale 1 são ~16 mil linhas;
+# --scale 60 passa de 1 milhão.
+POR_ESCALA = {
+    'fornecedores': 10,
+    'clientes': 100,
+    'produtos': 40,
+    'funcionarios': 2,
+    'veiculos': 2,
+    'compras': 100,
+    'vendas': 1000,
+    'despesas_dia': 0.2,
+}
+
+LOTE = 5000
+
+GRUPOS = (
+    'Hortifruti', 'Frios', 'Laticínios', 'Bebidas', 'Mercearia', 'Limpeza',
+    'Higiene', 'Padaria', 'Carnes', 'Congelados', 'Pet', 'Descartáveis',
+)
+UNIDADES = ('UN', 'CX', 'KG', 'FD', 'PCT', 'LT')
+PRAZOS = ('0', '30', '30,60', '30,60,90', '28,56', '15,30,45')
+FORMAS_PAGAMENTO = ('Boleto', 'Transferência', 'Dinheiro', 'Cheque')
+MODELOS_VEICULO = ('VW Delivery', 'Mercedes Accelo', 'Iveco Daily', 'Ford Cargo', 'Fiat Ducato')
+
+# (número, nome) do plano de contas sintético.
+PLANO_CONTAS = (
+    ('1', 'Receitas'),
+    ('1.01', 'Vendas a prazo'),
+    ('1.02', 'Vendas à vista'),
+    ('2', 'Outras receitas'),
+    ('2.01', 'Juros recebidos'),
+    ('3', 'Custos'),
+    ('3.01', 'Compras de mercadorias'),
+    ('3.02', 'Fretes'),
+    ('4', 'Despesas'),
+    ('4.01', 'Salários'),
+    ('4.02', 'Combustível'),
+    ('4.03', 'Manutenção de veículos'),
+    ('4.04', 'Aluguel'),
+    ('4.05', 'Energia elétrica'),
+    ('5', 'Bancos'),
+    ('5.01', 'Conta movimento'),
+)
+DESPESAS = ('4.01', '4.02', '4.03', '4.04', '4.05', '3.02')
+
+# (código, operação, integração, tipo, peso nos itens de venda)
+CFOPS = (
+    ('5102', 'Venda de mercadoria a prazo', Cfop.IntegracaoChoice.RECEBER, Cfop.TipoCfop.SAIDA, 70),
+    ('5101', 'Venda de mercadoria à vista', Cfop.IntegracaoChoice.CAIXA, Cfop.TipoCfop.SAIDA, 20),
+    ('1202', 'Devolução de venda', Cfop.IntegracaoChoice.ESTOQUE, Cfop.TipoCfop.ENTRADA, 7),
+    ('5910', 'Bonificação', Cfop.IntegracaoChoice.ESTOQUE, Cfop.TipoCfop.SAIDA, 3),
+    ('1102', 'Compra para comercialização', Cfop.IntegracaoChoice.PAGAR, Cfop.TipoCfop.ENTRADA, 0),
+)
+
+
+def _dinheiro(valor):
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+class _Chaves:
+    """Próxima chave primária de cada modelo (as chaves são atribuídas antes do bulk_create)."""
+
+    def __init__(self):
+        self._proximas = {}
+
+    def __call__(self, model):
+        if model not in self._proximas:
+            maior = model.objects.aggregate(maior=Max('pk'))['maior'] or 0
+            self._proximas[model] = maior + 1
+        pk = self._proximas[model]
+        self._proximas[model] = pk + 1
+        return pk
+
+
+class GeradorDataset:
+    def __init__(self, escala=1, anos=3, fim=None, seed=42, saida=None):
+        self.escala = escala
+        self.anos = anos
+        self.fim = fim
+        self.inicio = fim - timedelta(days=365 * anos - 1)
+        self.dias = (fim - self.inicio).days + 1
+        self.random = random.Random(seed)
+        self.saida = saida or (lambda mensagem: None)
+        self.chave = _Chaves()
+        self.contagens = {}
+
+    def quantidade(self, nome):
+        return max(1, round(POR_ESCALA[nome] * self.escala))
+
+    def data_aleatoria(self, inicio=None):
+        inicio = inicio or self.inicio
+        dias = (self.fim - inicio).days
+        return inicio + timedelta(days=self.random.randint(0, max(dias, 0)))
+
+    def _gravar(self, model, objetos):
+        if objetos:
+            if issubclass(model, RotuloGravadoMixin):
+                # As relações já estão nos objetos: montar o rótulo não consulta o banco.
+                for obj in objetos:
+                    obj.atualizar_rotulo()
+            model.objects.bulk_create(objetos, batch_size=1000)
+            if model in referencias.MODELOS:
+                referencias.invalidar(model)
+            # bulk_create não dispara sinais: as contagens dos changelists (e os
+            # demais caches ligados ao modelo) de um servidor no ar ficariam velhas.
+            invalidar_por_modelo(model)
+            self.contagens[model.__name__] = self.contagens.get(model.__name__, 0) + len(objetos)
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def executar(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA synchronous = OFF')
+        etapas = (
+            ('Cadastros', self.gerar_cadastros),
+            ('Compras', self.gerar_compras),
+            ('Vendas', self.gerar_vendas),
+            ('Pagamentos e recebimentos', self.gerar_baixas),
+            ('Despesas no caixa', self.gerar_despesas),
+        )
+        for descricao, etapa in etapas:
+            with transaction.atomic():
+                etapa()
+            self.saida(f'{descricao}: ok')
+        return self.contagens
+
+    # ------------------------------------------------------------------
+    # Cadastros
+    # ------------------------------------------------------------------
+
+    def gerar_cadastros(self):
+        r = self.random
+        self.empresas = [Empresa(pk=self.chave(Empresa), empresa_nome=f'Empresa {i}') for i in (1, 2)]
+        self._gravar(Empresa, self.empresas)
+
+        self.plano = {}
+        for numero, nome in PLANO_CONTAS:
+            conta = PlanoConta(pk=self.chave(PlanoConta), plano_conta_numero=numero, plano_conta_nome=nome)
+            conta.save()
+            self.plano[numero] = conta
+        self.contagens['PlanoConta'] = len(PLANO_CONTAS)
+
+        self.cfops = {}
+        self.pesos_cfop = []
+        for codigo, operacao, integracao, tipo, peso in CFOPS:
+            cfop = Cfop(
+                pk=self.chave(Cfop), cfop_codigo=codigo, cfop_operacao=operacao,
+                cfop_integracao=integracao, cfop_tipo=tipo,
+            )
+            cfop.atualizar_indicadores()
+            self.cfops[codigo] = cfop
+            if peso:
+                self.pesos_cfop.append((cfop, peso))
+        self._gravar(Cfop, list(self.cfops.values()))
+
+        self.grupos = [GrupoMercadoria(pk=self.chave(GrupoMercadoria), grupo_mercadoria_nome=nome) for nome in GRUPOS]
+        self._gravar(GrupoMercadoria, self.grupos)
+
+        self.fornecedores = [
+            Fornecedor(pk=self.chave(Fornecedor), fornecedor_nome=f'Fornecedor {i:05d}')
+            for i in range(1, self.quantidade('fornecedores') + 1)
+        ]
+        self._gravar(Fornecedor, self.fornecedores)
+
+        self.clientes = [
+            Cliente(pk=self.chave(Cliente), cliente_nome=f'Cliente {i:06d}')
+            for i in range(1, self.quantidade('clientes') + 1)
+        ]
+        self._gravar(Cliente, self.clientes)
+
+        self.produtos = []
+        for i in range(1, self.quantidade('produtos') + 1):
+            custo = _dinheiro(r.uniform(2, 120))
+            self.produtos.append(Produto(
+                pk=self.chave(Produto),
+                fornecedor=r.choice(self.fornecedores),
+                grupo_mercadoria=r.choice(self.grupos),
+                produto_nome=f'Produto {i:05d}',
+                produto_unidade_medida=r.choice(UNIDADES),
+                produto_preco=_dinheiro(custo * Decimal(str(round(r.uniform(1.15, 1.6), 2)))),
+                produto_preco_custo=custo,
+            ))
+        self._gravar(Produto, self.produtos)
+
+        self.funcionarios = [
+            Funcionario(pk=self.chave(Funcionario), funcionario_nome=f'Motorista {i:03d}')
+            for i in range(1, self.quantidade('funcionarios') + 1)
+        ]
+        self._gravar(Funcionario, self.funcionarios)
+        self.veiculos = [
+            Veiculo(
+                pk=self.chave(Veiculo), veiculo_modelo=r.choice(MODELOS_VEICULO),
+                veiculo_placa=f'SIN{i:04d}',
+            )
+            for i in range(1, self.quantidade('veiculos') + 1)
+        ]
+        self._gravar(Veiculo, self.veiculos)
+
+        convenios = [
+            Convenio(pk=self.chave(Convenio), convenio_nome=f'Convênio {i}', convenio_preco=round(r.uniform(3, 40), 2))
+            for i in range(1, 9)
+        ]
+        self._gravar(Convenio, convenios)
+        ligacoes = []
+        for convenio in convenios:
+            for grupo in r.sample(self.grupos, 4):
+                ligacoes.append(ConvenioGrupoMercadoria(
+                    pk=self.chave(ConvenioGrupoMercadoria), convenio=convenio, grupo_mercadoria=grupo,
+                ))
+        self._gravar(ConvenioGrupoMercadoria, ligacoes)
+        clientes_convenio = []
+        for cliente in self.clientes:
+            if r.random() < 0.4:
+                for ligacao in r.sample(ligacoes, r.randint(1, 2)):
+                    clientes_convenio.append(ClienteConvenioGrupoMercadoria(
+                        pk=self.chave(ClienteConvenioGrupoMercadoria), cliente=cliente,
+                        convenio_grupo_mercadoria=ligacao,
+                    ))
+        self._gravar(ClienteConvenioGrupoMercadoria, clientes_convenio)
+
+    # ------------------------------------------------------------------
+    # Compras, contas a pagar e romaneios
+    # ------------------------------------------------------------------
+
+    def gerar_compras(self):
+        r = self.random
+        cfop_compra = self.cfops['1102']
+        plano_compra = self.plano['3.01']
+        compras, itens, contas = [], [], []
+        self.romaneios = []
+        self.contas_pagar = []
+        for numero in range(1, self.quantidade('compras') + 1):
+            entrada = self.data_aleatoria()
+            compra = Compra(
+                pk=self.chave(Compra),
+                empresa=r.choice(self.empresas),
+                fornecedor=r.choice(self.fornecedores),
+                plano_conta=plano_compra,
+                compra_numero=f'{numero:06d}',
+                compra_data_entrada=entrada,
+                compra_data_saida_fornecedor=entrada - timedelta(days=r.randint(0, 3)),
+                compra_prazo_pagamento=r.choice(PRAZOS),
+                compra_data_base=entrada,
+            )
+            compras.append(compra)
+            total = Decimal('0')
+            for produto in r.sample(self.produtos, min(len(self.produtos), r.randint(2, 6))):
+                qtd = Decimal(r.randint(10, 400))
+                preco = _dinheiro(produto.produto_preco_custo * Decimal(str(round(r.uniform(0.9, 1.1), 2))))
+                itens.append(CompraItem(
+                    pk=self.chave(CompraItem), compra=compra, cfop=cfop_compra, produto=produto,
+                    compra_item_qtd=qtd, compra_item_preco=preco, compra_item_volume=int(qtd),
+                ))
+                total += qtd * preco
+            contas.extend(self._contas_para_compra(compra, total))
+
+            self.romaneios.append(Romaneio(
+                pk=self.chave(Romaneio),
+                compra=compra,
+                funcionario=r.choice(self.funcionarios),
+                veiculo=r.choice(self.veiculos),
+                romaneio_data_emissao=min(entrada + timedelta(days=r.randint(0, 3)), self.fim),
+                status=Romaneio.StatusChoices.FECHADO if r.random() < 0.7 else Romaneio.StatusChoices.ABERTO,
+            ))
+        self._gravar(Compra, compras)
+        self._gravar(CompraItem, itens)
+        self._gravar(ContaPagar, contas)
+        self._gravar(Romaneio, self.romaneios)
+        self.contas_pagar = contas
+
+    def _contas_para_compra(self, compra, valor_total):
+        """Mesmas parcelas de signals._atualizar_conta_para_compra."""
+        prazos = [int(parte) for parte in compra.compra_prazo_pagamento.split(',')]
+        valor_total = _dinheiro(valor_total)
+        parcela = _dinheiro(valor_total / len(prazos))
+        valores = [parcela for _ in prazos]
+        valores[-1] = _dinheiro(valores[-1] + valor_total - sum(valores))
+        historico_base = f'Referente à compra Número {compra.compra_numero}'
+        return [
+            ContaPagar(
+                pk=self.chave(ContaPagar),
+                empresa=compra.empresa,
+                fornecedor=compra.fornecedor,
+                compra=compra,
+                plano_conta=compra.plano_conta,
+                conta_pagar_historico=f'{historico_base} - Parcela {indice}/{len(prazos)}',
+                conta_pagar_numero_documento=f'{compra.compra_numero}-{indice:02d}',
+                conta_pagar_data_emissao=compra.compra_data_base,
+                conta_pagar_data_vencimento=compra.compra_data_base + timedelta(days=prazo),
+                conta_pagar_valor=valor,
+            )
+            for indice, (prazo, valor) in enumerate(zip(prazos, valores), start=1)
+        ]
+
+    # ------------------------------------------------------------------
+    # Vendas, contas a receber e caixa das vendas
+    # ------------------------------------------------------------------
+
+    def gerar_vendas(self):
+        total = self.quantidade('vendas')
+        self.contas_receber = []
+        for inicio in range(0, total, LOTE):
+            self._gerar_lote_vendas(min(LOTE, total - inicio))
+
+    def _gerar_lote_vendas(self, quantidade):
+        r = self.random
+        cfops, pesos = zip(*self.pesos_cfop)
+        vendas, itens, contas, caixas = [], [], [], []
+        for _ in range(quantidade):
+            romaneio = r.choice(self.romaneios) if r.random() < 0.9 else None
+            if romaneio:
+                emissao = min(romaneio.romaneio_data_emissao + timedelta(days=r.randint(0, 10)), self.fim)
+            else:
+                emissao = self.data_aleatoria()
+            venda = Venda(
+                pk=self.chave(Venda),
+                romaneio=romaneio,
+                plano_conta=self.plano['1.01'],
+                venda_data_emissao=emissao,
+                venda_data_vencimento=emissao + timedelta(days=r.choice((0, 7, 14, 28))),
+            )
+            vendas.append(venda)
+            empresa = romaneio.compra.empresa if romaneio else self.empresas[0]
+            romaneio_info = str(romaneio) if romaneio else 'Venda sem romaneio'
+            for _ in range(r.randint(1, 8)):
+                cfop = r.choices(cfops, weights=pesos)[0]
+                cliente = r.choice(self.clientes)
+                produto = r.choice(self.produtos)
+                qtd = Decimal(r.randint(1, 50))
+                preco = _dinheiro(produto.produto_preco * Decimal(str(round(r.uniform(0.9, 1.1), 2))))
+                plano = self.plano['1.02'] if cfop.cfop_integracao == Cfop.IntegracaoChoice.CAIXA else self.plano['1.01']
+                item = VendaItem(
+                    pk=self.chave(VendaItem), venda=venda, cfop=cfop, cliente=cliente, produto=produto,
+                    plano_conta=plano, venda_item_qtd=qtd, venda_item_preco=preco, venda_item_volume=int(qtd),
+                )
+                itens.append(item)
+                historico = (
+                    f'{romaneio_info} - Venda ID {venda.pk} - Item ID {item.pk} '
+                    f'- Cliente: {cliente.cliente_nome} - Produto: {produto.produto_nome}'
+                )
+                valor = _dinheiro(qtd * preco)
+                if cfop.cfop_integracao == Cfop.IntegracaoChoice.RECEBER:
+                    contas.append(ContasReceber(
+                        pk=self.chave(ContasReceber), empresa=empresa, cliente=cliente, venda=venda,
+                        plano_conta=plano, contas_receber_historico=historico,
+                        contas_receber_numero_documento=f'V{venda.pk}-I{item.pk}',
+                        contas_receber_data_emissao=emissao,
+                        contas_receber_data_vencimento=venda.venda_data_vencimento,
+                        contas_receber_valor=valor,
+                    ))
+                elif cfop.cfop_integracao == Cfop.IntegracaoChoice.CAIXA:
+                    caixas.append(Caixa(
+                        pk=self.chave(Caixa), empresa=empresa, plano_conta=plano, caixa_data_emissao=emissao,
+                        caixa_historico=historico, caixa_valor_entrada=valor, caixa_valor_saida=Decimal('0.00'),
+                    ))
+        with transaction.atomic():
+            self._gravar(Venda, vendas)
+            self._gravar(VendaItem, itens)
+            self._gravar(ContasReceber, contas)
+            self._gravar(Caixa, caixas)
+        self.contas_receber.extend(
+            (conta.pk, conta.empresa, conta.plano_conta, conta.contas_receber_numero_documento,
+             conta.contas_receber_data_vencimento, conta.contas_receber_valor)
+            for conta in contas
+        )
+
+    # ------------------------------------------------------------------
+    # Pagamentos, recebimentos e lançamentos de caixa correspondentes
+    # ------------------------------------------------------------------
+
+    def gerar_baixas(self):
+        r = self.random
+        pagamentos, caixas = [], []
+        for conta in self.contas_pagar:
+            vencimento = conta.conta_pagar_data_vencimento
+            if vencimento > self.fim or r.random() >= 0.85:
+                continue
+            data = min(vencimento + timedelta(days=r.randint(-3, 5)), self.fim)
+            pagamento = Pagamento(
+                pk=self.chave(Pagamento), conta_pagar=conta, pagamento_data_pagamento=data,
+                pagamento_valor_pago=conta.conta_pagar_valor, pagamento_forma_pagamento=r.choice(FORMAS_PAGAMENTO),
+            )
+            pagamentos.append(pagamento)
+            caixas.append(Caixa(
+                pk=self.chave(Caixa), empresa=conta.empresa, plano_conta=conta.plano_conta, caixa_data_emissao=data,
+                caixa_historico=f'Pagamento #{pagamento.pk} da conta {conta.conta_pagar_numero_documento}',
+                caixa_valor_entrada=Decimal('0'), caixa_valor_saida=conta.conta_pagar_valor,
+            ))
+        self._gravar(Pagamento, pagamentos)
+
+        recebimentos = []
+        for pk, empresa, plano, numero, vencimento, valor in self.contas_receber:
+            if vencimento > self.fim or r.random() >= 0.8:
+                continue
+            data = min(vencimento + timedelta(days=r.randint(0, 10)), self.fim)
+            recebimento = Recebimento(
+                pk=self.chave(Recebimento), contas_receber_id=pk, recebimento_data_recebimento=data,
+                recebimento_valor_recebido=valor, recebimento_forma_recebimento=r.choice(FORMAS_PAGAMENTO),
+            )
+            recebimentos.append(recebimento)
+            caixas.append(Caixa(
+                pk=self.chave(Caixa), empresa=empresa, plano_conta=plano, caixa_data_emissao=data,
+                caixa_historico=f'Recebimento #{recebimento.pk} da conta {numero}',
+                caixa_valor_entrada=valor, caixa_valor_saida=Decimal('0'),
+            ))
+            if len(recebimentos) >= LOTE:
+                self._gravar(Recebimento, recebimentos)
+                recebimentos = []
+        self._gravar(Recebimento, recebimentos)
+        self._gravar(Caixa, caixas)
+
+    def gerar_despesas(self):
+        r = self.random
+        por_dia = POR_ESCALA['despesas_dia'] * self.escala
+        caixas = []
+        for deslocamento in range(self.dias):
+            data = self.inicio + timedelta(days=deslocamento)
+            quantidade = int(por_dia) + (1 if r.random() < por_dia % 1 else 0)
+            for _ in range(quantidade):
+                numero = r.choice(DESPESAS)
+                caixas.append(Caixa(
+                    pk=self.chave(Caixa), empresa=r.choice(self.empresas), plano_conta=self.plano[numero],
+                    caixa_data_emissao=data, caixa_historico=f'{self.plano[numero].plano_conta_nome} {data:%d/%m/%Y}',
+                    caixa_valor_entrada=Decimal('0'), caixa_valor_saida=_dinheiro(r.uniform(50, 3000)),
+                ))
+            if len(caixas) >= LOTE:
+                self._gravar(Caixa, caixas)
+                caixas = []
+        self._gravar(Caixa, caixas)
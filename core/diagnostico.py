@@ -0,0 +1,142 @@
+# core/diagnostico.py
+#
+# Armazenamento local das amostras de diagnóstico (consultas por requisição,
+# rastros de sinais, perfis). Cada tipo de amostra vai para um arquivo JSONL
+# em DIAGNOSTICO_ROOT, com rotação por tamanho: ao passar de `max_bytes`,
+# `nome.jsonl` vira `nome.jsonl.1` (e assim por diante até `arquivos`).
+# Cada linha é gravada com um único write em modo append, o que permite
+# vários processos escrevendo no mesmo arquivo.
+
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+
+_IN_PATTERN = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMERO_PATTERN = re.compile(r'\b\d+\b')
+_ESPACOS_PATTERN = re.compile(r'\s+')
+
+
+def impressao_digital_sql(sql):
+    """SQL normalizado para agrupar consultas repetidas (listas IN e números viram '?')."""
+    sql = _IN_PATTERN.sub('IN (?)', sql)
+    sql = _NUMERO_PATTERN.sub('?', sql)
+    return _ESPACOS_PATTERN.sub(' ', sql).strip()
+
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores já ordenados)."""
+    if not valores:
+        return None
+    posicao = max(math.ceil(p / 100 * len(valores)) - 1, 0)
+    return valores[posicao]
+
+
+class ArmazemJsonl:
+    """Arquivo JSONL com rotação por tamanho, compartilhado entre processos."""
+
+    def __init__(self, nome, max_bytes=5 * 1024 * 1024, arquivos=3):
+        self.nome = nome
+        self.max_bytes = max_bytes
+        self.arquivos = arquivos
+        self._lock = threading.Lock()
+
+    @property
+    def caminho(self):
+        return Path(settings.DIAGNOSTICO_ROOT) / f'{self.nome}.jsonl'
+
+    def _rotacionar(self):
+        caminho = self.caminho
+        for indice in range(self.arquivos - 1, 0, -1):
+            origem = caminho if indice == 1 else caminho.with_name(f'{caminho.name}.{indice - 1}')
+            if origem.exists():
+                os.replace(origem, caminho.with_name(f'{caminho.name}.{indice}'))
+
+    def registrar(self, registro):
+        linha = (json.dumps(registro, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        caminho = self.caminho
+        with self._lock:
+            try:
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    if caminho.stat().st_size + len(linha) > self.max_bytes:
+                        self._rotacionar()
+                except FileNotFoundError:
+                    pass
+                descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(descritor, linha)
+                finally:
+                    os.close(descritor)
+            except OSError:
+                # Diagnóstico nunca deve derrubar a requisição.
+                pass
+
+    def ler(self, limite=20000):
+        """Últimos `limite` registros, do mais antigo para o mais recente."""
+        caminho = self.caminho
+        arquivos = [caminho.with_name(f'{caminho.name}.{i}') for i in range(self.arquivos - 1, 0, -1)] + [caminho]
+        registros = deque(maxlen=limite)
+        for arquivo in arquivos:
+            try:
+                with open(arquivo, encoding='utf-8') as handle:
+                    for linha in handle:
+                        try:
+                            registros.append(json.loads(linha))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                continue
+        return list(registros)
+
+    def limpar(self):
+        caminho = self.caminho
+        for arquivo in [caminho] + [caminho.with_name(f'{caminho.name}.{i}') for i in range(1, self.arquivos)]:
+            try:
+                arquivo.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def armazem(nome):
+    config = getattr(settings, 'DIAGNOSTICO', {})
+    return ArmazemJsonl(nome, max_bytes=config.get('MAX_BYTES', 5 * 1024 * 1024), arquivos=config.get('ARQUIVOS', 3))
+
+
+def resumir_consultas(registros):
+    """Estatísticas por view (percentis de consultas, duração e tempo de banco)."""
+    por_view = {}
+    for registro in registros:
+        chave = (registro.get('view') or registro.get('caminho'), registro.get('acao') or '')
+        por_view.setdefault(chave, []).append(registro)
+
+    linhas = []
+    for (view, acao), amostras in por_view.items():
+        consultas = sorted(a.get('consultas', 0) for a in amostras)
+        duracoes = sorted(a.get('duracao_ms', 0) for a in amostras)
+        tempos_db = sorted(a.get('tempo_db_ms', 0) for a in amostras)
+        repetidas = {}
+        for amostra in amostras:
+            for dup in amostra.get('duplicadas', []):
+                atual = repetidas.get(dup['sql'], 0)
+                repetidas[dup['sql']] = max(atual, dup['vezes'])
+        pior_repetida = max(repetidas.items(), key=lambda item: item[1]) if repetidas else None
+        linhas.append({
+            'view': view,
+            'acao': acao,
+            'amostras': len(amostras),
+            'consultas_p50': percentil(consultas, 50),
+            'consultas_p95': percentil(consultas, 95),
+            'consultas_max': consultas[-1],
+            'duracao_p50': percentil(duracoes, 50),
+            'duracao_p95': percentil(duracoes, 95),
+            'tempo_db_p95': percentil(tempos_db, 95),
+            'pior_repetida': pior_repetida,
+        })
+    linhas.sort(key=lambda linha: linha['consultas_p95'] or 0, reverse=True)
+    return linhas
@@ -0,0 +1,141 @@
+# core/escolhas.py
+#
+# Opções dos campos de FK compartilhadas entre as linhas de um formset.
+#
+# Cada linha de um inline tem o próprio ModelChoiceField: a lista de um
+# <select> é consultada e renderizada de novo em cada linha (inclusive na
+# linha vazia do "adicionar outro"), o autocomplete busca o registro escolhido
+# linha a linha e a validação faz um .get() por linha. Com o
+# EscolhasCompartilhadasInlineFormSet cada campo é resolvido uma vez por
+# formset:
+#
+# - a lista do <select> é avaliada e rotulada na primeira linha renderizada e
+#   reaproveitada pelas demais;
+# - os registros escolhidos em todas as linhas (dados enviados ou iniciais)
+#   vêm numa única consulta, usada pelo autocomplete e pela validação.
+#
+# O queryset de cada campo é o da primeira linha: formulários que filtram as
+# opções conforme a própria linha devem listar esses campos em
+# `campos_escolhas_individuais` do formset.
+
+from django.contrib.admin.widgets import AutocompleteMixin
+from django.core.exceptions import ValidationError
+from django.forms import ModelChoiceField, ModelMultipleChoiceField
+from django.forms.models import BaseInlineFormSet, ModelChoiceIterator
+
+
+class EscolhasCampo:
+    """Opções e registros escolhidos de um campo de FK, comuns a todas as linhas do formset."""
+
+    def __init__(self, formset, nome, campo):
+        self.formset = formset
+        self.nome = nome
+        self.campo = campo
+        opts = campo.queryset.model._meta
+        self.chave = opts.get_field(campo.to_field_name) if campo.to_field_name else opts.pk
+        self._opcoes = None
+        self._objetos = None
+
+    def opcoes(self):
+        """Lista (valor, rótulo) do <select>, avaliada uma vez."""
+        if self._opcoes is None:
+            self._opcoes = list(ModelChoiceIterator(self.campo))
+        return self._opcoes
+
+    def normalizar(self, valor):
+        """Valor da chave como o banco o devolve, ou None se vazio ou inválido."""
+        if isinstance(valor, self.campo.queryset.model):
+            valor = getattr(valor, self.chave.attname)
+        if valor in self.campo.empty_values:
+            return None
+        try:
+            return self.chave.to_python(valor)
+        except ValidationError:
+            return None
+
+    def objetos(self):
+        """{chave: registro} dos valores usados em qualquer linha do formset."""
+        if self._objetos is None:
+            valores = {self.normalizar(form[self.nome].value()) for form in self.formset.forms}
+            valores.discard(None)
+            self._objetos = {}
+            if valores:
+                for obj in self.campo.queryset.filter(**{f'{self.chave.attname}__in': valores}):
+                    self._objetos[getattr(obj, self.chave.attname)] = obj
+        return self._objetos
+
+    def instalar(self, campo):
+        """Faz `campo` (de uma linha) usar as opções e os registros compartilhados."""
+        original = campo.to_python
+
+        def to_python(valor):
+            if valor in campo.empty_values:
+                return None
+            obj = self.objetos().get(self.normalizar(valor))
+            # Valor fora das opções: o campo original levanta o erro de validação.
+            return obj if obj is not None else original(valor)
+
+        campo.to_python = to_python
+        widget = getattr(campo.widget, 'widget', campo.widget)
+        if isinstance(widget, AutocompleteMixin):
+            self._instalar_autocomplete(widget)
+        elif hasattr(widget, 'choices'):
+            # O RelatedFieldWidgetWrapper do admin repassa as próprias choices ao widget interno.
+            campo.widget.choices = widget.choices = OpcoesCompartilhadas(self)
+
+    def _instalar_autocomplete(self, widget):
+        def optgroups(name, value, attr=None):
+            # Como no AutocompleteSelect, só aparecem os valores que existem no
+            # queryset; um valor inválido enviado no POST simplesmente some.
+            objetos = self.objetos()
+            opcoes = []
+            if not widget.is_required and not widget.allow_multiple_selected:
+                opcoes.append(widget.create_option(name, '', '', False, 0))
+            for valor in value:
+                obj = objetos.get(self.normalizar(valor))
+                if obj is None:
+                    continue
+                opcoes.append(widget.create_option(
+                    name, getattr(obj, self.chave.attname), self.campo.label_from_instance(obj), True, len(opcoes),
+                ))
+            return [(None, opcoes, 0)]
+
+        widget.optgroups = optgroups
+
+
+class OpcoesCompartilhadas:
+    """choices de um Select que delega à lista avaliada uma vez pelo EscolhasCampo."""
+
+    def __init__(self, escolhas):
+        self.escolhas = escolhas
+
+    def __iter__(self):
+        return iter(self.escolhas.opcoes())
+
+    def __len__(self):
+        return len(self.escolhas.opcoes())
+
+    def __bool__(self):
+        return bool(self.escolhas.opcoes())
+
+
+class EscolhasCompartilhadasFormSetMixin:
+    """Compartilha entre as linhas as opções dos campos de FK (ver o topo do módulo)."""
+    campos_escolhas_individuais = ()
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if not hasattr(self, '_escolhas'):
+            self._escolhas = {}
+        for nome, campo in form.fields.items():
+            if nome in self.campos_escolhas_individuais:
+                continue
+            if not isinstance(campo, ModelChoiceField) or isinstance(campo, ModelMultipleChoiceField):
+                continue
+            if nome not in self._escolhas:
+                self._escolhas[nome] = EscolhasCampo(self, nome, campo)
+            self._escolhas[nome].instalar(campo)
+
+
+class EscolhasCompartilhadasInlineFormSet(EscolhasCompartilhadasFormSetMixin, BaseInlineFormSet):
+    pass
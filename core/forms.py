@@ -48,13 +48,12 @@ class VendaItemForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Filtra os CFOPs disponíveis para venda: 
+        # Filtra os CFOPs disponíveis para venda (ver Cfop.atualizar_indicadores):
         # 1. Códigos que iniciam com 5, 6 ou 7
         # 2. OU CFOPs marcados como tipo SAÍDA (tipo=2)
         if 'cfop' in self.fields:
-            from django.db.models import Q
             self.fields['cfop'].queryset = Cfop.objects.filter(
-                Q(cfop_codigo__regex=r'^[567]') | Q(cfop_tipo=2)
+                cfop_disponivel_venda=True
             ).order_by('cfop_codigo')
             
             # Adiciona um help text explicativo
@@ -93,7 +92,7 @@ class CompraItemForm(forms.ModelForm):
         # Filtra os CFOPs disponíveis para compra: apenas CFOPs do tipo ENTRADA
         if 'cfop' in self.fields:
             self.fields['cfop'].queryset = Cfop.objects.filter(
-                cfop_tipo=Cfop.TipoCfop.ENTRADA
+                cfop_disponivel_compra=True
             ).order_by('cfop_codigo')
 
             # Explica que apenas CFOPs de entrada aparecem
@@ -0,0 +1,492 @@
+# core/indices.py
+#
+# Sugestão de índices a partir dos planos de execução (manage.py index_advisor).
+#
+# Os modelos só têm os índices que o Django cria para as FKs. Em vez de
+# adivinhar quais faltam, o comando executa o que o sistema realmente
+# consulta: os changelists de todos os ModelAdmins (com as opções dos filtros
+# da lateral, a busca e o date_hierarchy), as páginas de edição e os
+# lançamentos que disparam os sinais (core.benchmark.CenariosLancamento).
+# Cada consulta distinta passa por EXPLAIN QUERY PLAN, que acusa:
+#
+# - varredura: a tabela é lida inteira (SCAN), com ou sem índice;
+# - b-tree temporária: o SQLite ordena ou agrupa numa estrutura temporária
+#   (USE TEMP B-TREE FOR ORDER BY / GROUP BY / DISTINCT);
+# - índice parcial: a busca usa um índice que cobre só parte das condições
+#   de igualdade e intervalo da tabela (falta um índice composto).
+#
+# Para cada consulta com problema, os candidatos são montados a partir do
+# próprio SQL: colunas comparadas por igualdade, depois a primeira comparada
+# por intervalo; ou as colunas de igualdade seguidas do ORDER BY. Candidatos
+# já cobertos por um índice existente (como prefixo) e tabelas pequenas são
+# descartados. Cada candidato restante é criado numa transação desfeita em
+# seguida e as consultas da tabela são explicadas de novo: só fica o que o
+# SQLite de fato usa e que elimina algum problema.
+#
+# Os planos dependem do SQLite e do volume: rode contra uma massa do tamanho
+# da produção (generate_dataset). Só funciona em SQLite.
+
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.utils import timezone
+
+from .diagnostico import impressao_digital_sql
+
+APP = 'core'
+
+_COLUNA = r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)"'
+_TABELA = re.compile(r'\b(?:FROM|JOIN)\s+"(\w+)"(?:\s+(?:AS\s+)?"?([A-Za-z_]\w*)"?)?')
+_IGUALDADE = re.compile(_COLUNA + r'\s*(?:=\s*%s|IN\s*\(|IS\s+NULL)')
+_INTERVALO = re.compile(_COLUNA + r'\s*(?:[<>]=?\s*%s|BETWEEN\s)')
+_BOOLEANO = re.compile(
+    r'(?:\bWHERE|\bAND|\bOR|\bNOT|\()\s*' + _COLUNA + r'\s*(?=\)|\bAND\b|\bOR\b|\bORDER\b|\bGROUP\b|\bLIMIT\b|$)'
+)
+_ORDEM_COLUNA = re.compile(_COLUNA + r'\s+(ASC|DESC)')
+_PLANO_TABELA = re.compile(r'^(SCAN|SEARCH) (\S+)(.*)$')
+_PLANO_INDICE = re.compile(r'USING (?:COVERING )?INDEX (\S+)(?: \((.*)\))?')
+_PLANO_BTREE = re.compile(r'^USE TEMP B-TREE FOR (.+)$')
+_PALAVRAS = {
+    'AS', 'CROSS', 'GROUP', 'HAVING', 'INNER', 'JOIN', 'LEFT', 'LIMIT', 'ON', 'ORDER', 'OUTER', 'RIGHT',
+    'SET', 'UNION', 'USING', 'WHERE', 'WINDOW',
+}
+COMANDOS = ('SELECT', 'UPDATE', 'DELETE')
+MAXIMO_COLUNAS = 4
+
+
+# -----------------------------------------------------------------------------
+# Coleta
+# -----------------------------------------------------------------------------
+
+class CapturaConsultas:
+    """
+    Guarda as consultas (SELECT, UPDATE, DELETE) executadas numa conexão,
+    agrupadas pela impressão digital do SQL, com um exemplo de parâmetros,
+    quantas vezes rodaram e em quais cenários (`origem`).
+    """
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.origem = None
+        self.consultas = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # As consultas ao catálogo do SQLite (sqlite_master, sqlite_stat1) não interessam.
+        if not many and sql.lstrip()[:6].upper() in COMANDOS and 'sqlite_' not in sql:
+            chave = impressao_digital_sql(sql)
+            consulta = self.consultas.get(chave)
+            if consulta is None:
+                consulta = self.consultas[chave] = {
+                    'sql': sql, 'params': params, 'ocorrencias': 0, 'origens': [],
+                }
+            consulta['ocorrencias'] += 1
+            if self.origem and self.origem not in consulta['origens']:
+                consulta['origens'].append(self.origem)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.conexao.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._wrapper.__exit__(*exc)
+        return False
+
+
+# -----------------------------------------------------------------------------
+# Leitura do SQL e do plano
+# -----------------------------------------------------------------------------
+
+def _modelos_por_tabela():
+    return {model._meta.db_table: model for model in apps.get_models()}
+
+
+def _colunas(model):
+    return {campo.column: campo for campo in model._meta.concrete_fields}
+
+
+def _incluir(lista, valor):
+    if valor not in lista:
+        lista.append(valor)
+
+
+def _ordem_externa(sql):
+    """Trecho do ORDER BY da consulta externa, ou '' (o ORDER BY de uma subconsulta fica dentro de parênteses)."""
+    posicao = sql.rfind(' ORDER BY ')
+    if posicao < 0:
+        return ''
+    trecho = sql[posicao + len(' ORDER BY '):]
+    if trecho.count(')') > trecho.count('('):
+        return ''
+    return re.split(r'\s(?:LIMIT|OFFSET)\s', trecho)[0]
+
+
+def analisar_sql(sql, modelos):
+    """
+    Tabelas, condições e ordenação de um SQL gerado pelo Django.
+
+    Devolve {'aliases': {alias: {tabelas}}, 'predicados': {tabela:
+    {'igualdade': [colunas], 'intervalo': [colunas]}}, 'ordem': (tabela,
+    [(coluna, desc)]) ou None}. Só entram comparações com parâmetros, listas
+    IN, IS NULL e colunas booleanas (condições de JOIN não contam).
+    Um alias repetido em subconsultas diferentes (U0) vale para todas as
+    tabelas que o usam e que tenham a coluna.
+    """
+    aliases = {}
+    for tabela, alias in _TABELA.findall(sql):
+        if not alias or alias.upper() in _PALAVRAS:
+            alias = tabela
+        aliases.setdefault(alias, set()).add(tabela)
+
+    def tabelas_da_coluna(match, booleana=False):
+        alias = match.group(1) or match.group(2)
+        coluna = match.group(3)
+        tabelas = []
+        for tabela in aliases.get(alias, ()):
+            campo = _colunas(modelos[tabela]).get(coluna) if tabela in modelos else None
+            # Uma coluna solta só é condição se for booleana; senão é argumento de função (SUM, MAX...).
+            if campo is not None and (not booleana or isinstance(campo, models.BooleanField)):
+                tabelas.append(tabela)
+        return tabelas, coluna
+
+    predicados = {}
+    for tipo, padrao in (('igualdade', _IGUALDADE), ('igualdade', _BOOLEANO), ('intervalo', _INTERVALO)):
+        for match in padrao.finditer(sql):
+            tabelas, coluna = tabelas_da_coluna(match, booleana=padrao is _BOOLEANO)
+            for tabela in tabelas:
+                condicoes = predicados.setdefault(tabela, {'igualdade': [], 'intervalo': []})
+                _incluir(condicoes[tipo], coluna)
+    for condicoes in predicados.values():
+        condicoes['intervalo'] = [c for c in condicoes['intervalo'] if c not in condicoes['igualdade']]
+
+    ordem = None
+    colunas_ordem = []
+    for match in _ORDEM_COLUNA.finditer(_ordem_externa(sql)):
+        tabelas, coluna = tabelas_da_coluna(match)
+        if len(tabelas) != 1:
+            colunas_ordem = None
+            break
+        colunas_ordem.append((tabelas[0], coluna, match.group(4) == 'DESC'))
+    if colunas_ordem and len({tabela for tabela, _, _ in colunas_ordem}) == 1:
+        ordem = (colunas_ordem[0][0], [(coluna, desc) for _, coluna, desc in colunas_ordem])
+    return {'aliases': aliases, 'predicados': predicados, 'ordem': ordem}
+
+
+def explicar(conexao, sql, params):
+    """Linhas (id, pai, detalhe) do EXPLAIN QUERY PLAN de `sql`."""
+    with conexao.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [(linha[0], linha[1], linha[3]) for linha in cursor.fetchall()]
+
+
+def problemas_do_plano(plano, analise):
+    """
+    Varreduras, b-trees temporárias e índices parciais de um plano.
+
+    Tabelas virtuais (busca FTS5), subconsultas materializadas e linhas
+    constantes são ignoradas.
+    """
+    problemas = []
+    for _, pai, detalhe in plano:
+        btree = _PLANO_BTREE.match(detalhe)
+        if btree:
+            problemas.append({'tipo': 'btree_temporaria', 'motivo': btree.group(1), 'externa': pai == 0})
+            continue
+        match = _PLANO_TABELA.match(detalhe)
+        if not match or 'VIRTUAL TABLE' in detalhe:
+            continue
+        operacao, alias, resto = match.groups()
+        indice = _PLANO_INDICE.search(resto)
+        for tabela in sorted(analise['aliases'].get(alias, ())):
+            if operacao == 'SCAN':
+                problemas.append({'tipo': 'varredura', 'tabela': tabela, 'indice': indice.group(1) if indice else None})
+                continue
+            if not indice:
+                continue
+            usadas = set(re.findall(r'(\w+)\s*[=<>]', indice.group(2) or ''))
+            condicoes = analise['predicados'].get(tabela, {})
+            faltando = [c for c in condicoes.get('igualdade', []) + condicoes.get('intervalo', []) if c not in usadas]
+            if faltando:
+                problemas.append({
+                    'tipo': 'indice_parcial', 'tabela': tabela, 'indice': indice.group(1), 'sem_indice': faltando,
+                })
+    return problemas
+
+
+def _peso(problemas):
+    return sum(1 for problema in problemas if problema['tipo'] != 'btree_temporaria' or problema['externa'])
+
+
+# -----------------------------------------------------------------------------
+# Candidatos
+# -----------------------------------------------------------------------------
+
+class Catalogo:
+    """Índices existentes e número de linhas das tabelas, lidos uma vez por tabela."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self._indices = {}
+        self._linhas = {}
+
+    def indices(self, tabela):
+        if tabela not in self._indices:
+            with self.conexao.cursor() as cursor:
+                restricoes = self.conexao.introspection.get_constraints(cursor, tabela)
+            self._indices[tabela] = [
+                list(restricao['columns']) for restricao in restricoes.values()
+                if restricao['columns'] and (restricao['index'] or restricao['unique'] or restricao['primary_key'])
+            ]
+        return self._indices[tabela]
+
+    def linhas(self, tabela):
+        if tabela not in self._linhas:
+            with self.conexao.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {self.conexao.ops.quote_name(tabela)}')
+                self._linhas[tabela] = cursor.fetchone()[0]
+        return self._linhas[tabela]
+
+    def coberto(self, tabela, colunas):
+        colunas = [coluna for coluna, _ in colunas]
+        return any(indice[:len(colunas)] == colunas for indice in self.indices(tabela))
+
+
+def candidatos_da_consulta(analise, problemas, modelos):
+    """
+    Índices (tabela, ((coluna, desc), ...)) que poderiam resolver os problemas
+    de uma consulta: igualdades + primeiro intervalo de cada tabela filtrada,
+    quando há varredura ou índice parcial; igualdades + ORDER BY da tabela
+    ordenada, quando há b-tree temporária na consulta externa. Tabelas
+    filtradas pela pk ficam de fora: a busca pelo rowid já é a melhor.
+    """
+    candidatos = []
+
+    def incluir(tabela, colunas):
+        model = modelos.get(tabela)
+        if model is None or model._meta.app_label != APP:
+            return
+        pk = model._meta.pk.column
+        if pk in analise['predicados'].get(tabela, {}).get('igualdade', ()):
+            return
+        vistas = []
+        for coluna, desc in colunas:
+            # Todo índice do SQLite termina no rowid, e a pk é única: nada depois dela ajuda.
+            if coluna == pk:
+                break
+            if coluna not in [c for c, _ in vistas]:
+                vistas.append((coluna, desc))
+        if vistas:
+            _incluir(candidatos, (tabela, tuple(vistas[:MAXIMO_COLUNAS])))
+
+    tipos = {problema['tipo'] for problema in problemas}
+    if tipos & {'varredura', 'indice_parcial'}:
+        for tabela, condicoes in analise['predicados'].items():
+            incluir(tabela, [(c, False) for c in condicoes['igualdade'] + condicoes['intervalo'][:1]])
+    btree_ordem = any(
+        problema['tipo'] == 'btree_temporaria' and problema['externa'] and 'ORDER BY' in problema['motivo']
+        for problema in problemas
+    )
+    if btree_ordem and analise['ordem']:
+        tabela, ordem = analise['ordem']
+        igualdades = analise['predicados'].get(tabela, {}).get('igualdade', [])
+        # Direções misturadas só são atendidas por um índice com as mesmas direções.
+        mista = len({desc for _, desc in ordem}) > 1
+        incluir(tabela, [(c, False) for c in igualdades] + [(c, desc and mista) for c, desc in ordem])
+    return candidatos
+
+
+def _nome_indice(model, colunas):
+    campos = _colunas(model)
+    indice = models.Index(fields=[('-' if desc else '') + campos[coluna].name for coluna, desc in colunas])
+    indice.set_name_with_model(model)
+    return indice
+
+
+def _criar_indice_sql(conexao, tabela, nome, colunas):
+    quote = conexao.ops.quote_name
+    partes = ', '.join(f"{quote(coluna)}{' DESC' if desc else ''}" for coluna, desc in colunas)
+    return f'CREATE INDEX {quote(nome)} ON {quote(tabela)} ({partes})'
+
+
+def validar(conexao, tabela, nome, colunas, consultas):
+    """
+    Cria o índice numa transação desfeita em seguida e explica de novo as
+    `consultas`; devolve as que passam a usá-lo com menos problemas, como
+    (consulta, problemas depois).
+    """
+    melhoradas = []
+    with transaction.atomic(using=conexao.alias):
+        with conexao.cursor() as cursor:
+            cursor.execute(_criar_indice_sql(conexao, tabela, nome, colunas))
+        for consulta in consultas:
+            plano = explicar(conexao, consulta['sql'], consulta['params'])
+            if not any(nome in detalhe for _, _, detalhe in plano):
+                continue
+            depois = problemas_do_plano(plano, consulta['analise'])
+            if _peso(depois) < _peso(consulta['problemas']):
+                melhoradas.append((consulta, depois))
+        transaction.set_rollback(True, using=conexao.alias)
+    return melhoradas
+
+
+def analisar(conexao, consultas, linhas_minimas=500):
+    """
+    Explica as `consultas` (valores de CapturaConsultas.consultas), anota em
+    cada uma 'plano', 'problemas' e 'analise', e devolve a lista de índices
+    candidatos validados, do que resolve mais execuções para o que resolve
+    menos.
+    """
+    modelos = _modelos_por_tabela()
+    catalogo = Catalogo(conexao)
+    propostas = {}
+    for consulta in consultas:
+        consulta['analise'] = analisar_sql(consulta['sql'], modelos)
+        try:
+            consulta['plano'] = explicar(conexao, consulta['sql'], consulta['params'])
+        except Exception as exc:
+            consulta['plano'], consulta['problemas'] = [], []
+            consulta['erro'] = str(exc)
+            continue
+        consulta['problemas'] = problemas_do_plano(consulta['plano'], consulta['analise'])
+        if not _peso(consulta['problemas']):
+            continue
+        for tabela, colunas in candidatos_da_consulta(consulta['analise'], consulta['problemas'], modelos):
+            if catalogo.coberto(tabela, colunas) or catalogo.linhas(tabela) < linhas_minimas:
+                continue
+            propostas.setdefault((tabela, colunas), []).append(consulta)
+
+    candidatos = []
+    for (tabela, colunas), origem in propostas.items():
+        model = modelos[tabela]
+        indice = _nome_indice(model, colunas)
+        # Valida contra todas as consultas problemáticas da tabela, não só as que
+        # originaram a proposta: um índice pode resolver várias.
+        afetadas = [
+            consulta for consulta in consultas
+            if _peso(consulta.get('problemas', ())) and any(tabela in t for t in consulta['analise']['aliases'].values())
+        ]
+        melhoradas = validar(conexao, tabela, indice.name, colunas, afetadas)
+        candidatos.append({
+            'tabela': tabela,
+            'model': model,
+            'colunas': [coluna for coluna, _ in colunas],
+            'indice': indice,
+            'linhas': catalogo.linhas(tabela),
+            'propostas': len(origem),
+            'consultas': [consulta for consulta, _ in melhoradas],
+            'execucoes': sum(consulta['ocorrencias'] for consulta, _ in melhoradas),
+            'resolvidos': sum(_peso(consulta['problemas']) - _peso(depois) for consulta, depois in melhoradas),
+        })
+
+    # Um candidato que é prefixo de outro fica de fora: o SQLite usa o começo
+    # de um índice composto, então o maior atende as mesmas buscas.
+    selecionados = []
+    uteis = [candidato for candidato in candidatos if candidato['consultas']]
+    for candidato in sorted(uteis, key=lambda c: -len(c['colunas'])):
+        maior = next((
+            outro for outro in selecionados
+            if outro['tabela'] == candidato['tabela'] and outro['colunas'][:len(candidato['colunas'])] == candidato['colunas']
+        ), None)
+        if maior is None:
+            selecionados.append(candidato)
+        else:
+            candidato['coberto_por'] = maior['indice'].name
+    selecionados.sort(key=lambda c: (-c['execucoes'], -len(c['consultas']), -c['linhas'], c['indice'].name))
+    descartados = [candidato for candidato in candidatos if candidato not in selecionados]
+    return selecionados, descartados
+
+
+# -----------------------------------------------------------------------------
+# Saída
+# -----------------------------------------------------------------------------
+
+def _ultima_migracao(conexao):
+    folhas = MigrationLoader(conexao, ignore_no_migrations=True).graph.leaf_nodes(APP)
+    return folhas[0] if folhas else None
+
+
+def migracao_candidata(conexao, candidatos, banco):
+    """Texto de uma migração com um AddIndex por candidato, dependente da última migração do app."""
+    linhas = [
+        f'# Migração candidata gerada por manage.py index_advisor em {timezone.now():%Y-%m-%d %H:%M}',
+        f'# a partir de {banco}.',
+        '#',
+        '# Revise antes de aplicar: copie para core/migrations/ com um nome descritivo',
+        '# e declare os mesmos índices em Meta.indexes dos modelos, senão o',
+        '# makemigrations propõe removê-los.',
+        '#',
+    ]
+    for candidato in candidatos:
+        linhas.append(
+            f"# {candidato['indice'].name}: {len(candidato['consultas'])} consulta(s), "
+            f"{candidato['execucoes']} execução(ões); {candidato['linhas']} linhas em {candidato['tabela']}"
+        )
+        for origem in sorted({o for consulta in candidato['consultas'] for o in consulta['origens']})[:3]:
+            linhas.append(f'#   {origem}')
+    ultima = _ultima_migracao(conexao)
+    linhas += [
+        '',
+        'from django.db import migrations, models',
+        '',
+        '',
+        'class Migration(migrations.Migration):',
+        '',
+        '    dependencies = [',
+        *([f'        {ultima!r},'] if ultima else []),
+        '    ]',
+        '',
+        '    operations = [',
+    ]
+    for candidato in candidatos:
+        indice = candidato['indice']
+        linhas += [
+            '        migrations.AddIndex(',
+            f"            model_name={candidato['model']._meta.model_name!r},",
+            f'            index=models.Index(fields={list(indice.fields)!r}, name={indice.name!r}),',
+            '        ),',
+        ]
+    linhas += ['    ]', '']
+    return '\n'.join(linhas)
+
+
+def gravar_migracao(caminho, texto):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(texto, encoding='utf-8')
+
+
+def relatorio(consultas, selecionados, descartados):
+    """Resultados em formato JSON: consultas com problema e candidatos (selecionados e descartados)."""
+
+    def candidato_json(candidato):
+        return {
+            'tabela': candidato['tabela'],
+            'campos': list(candidato['indice'].fields),
+            'nome': candidato['indice'].name,
+            'linhas': candidato['linhas'],
+            'consultas': len(candidato['consultas']),
+            'execucoes': candidato['execucoes'],
+            'resolvidos': candidato['resolvidos'],
+            'origens': sorted({o for consulta in candidato['consultas'] for o in consulta['origens']}),
+            **({'coberto_por': candidato['coberto_por']} if 'coberto_por' in candidato else {}),
+        }
+
+    return {
+        'consultas': [
+            {
+                'sql': impressao_digital_sql(consulta['sql']),
+                'ocorrencias': consulta['ocorrencias'],
+                'origens': consulta['origens'],
+                'plano': [detalhe for _, _, detalhe in consulta['plano']],
+                'problemas': consulta['problemas'],
+                **({'erro': consulta['erro']} if 'erro' in consulta else {}),
+            }
+            for consulta in consultas if consulta['problemas'] or 'erro' in consulta
+        ],
+        'candidatos': [candidato_json(candidato) for candidato in selecionados],
+        'descartados': [candidato_json(candidato) for candidato in descartados],
+    }
@@ -0,0 +1,54 @@
+# core/logs.py
+#
+# Peças usadas pela configuração LOGGING em settings.py: o formatador JSON
+# (uma linha por evento, com os campos passados em `extra=`, por exemplo
+# venda_id e venda_item_id) e o handler de arquivo rotativo que cria o
+# diretório de logs na primeira gravação.
+
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+_ATRIBUTOS_PADRAO = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormatadorJson(logging.Formatter):
+    """Formata cada registro como um objeto JSON em uma linha."""
+
+    def format(self, record):
+        evento = {
+            'em': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for nome, valor in vars(record).items():
+            if nome not in _ATRIBUTOS_PADRAO and not nome.startswith('_'):
+                evento[nome] = valor
+        if record.exc_info:
+            evento['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class ArquivoRotativoHandler(RotatingFileHandler):
+    """RotatingFileHandler que cria o diretório do arquivo quando necessário."""
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def niveis_por_modulo(valor, padrao=None):
+    """
+    Converte "core.signals=DEBUG,core.precos=INFO" em configuração de loggers.
+    Entradas sem "=" ou com nível desconhecido são ignoradas.
+    """
+    loggers = dict(padrao or {})
+    for parte in (valor or '').split(','):
+        nome, _, nivel = parte.partition('=')
+        nome, nivel = nome.strip(), nivel.strip().upper()
+        if not nome or not isinstance(logging.getLevelName(nivel), int):
+            continue
+        loggers[nome] = {**loggers.get(nome, {}), 'level': nivel}
+    return loggers
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from core.benchmark import cenarios_admin, comparar, gravar_resultados, ler_resultados, medir, metadados
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede tempo, consultas e pico de memória dos changelists e páginas de edição de todos os '
+        'ModelAdmins registrados. Rode contra um banco gerado com generate_dataset (COMPUFOUR_DB). '
+        'Com --base, falha se alguma view regredir além de --limite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelos', nargs='*', help='Modelos a medir, como "core.caixa" ou "caixa" (padrão: todos).')
+        parser.add_argument('--repeticoes', type=int, default=3, help='Repetições medidas por cenário (padrão: 3).')
+        parser.add_argument('--lookups', type=int, default=5, help='Opções medidas por filtro da lateral (padrão: 5).')
+        parser.add_argument('--busca', default='123', help='Termo usado nos cenários de busca (padrão: "123"; vazio desliga).')
+        parser.add_argument('--sem-memoria', action='store_true', help='Não mede o pico de memória (mais rápido).')
+        parser.add_argument(
+            '--saida', default=str(settings.DIAGNOSTICO_ROOT / 'benchmark_admin.json'),
+            help='Arquivo JSON com os resultados (padrão: DIAGNOSTICO_ROOT/benchmark_admin.json).',
+        )
+        parser.add_argument('--base', help='Resultados anteriores (JSON) usados como linha de base.')
+        parser.add_argument('--limite', type=float, default=1.25, help='Fator de regressão tolerado (padrão: 1.25).')
+        parser.add_argument(
+            '--tolerancia-ms', type=float, default=5.0,
+            help='Diferença mínima de tempo, em ms, para acusar regressão (padrão: 5).',
+        )
+
+    def handle(self, *args, **options):
+        base = ler_resultados(options['base']) if options['base'] else None
+        diagnostico = {**settings.DIAGNOSTICO, 'AMOSTRAGEM_CONSULTAS': 0, 'AMOSTRAGEM_SINAIS': 0}
+
+        # Tudo roda numa transação desfeita no fim: o superusuário temporário,
+        # a sessão do login e qualquer gravação feita por uma view.
+        with override_settings(ALLOWED_HOSTS=['*'], DIAGNOSTICO=diagnostico), transaction.atomic():
+            usuario = get_user_model().objects.create_superuser('benchmark_admin', '', None)
+            cliente = Client(raise_request_exception=False)
+            cliente.force_login(usuario)
+            cenarios = cenarios_admin(
+                admin.site, usuario,
+                modelos=set(options['modelos']),
+                lookups_por_filtro=options['lookups'],
+                busca=options['busca'],
+            )
+            resultados, erros = {}, []
+            for nome, url in cenarios:
+                medida = medir(
+                    lambda: cliente.get(url).status_code,
+                    repeticoes=options['repeticoes'],
+                    memoria=not options['sem_memoria'],
+                )
+                medida['status'] = medida.pop('retorno')
+                medida['url'] = url
+                resultados[nome] = medida
+                if medida['status'] != 200:
+                    erros.append(f"{nome}: HTTP {medida['status']}")
+                linha = f"{nome:<60} {medida['tempo_ms']:>9.1f} ms {medida['consultas']:>5} consultas"
+                if 'memoria_pico_kib' in medida:
+                    linha += f"{medida['memoria_pico_kib']:>10.0f} KiB"
+                if medida['status'] != 200:
+                    linha += f" HTTP {medida['status']}"
+                self.stdout.write(linha)
+            transaction.set_rollback(True)
+
+        gravar_resultados(options['saida'], metadados(repeticoes=options['repeticoes']), resultados)
+        self.stdout.write(f"Resultados gravados em {options['saida']}.")
+
+        regressoes = comparar(resultados, base, options['limite'], options['tolerancia_ms']) if base else []
+        for linha in erros + regressoes:
+            self.stderr.write(linha)
+        if erros or regressoes:
+            raise CommandError(f'{len(erros)} view(s) com erro e {len(regressoes)} regressão(ões).')
+        self.stdout.write(self.style.SUCCESS(f'{len(resultados)} cenário(s) medido(s).'))
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from core.benchmark import CenariosLancamento, comparar, gravar_resultados, ler_resultados, medir_escrita, metadados
+
+
+def _lista_inteiros(valor):
+    return [int(parte) for parte in valor.split(',') if parte.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede gravações por segundo e consultas por gravação nos lançamentos que disparam sinais '
+        '(compras e vendas com K itens, itens avulsos, exclusão de compra e baixas em massa), '
+        'como curvas sobre K. Rode contra um banco gerado com generate_dataset (COMPUFOUR_DB); '
+        'nada é gravado. Com --base, falha se algum cenário regredir além de --limite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cenarios', nargs='*',
+            help=f"Cenários a medir: {', '.join(CenariosLancamento.NOMES)} (padrão: todos).",
+        )
+        parser.add_argument('--k', type=_lista_inteiros, default=[1, 5, 20, 50], help='Itens por documento (padrão: 1,5,20,50).')
+        parser.add_argument(
+            '--contas', type=_lista_inteiros, default=[100, 1000, 3000],
+            help='Contas por ação em massa (padrão: 100,1000,3000).',
+        )
+        parser.add_argument('--repeticoes', type=int, default=3, help='Repetições medidas por ponto (padrão: 3).')
+        parser.add_argument(
+            '--saida', default=str(settings.DIAGNOSTICO_ROOT / 'benchmark_lancamentos.json'),
+            help='Arquivo JSON com os resultados (padrão: DIAGNOSTICO_ROOT/benchmark_lancamentos.json).',
+        )
+        parser.add_argument('--base', help='Resultados anteriores (JSON) usados como linha de base.')
+        parser.add_argument('--limite', type=float, default=1.25, help='Fator de regressão tolerado (padrão: 1.25).')
+        parser.add_argument(
+            '--tolerancia-ms', type=float, default=5.0,
+            help='Diferença mínima de tempo, em ms, para acusar regressão (padrão: 5).',
+        )
+
+    def handle(self, *args, **options):
+        desconhecidos = set(options['cenarios']) - set(CenariosLancamento.NOMES)
+        if desconhecidos:
+            raise CommandError(f"Cenário(s) desconhecido(s): {', '.join(sorted(desconhecidos))}.")
+        base = ler_resultados(options['base']) if options['base'] else None
+        diagnostico = {**settings.DIAGNOSTICO, 'AMOSTRAGEM_CONSULTAS': 0, 'AMOSTRAGEM_SINAIS': 0}
+
+        resultados = {}
+        with override_settings(ALLOWED_HOSTS=['*'], DIAGNOSTICO=diagnostico), transaction.atomic():
+            usuario = get_user_model().objects.create_superuser('benchmark_lancamentos', '', None)
+            cliente_http = Client()
+            cliente_http.force_login(usuario)
+            try:
+                cenarios = CenariosLancamento(cliente_http)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+            for nome in options['cenarios'] or CenariosLancamento.NOMES:
+                em_massa = nome in CenariosLancamento.EM_MASSA
+                self.stdout.write(self.style.MIGRATE_HEADING(nome))
+                self.stdout.write(f"  {'contas' if em_massa else 'K':>6} {'ms':>10} {'saves/s':>10} {'consultas':>10} {'consultas/save':>15}")
+                for k in options['contas'] if em_massa else options['k']:
+                    preparar, executar = getattr(cenarios, nome)(k)
+                    medida = medir_escrita(preparar, executar, repeticoes=options['repeticoes'])
+                    medida['k'] = k
+                    resultados[f'{nome}[k={k}]'] = medida
+                    self.stdout.write(
+                        f"  {medida['saves'] if em_massa else k:>6} {medida['tempo_ms']:>10.1f} "
+                        f"{medida['saves_por_s'] or 0:>10.1f} {medida['consultas']:>10} {medida['consultas_por_save']:>15.2f}"
+                    )
+                    if em_massa and medida['saves'] < k:
+                        self.stdout.write('  (não há mais contas em aberto; pontos maiores ignorados)')
+                        break
+            transaction.set_rollback(True)
+
+        gravar_resultados(options['saida'], metadados(repeticoes=options['repeticoes']), resultados)
+        self.stdout.write(f"Resultados gravados em {options['saida']}.")
+
+        regressoes = comparar(resultados, base, options['limite'], options['tolerancia_ms']) if base else []
+        for linha in regressoes:
+            self.stderr.write(linha)
+        if regressoes:
+            raise CommandError(f'{len(regressoes)} regressão(ões).')
+        self.stdout.write(self.style.SUCCESS(f'{len(resultados)} ponto(s) medido(s).'))
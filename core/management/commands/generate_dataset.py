@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.dataset import GeradorDataset
+from core.models import Compra, Venda
+from core.resumos import RESUMOS
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera uma massa de dados sintética e determinística (cadastros, compras, romaneios, vendas, '
+        'contas, pagamentos, recebimentos e caixa) para testes de desempenho. '
+        'Use COMPUFOUR_DB para gravar num banco separado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='Multiplicador de volume (1 ≈ 16 mil linhas, 60 ≈ 1 milhão).')
+        parser.add_argument('--anos', type=int, default=3, help='Anos de movimento até a data final (padrão: 3).')
+        parser.add_argument('--fim', type=date.fromisoformat, default=None, help='Data final AAAA-MM-DD (padrão: hoje).')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (padrão: 42).')
+        parser.add_argument(
+            '--forcar', action='store_true',
+            help='Gera mesmo que o banco já tenha compras ou vendas (os dados são acrescentados).',
+        )
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['anos'] <= 0:
+            raise CommandError('--scale e --anos devem ser positivos.')
+        if not options['forcar'] and (Compra.objects.exists() or Venda.objects.exists()):
+            raise CommandError(
+                f"O banco {settings.DATABASES['default']['NAME']} já tem movimento. "
+                'Aponte COMPUFOUR_DB para um arquivo novo (e rode migrate) ou use --forcar.'
+            )
+
+        gerador = GeradorDataset(
+            escala=options['scale'],
+            anos=options['anos'],
+            fim=options['fim'] or timezone.localdate(),
+            seed=options['seed'],
+            saida=self.stdout.write,
+        )
+        contagens = gerador.executar()
+        for modelo, total in sorted(contagens.items()):
+            self.stdout.write(f'  {modelo}: {total}')
+
+        self.stdout.write('Reconstruindo resumos...')
+        for nome, (descricao, recalcular) in RESUMOS.items():
+            self.stdout.write(f'  {descricao}: {recalcular()} linha(s)')
+        self.stdout.write(self.style.SUCCESS(f'Massa gerada: {sum(contagens.values())} linha(s) de documentos e cadastros.'))
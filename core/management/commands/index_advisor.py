@@ -0,0 +1,128 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from core.benchmark import CenariosLancamento, cenarios_admin, gravar_resultados, metadados
+from core.indices import CapturaConsultas, analisar, gravar_migracao, migracao_candidata, relatorio
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa os changelists (com os filtros da lateral, a busca e o date_hierarchy), as páginas de '
+        'edição e os lançamentos que disparam sinais, passa cada consulta distinta por EXPLAIN QUERY PLAN '
+        'e aponta varreduras completas, b-trees temporárias e índices compostos ausentes. Os índices '
+        'candidatos são testados numa transação desfeita e os que o SQLite usa vão para uma migração '
+        'candidata. Rode contra um banco gerado com generate_dataset (COMPUFOUR_DB); nada é gravado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelos', nargs='*', help='Modelos do admin, como "core.caixa" ou "caixa" (padrão: todos).')
+        parser.add_argument('--lookups', type=int, default=3, help='Opções executadas por filtro da lateral (padrão: 3).')
+        parser.add_argument('--busca', default='123', help='Termo usado nos cenários de busca (padrão: "123"; vazio desliga).')
+        parser.add_argument('--sem-lancamentos', action='store_true', help='Não executa os lançamentos (sinais).')
+        parser.add_argument(
+            '--linhas-minimas', type=int, default=500,
+            help='Tabelas com menos linhas não recebem índice candidato (padrão: 500).',
+        )
+        parser.add_argument(
+            '--saida', default=str(settings.DIAGNOSTICO_ROOT / 'index_advisor.json'),
+            help='Arquivo JSON com planos e candidatos (padrão: DIAGNOSTICO_ROOT/index_advisor.json).',
+        )
+        parser.add_argument(
+            '--migracao', default=str(settings.DIAGNOSTICO_ROOT / 'index_advisor_migracao.py'),
+            help='Migração candidata (padrão: DIAGNOSTICO_ROOT/index_advisor_migracao.py).',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_advisor lê o EXPLAIN QUERY PLAN do SQLite; o banco padrão não é SQLite.')
+        diagnostico = {**settings.DIAGNOSTICO, 'AMOSTRAGEM_CONSULTAS': 0, 'AMOSTRAGEM_SINAIS': 0}
+
+        # Tudo roda numa transação desfeita no fim: o superusuário temporário,
+        # os lançamentos e os índices testados.
+        with override_settings(ALLOWED_HOSTS=['*'], DIAGNOSTICO=diagnostico), transaction.atomic():
+            usuario = get_user_model().objects.create_superuser('index_advisor', '', None)
+            cliente = Client(raise_request_exception=False)
+            cliente.force_login(usuario)
+            cenarios = cenarios_admin(
+                admin.site, usuario,
+                modelos=set(options['modelos']),
+                lookups_por_filtro=options['lookups'],
+                busca=options['busca'],
+                filtros_campo=True,
+            )
+            erros = []
+            with CapturaConsultas(connection) as captura:
+                for nome, url in cenarios:
+                    captura.origem = nome
+                    status = cliente.get(url).status_code
+                    if status != 200:
+                        erros.append(f'{nome}: HTTP {status}')
+                if not options['sem_lancamentos']:
+                    erros += self._lancamentos(captura, cliente)
+            consultas = list(captura.consultas.values())
+            self.stdout.write(
+                f'{len(cenarios)} view(s) do admin; {len(consultas)} consulta(s) distinta(s), '
+                f"{sum(c['ocorrencias'] for c in consultas)} execução(ões)."
+            )
+
+            selecionados, descartados = analisar(connection, consultas, options['linhas_minimas'])
+            migracao = migracao_candidata(connection, selecionados, settings.DATABASES['default']['NAME'])
+            transaction.set_rollback(True)
+
+        self._resumo(consultas, selecionados, descartados)
+        gravar_resultados(options['saida'], metadados(), relatorio(consultas, selecionados, descartados))
+        self.stdout.write(f"Planos e candidatos gravados em {options['saida']}.")
+        if selecionados:
+            gravar_migracao(options['migracao'], migracao)
+            self.stdout.write(f"Migração candidata gravada em {options['migracao']}.")
+        for linha in erros:
+            self.stderr.write(linha)
+
+    def _lancamentos(self, captura, cliente):
+        try:
+            lancamentos = CenariosLancamento(cliente)
+        except ValueError as exc:
+            return [f'Lançamentos ignorados: {exc}']
+        for nome in CenariosLancamento.NOMES:
+            captura.origem = f'lancamento:{nome}'
+            preparar, executar = getattr(lancamentos, nome)(5 if nome in CenariosLancamento.EM_MASSA else 3)
+            with transaction.atomic():
+                executar(preparar())
+                transaction.set_rollback(True)
+        return []
+
+    def _resumo(self, consultas, selecionados, descartados):
+        por_tabela = {}
+        for consulta in consultas:
+            for problema in consulta['problemas']:
+                tabela = problema.get('tabela', '(ordenação/agrupamento)')
+                por_tabela.setdefault(tabela, Counter())[problema['tipo']] += 1
+        self.stdout.write(self.style.MIGRATE_HEADING('Problemas por tabela (consultas distintas)'))
+        self.stdout.write(f"  {'tabela':<40} {'varreduras':>10} {'b-trees':>8} {'parciais':>9}")
+        for tabela, tipos in sorted(por_tabela.items(), key=lambda item: -sum(item[1].values())):
+            self.stdout.write(
+                f"  {tabela:<40} {tipos['varredura']:>10} {tipos['btree_temporaria']:>8} {tipos['indice_parcial']:>9}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Índices candidatos'))
+        if not selecionados:
+            self.stdout.write('  Nenhum índice candidato eliminou problemas nos planos.')
+        for candidato in selecionados:
+            self.stdout.write(
+                f"  {candidato['tabela']}({', '.join(candidato['indice'].fields)}) "
+                f"{len(candidato['consultas'])} consulta(s), {candidato['execucoes']} execução(ões), "
+                f"{candidato['resolvidos']} problema(s) resolvido(s); {candidato['linhas']} linhas"
+            )
+            for origem in sorted({o for consulta in candidato['consultas'] for o in consulta['origens']})[:3]:
+                self.stdout.write(f'      {origem}')
+        if descartados:
+            self.stdout.write(
+                f'  {len(descartados)} candidato(s) descartado(s): o SQLite não os usou, nada melhorou '
+                'ou são o começo de um candidato maior.'
+            )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.relatorios import processar_fila
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de relatórios gerados em segundo plano pelo admin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa os relatórios pendentes e encerra (útil em cron).',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5.0,
+            help='Segundos de espera entre verificações da fila (padrão: 5).',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=None,
+            help='Quantidade máxima de relatórios por verificação.',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = max(options['intervalo'], 0.5)
+        self.stdout.write('Aguardando relatórios na fila...')
+        try:
+            while True:
+                processados = processar_fila(limite=options['limite'])
+                if processados:
+                    self.stdout.write(self.style.SUCCESS(f'{processados} relatório(s) processado(s).'))
+                if options['uma_vez']:
+                    break
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write('Encerrado.')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.resumos import RESUMOS
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as tabelas de resumo (rollups) a partir dos lançamentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'resumos',
+            nargs='*',
+            help=f"Resumos a reconstruir: {', '.join(sorted(RESUMOS))} (padrão: todos).",
+        )
+
+    def handle(self, *args, **options):
+        desconhecidos = set(options['resumos']) - set(RESUMOS)
+        if desconhecidos:
+            raise CommandError(f"Resumo(s) desconhecido(s): {', '.join(sorted(desconhecidos))}.")
+        for nome in options['resumos'] or RESUMOS:
+            descricao, recalcular = RESUMOS[nome]
+            total = recalcular()
+            self.stdout.write(self.style.SUCCESS(f'{descricao}: {total} linha(s) gerada(s).'))
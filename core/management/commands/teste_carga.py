@@ -0,0 +1,159 @@
+import asyncio
+import json
+import secrets
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.carga import PESOS_PADRAO, executar_carga, montar_catalogo
+
+
+def _pesos(valor):
+    pesos = {}
+    for parte in valor.split(','):
+        nome, _, peso = parte.partition('=')
+        if nome.strip() not in PESOS_PADRAO:
+            raise ValueError(nome)
+        pesos[nome.strip()] = float(peso)
+    return pesos
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga HTTP: usuários virtuais fazem login no admin e repetem fluxos mistos '
+        '(changelists, vendas, preços, baixas em massa). Informa vazão, percentis de latência, '
+        'taxa de erro e falhas "database is locked". As vendas e baixas são gravadas de verdade: '
+        'use um banco de teste (COMPUFOUR_DB).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8765', help='Servidor alvo (padrão: http://127.0.0.1:8765).')
+        parser.add_argument(
+            '--iniciar', action='store_true',
+            help='Inicia o servidor (--comando-servidor) antes da carga e o encerra no fim.',
+        )
+        parser.add_argument(
+            '--comando-servidor',
+            help='Comando do servidor para --iniciar (padrão: manage.py runserver no host/porta de --url). '
+                 'Ex.: "gunicorn compufour.wsgi -w 4 -b 127.0.0.1:8765".',
+        )
+        parser.add_argument('--usuarios', type=int, default=10, help='Usuários virtuais simultâneos (padrão: 10).')
+        parser.add_argument('--duracao', type=float, default=60, help='Duração da carga em segundos (padrão: 60).')
+        parser.add_argument('--rampa', type=float, default=5, help='Segundos até todos os usuários entrarem (padrão: 5).')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Pausa máxima entre fluxos, em segundos (padrão: 0).')
+        parser.add_argument('--itens', type=int, default=20, help='Itens por venda gravada (padrão: 20).')
+        parser.add_argument(
+            '--pesos', type=_pesos, default=PESOS_PADRAO,
+            help='Peso dos fluxos, ex.: "navegar=40,abrir_venda=25,precos=20,salvar_venda=10,baixas=5".',
+        )
+        parser.add_argument('--usuario', help='Usuário do admin (padrão: um superusuário temporário).')
+        parser.add_argument('--senha', help='Senha de --usuario.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente dos sorteios (padrão: 42).')
+        parser.add_argument(
+            '--saida', default=str(settings.DIAGNOSTICO_ROOT / 'teste_carga.json'),
+            help='Arquivo JSON com o resumo (padrão: DIAGNOSTICO_ROOT/teste_carga.json).',
+        )
+
+    def handle(self, *args, **options):
+        if options['usuario'] and not options['senha']:
+            raise CommandError('Informe --senha junto com --usuario.')
+        url = options['url'].rstrip('/')
+        partes = urlsplit(url)
+        if partes.scheme != 'http' or not partes.hostname:
+            raise CommandError('--url deve ser http://host:porta (HTTPS não é suportado).')
+
+        usuario_temporario = None
+        usuario, senha = options['usuario'], options['senha']
+        if not usuario:
+            usuario, senha = f'carga_{secrets.token_hex(4)}', secrets.token_urlsafe(16)
+            usuario_temporario = get_user_model().objects.create_superuser(usuario, '', senha)
+
+        servidor = None
+        try:
+            if options['iniciar']:
+                servidor = self._iniciar_servidor(options['comando_servidor'], partes)
+            catalogo = montar_catalogo()
+            self.stdout.write(
+                f"Carga em {url}: {options['usuarios']} usuário(s) por {options['duracao']:.0f}s "
+                f"(rampa de {options['rampa']:.0f}s)..."
+            )
+            resumo = asyncio.run(executar_carga(
+                url, catalogo, usuario, senha,
+                usuarios=options['usuarios'],
+                duracao=options['duracao'],
+                pesos=options['pesos'],
+                itens_por_venda=options['itens'],
+                pausa=options['pausa'],
+                rampa=options['rampa'],
+                seed=options['seed'],
+            ))
+        finally:
+            if servidor:
+                servidor.terminate()
+                try:
+                    servidor.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    servidor.kill()
+            if usuario_temporario:
+                usuario_temporario.delete()
+
+        resumo['parametros'] = {
+            chave: options[chave] for chave in ('url', 'usuarios', 'duracao', 'rampa', 'pausa', 'itens', 'pesos', 'seed')
+        }
+        resumo['parametros']['comando_servidor'] = options['comando_servidor'] if options['iniciar'] else None
+        saida = Path(options['saida'])
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resumo, ensure_ascii=False, indent=2), encoding='utf-8')
+        self._relatorio(resumo)
+        self.stdout.write(f'Resumo gravado em {saida}.')
+
+    def _iniciar_servidor(self, comando, partes):
+        comando = shlex.split(comando) if comando else [
+            sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'runserver',
+            f'{partes.hostname}:{partes.port or 80}', '--noreload',
+        ]
+        self.stdout.write(f"Iniciando servidor: {' '.join(comando)}")
+        servidor = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if servidor.poll() is not None:
+                raise CommandError(f'O servidor terminou com código {servidor.returncode} antes de atender.')
+            try:
+                socket.create_connection((partes.hostname, partes.port or 80), timeout=1).close()
+                return servidor
+            except OSError:
+                time.sleep(0.2)
+        servidor.kill()
+        raise CommandError('O servidor não começou a atender em 30 segundos.')
+
+    def _relatorio(self, resumo):
+        self.stdout.write(
+            f"\n{resumo['requisicoes']} requisições em {resumo['duracao_s']}s: {resumo['por_segundo']} req/s, "
+            f"p50 {resumo['p50_ms']} ms, p95 {resumo['p95_ms']} ms, p99 {resumo['p99_ms']} ms"
+        )
+        self.stdout.write(f"Fluxos: {', '.join(f'{nome}={total}' for nome, total in sorted(resumo['fluxos'].items()))}")
+        self.stdout.write(
+            f"\n{'passo':<30} {'req':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'erro%':>6} {'locked':>6}"
+        )
+        for passo, linha in resumo['passos'].items():
+            self.stdout.write(
+                f"{passo:<30} {linha['requisicoes']:>6} {linha['por_segundo']:>7} {linha['p50_ms']:>8} "
+                f"{linha['p95_ms']:>8} {linha['p99_ms']:>8} {linha['max_ms']:>8} "
+                f"{linha['taxa_erro'] * 100:>6.1f} {linha['bloqueios']:>6}"
+            )
+            for erro, total in sorted(linha['tipos_erro'].items()):
+                self.stdout.write(f'    {erro}: {total}')
+        estilo = self.style.ERROR if resumo['erros'] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"\nErros: {resumo['erros']} ({resumo['taxa_erro'] * 100:.2f}%), "
+            f"dos quais \"database is locked\": {resumo['bloqueios']}"
+            + (f"; bloqueios contados pelo servidor: {resumo['bloqueios_servidor']:.0f}" if 'bloqueios_servidor' in resumo else '')
+        ))
@@ -0,0 +1,243 @@
+# core/metricas.py
+#
+# Métricas no formato de exposição do Prometheus, agregadas no próprio
+# processo (sem prometheus_client nem serviço externo) e expostas em /metrics.
+#
+# Com vários workers WSGI, cada processo tem os próprios contadores. Se
+# METRICAS['DIRETORIO'] estiver definido, cada processo grava periodicamente
+# um instantâneo em DIRETORIO/<pid>.json e /metrics soma os instantâneos de
+# todos os processos. Como contadores e histogramas só crescem, arquivos de
+# processos encerrados continuam valendo; limpe o diretório ao reiniciar o
+# serviço para recomeçar as séries.
+
+import json
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from pathlib import Path
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        REGISTRO[nome] = self
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos.get(rotulo, '')) for rotulo in self.rotulos)
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao, rotulos=()):
+        super().__init__(nome, descricao, rotulos)
+        if not self.rotulos:
+            self.valores[()] = 0
+
+    def incrementar(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with _lock:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos=(), buckets=BUCKETS_PADRAO):
+        super().__init__(nome, descricao, rotulos)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with _lock:
+            atual = self.valores.get(chave)
+            if atual is None:
+                atual = self.valores[chave] = [[0] * len(self.buckets), 0.0, 0]
+            for indice, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    atual[0][indice] += 1
+            atual[1] += valor
+            atual[2] += 1
+
+
+REGISTRO = {}
+
+REQUISICAO_SEGUNDOS = Histograma(
+    'compufour_requisicao_segundos', 'Duração das requisições por view.', ('view', 'metodo'),
+)
+CONSULTAS_SQL = Contador(
+    'compufour_consultas_sql_total', 'Consultas SQL executadas durante as requisições, por view.', ('view',),
+)
+SQLITE_BLOQUEIOS = Contador(
+    'compufour_sqlite_bloqueios_total',
+    'Comandos que desistiram de esperar pelo lock do SQLite ("database is locked").',
+)
+LANCAMENTO_SEGUNDOS = Histograma(
+    'compufour_lancamento_segundos',
+    'Duração dos lançamentos automáticos (contas e caixa) por tipo de documento.',
+    ('documento',),
+)
+RELATORIO_SEGUNDOS = Histograma(
+    'compufour_relatorio_segundos', 'Duração da geração de relatórios.', ('acao', 'modo'),
+)
+
+
+class medir_lancamento(ContextDecorator):
+    """Mede um lançamento automático; serve como decorador ou bloco `with`."""
+
+    def __init__(self, documento):
+        self.documento = documento
+
+    def _recreate_cm(self):
+        # Como decorador, cada chamada usa uma instância própria: chamadas
+        # simultâneas (threads) ou aninhadas (Pagamento -> Caixa) não dividem o início.
+        return type(self)(self.documento)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        LANCAMENTO_SEGUNDOS.observar(time.perf_counter() - self._inicio, documento=self.documento)
+        return False
+
+
+def consultas_da_thread():
+    return getattr(_local, 'consultas', 0)
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    _local.consultas = getattr(_local, 'consultas', 0) + 1
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as exc:
+        if 'locked' in str(exc):
+            SQLITE_BLOQUEIOS.incrementar()
+        raise
+
+
+@receiver(connection_created)
+def instalar_contador_consultas(sender, connection, **kwargs):
+    if _contar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _contar_consulta)
+
+
+# -----------------------------------------------------------------------------
+# Instantâneos, modo multiprocesso e exposição em texto
+# -----------------------------------------------------------------------------
+
+def _config():
+    return getattr(settings, 'METRICAS', {})
+
+
+def instantaneo():
+    with _lock:
+        return {
+            nome: [[list(chave), json.loads(json.dumps(valor))] for chave, valor in metrica.valores.items()]
+            for nome, metrica in REGISTRO.items()
+        }
+
+
+_ultima_gravacao = 0.0
+
+
+def gravar_processo(forcar=False):
+    """Grava o instantâneo deste processo no diretório compartilhado (no máximo a cada INTERVALO s)."""
+    global _ultima_gravacao
+    diretorio = _config().get('DIRETORIO')
+    if not diretorio:
+        return
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_gravacao < _config().get('INTERVALO', 5):
+        return
+    _ultima_gravacao = agora
+    destino = Path(diretorio) / f'{os.getpid()}.json'
+    temporario = destino.with_suffix('.tmp')
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario.write_text(json.dumps(instantaneo()), encoding='utf-8')
+        os.replace(temporario, destino)
+    except OSError:
+        pass
+
+
+def _somar(destino, origem):
+    for nome, linhas in origem.items():
+        metrica = REGISTRO.get(nome)
+        if metrica is None:
+            continue
+        valores = destino.setdefault(nome, {})
+        for chave, valor in linhas:
+            chave = tuple(chave)
+            if metrica.tipo == 'counter':
+                valores[chave] = valores.get(chave, 0) + valor
+            else:
+                atual = valores.setdefault(chave, [[0] * len(metrica.buckets), 0.0, 0])
+                atual[0] = [a + b for a, b in zip(atual[0], valor[0])]
+                atual[1] += valor[1]
+                atual[2] += valor[2]
+
+
+def valores_agregados():
+    """Valores deste processo ou, no modo multiprocesso, a soma de todos os processos."""
+    diretorio = _config().get('DIRETORIO')
+    if not diretorio:
+        return {nome: dict((tuple(chave), valor) for chave, valor in linhas) for nome, linhas in instantaneo().items()}
+    gravar_processo(forcar=True)
+    agregados = {}
+    for arquivo in Path(diretorio).glob('*.json'):
+        try:
+            _somar(agregados, json.loads(arquivo.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return agregados
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _rotulos(nomes, valores, extra=()):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    pares += [f'{nome}="{valor}"' for nome, valor in extra]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicao():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    agregados = valores_agregados()
+    linhas = []
+    for nome, metrica in REGISTRO.items():
+        linhas.append(f'# HELP {nome} {metrica.descricao}')
+        linhas.append(f'# TYPE {nome} {metrica.tipo}')
+        for chave, valor in sorted(agregados.get(nome, {}).items()):
+            if metrica.tipo == 'counter':
+                linhas.append(f'{nome}{_rotulos(metrica.rotulos, chave)} {_numero(valor)}')
+                continue
+            contagens, soma, total = valor
+            for limite, contagem in zip(metrica.buckets, contagens):
+                linhas.append(f'{nome}_bucket{_rotulos(metrica.rotulos, chave, [("le", repr(limite))])} {contagem}')
+            linhas.append(f'{nome}_bucket{_rotulos(metrica.rotulos, chave, [("le", "+Inf")])} {total}')
+            linhas.append(f'{nome}_sum{_rotulos(metrica.rotulos, chave)} {_numero(soma)}')
+            linhas.append(f'{nome}_count{_rotulos(metrica.rotulos, chave)} {total}')
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,242 @@
+# core/middleware.py
+
+import cProfile
+import io
+import pstats
+import random
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import metricas, referencias
+from .diagnostico import armazem, impressao_digital_sql
+from .rastreamento import rastrear_cascata
+
+ARMAZEM_CONSULTAS = armazem('consultas')
+ARMAZEM_PERFIS = armazem('perfis')
+
+PARAMETRO_PERFIL = '_perfil'
+CABECALHO_PERFIL = 'HTTP_X_COMPUFOUR_PERFIL'
+LINHAS_PERFIL = 40
+LINHAS_ALOCACOES = 25
+MAX_ARQUIVOS_PERFIL = 50
+
+
+class _ColetorConsultas:
+    """execute_wrapper que conta consultas, tempo de banco e repetições por SQL."""
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self.repeticoes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.total += 1
+            self.repeticoes[sql] += 1
+
+    def duplicadas(self, limite=5):
+        """Consultas repetidas (típico N+1), agrupadas pela impressão digital do SQL."""
+        agrupadas = Counter()
+        for sql, vezes in self.repeticoes.items():
+            agrupadas[impressao_digital_sql(sql)] += vezes
+        return [
+            {'sql': sql[:300], 'vezes': vezes}
+            for sql, vezes in agrupadas.most_common(limite)
+            if vezes > 1
+        ]
+
+
+class MetricasMiddleware:
+    """Alimenta as métricas de /metrics: duração e consultas SQL por view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas_antes = metricas.consultas_da_thread()
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+        view = _nome_view(request) or 'nao_resolvida'
+        metricas.REQUISICAO_SEGUNDOS.observar(duracao, view=view, metodo=request.method)
+        metricas.CONSULTAS_SQL.incrementar(metricas.consultas_da_thread() - consultas_antes, view=view)
+        metricas.gravar_processo()
+        return response
+
+
+class ConsultasPorRequisicaoMiddleware:
+    """
+    Registra, para uma amostra das requisições, quantas consultas SQL foram
+    feitas, o tempo gasto no banco, as consultas repetidas e qual view/ação
+    do admin atendeu. As amostras vão para DIAGNOSTICO_ROOT/consultas.jsonl
+    e são resumidas em /admin/diagnostico/consultas/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.amostragem = getattr(settings, 'DIAGNOSTICO', {}).get('AMOSTRAGEM_CONSULTAS', 0.0)
+
+    def __call__(self, request):
+        if not self.amostragem or random.random() >= self.amostragem:
+            return self.get_response(request)
+
+        coletor = _ColetorConsultas()
+        inicio = time.perf_counter()
+        wrappers = [conexao.execute_wrapper(coletor) for conexao in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        duracao = time.perf_counter() - inicio
+
+        ARMAZEM_CONSULTAS.registrar({
+            'em': timezone.now().isoformat(timespec='seconds'),
+            'metodo': request.method,
+            'caminho': request.path,
+            'view': _nome_view(request),
+            'acao': request.POST.get('action', '') if request.method == 'POST' else '',
+            'status': response.status_code,
+            'duracao_ms': round(duracao * 1000, 1),
+            'consultas': coletor.total,
+            'tempo_db_ms': round(coletor.tempo * 1000, 1),
+            'duplicadas': coletor.duplicadas(),
+        })
+        return response
+
+
+class RastreamentoSinaisMiddleware:
+    """Agrupa os receptores de sinais executados numa requisição em um único rastro."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with rastrear_cascata(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class CadastrosReferenciaMiddleware:
+    """Faz o primeiro acesso a core.referencias em cada requisição conferir as versões das tabelas."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        referencias.nova_requisicao()
+        return self.get_response(request)
+
+
+def diretorio_perfis():
+    return Path(settings.DIAGNOSTICO_ROOT) / 'perfis'
+
+
+class PerfilSobDemandaMiddleware:
+    """
+    Executa a requisição sob cProfile e tracemalloc quando um usuário da
+    equipe pede (?_perfil=1 na URL ou cabeçalho X-Compufour-Perfil: 1).
+    O parâmetro é retirado antes da view, para não virar filtro nos
+    changelists; como o formulário de ações posta para a própria URL,
+    ?_perfil=1 no changelist também perfila ações como gerar_pdf_detalhado.
+    O resultado fica em DIAGNOSTICO_ROOT/perfis.jsonl (texto do pstats e
+    maiores alocações) e DIAGNOSTICO_ROOT/perfis/<id>.prof, e pode ser
+    visto em /admin/diagnostico/perfis/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pedido = request.GET.get(PARAMETRO_PERFIL) or request.META.get(CABECALHO_PERFIL)
+        if not pedido:
+            return self.get_response(request)
+        if PARAMETRO_PERFIL in request.GET:
+            request.GET = request.GET.copy()
+            del request.GET[PARAMETRO_PERFIL]
+            request.META['QUERY_STRING'] = request.GET.urlencode()
+        usuario = getattr(request, 'user', None)
+        if usuario is None or not (usuario.is_active and usuario.is_staff):
+            return self.get_response(request)
+        return self._perfilar(request)
+
+    def _perfilar(self, request):
+        perfil_id = uuid.uuid4().hex[:12]
+        ja_rastreando = tracemalloc.is_tracing()
+        if not ja_rastreando:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            duracao = time.perf_counter() - inicio
+            snapshot = tracemalloc.take_snapshot()
+            _, pico = tracemalloc.get_traced_memory()
+            if not ja_rastreando:
+                tracemalloc.stop()
+
+        self._gravar(request, response, perfil_id, profiler, snapshot, pico, duracao)
+        response['X-Compufour-Perfil-Id'] = perfil_id
+        return response
+
+    def _gravar(self, request, response, perfil_id, profiler, snapshot, pico, duracao):
+        texto = io.StringIO()
+        estatisticas = pstats.Stats(profiler, stream=texto)
+        estatisticas.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(LINHAS_PERFIL)
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        alocacoes = [
+            {'local': str(estatistica.traceback[0]), 'kib': round(estatistica.size / 1024, 1), 'blocos': estatistica.count}
+            for estatistica in snapshot.statistics('lineno')[:LINHAS_ALOCACOES]
+        ]
+
+        diretorio = diretorio_perfis()
+        try:
+            diretorio.mkdir(parents=True, exist_ok=True)
+            estatisticas.dump_stats(diretorio / f'{perfil_id}.prof')
+            antigos = sorted(diretorio.glob('*.prof'), key=lambda arquivo: arquivo.stat().st_mtime)
+            for arquivo in antigos[:-MAX_ARQUIVOS_PERFIL]:
+                arquivo.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+        ARMAZEM_PERFIS.registrar({
+            'id': perfil_id,
+            'em': timezone.now().isoformat(timespec='seconds'),
+            'usuario': request.user.get_username(),
+            'usuario_id': request.user.pk,
+            'metodo': request.method,
+            'caminho': request.get_full_path(),
+            'view': _nome_view(request),
+            'acao': request.POST.get('action', '') if request.method == 'POST' else '',
+            'status': response.status_code,
+            'duracao_ms': round(duracao * 1000, 1),
+            'chamadas': estatisticas.total_calls,
+            'memoria_pico_kib': round(pico / 1024, 1),
+            'perfil': texto.getvalue(),
+            'alocacoes': alocacoes,
+        })
+
+
+def _nome_view(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return ''
+    return match.view_name or match._func_path
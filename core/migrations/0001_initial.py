@@ -307,7 +307,7 @@ class Migration(migrations.Migration):
                 ),
                 (
                     "compra_prazo_pagamento",
-                    models.CharField(verbose_name="Prazo de Pagamento"),
+                    models.CharField(max_length=50, verbose_name="Prazo de Pagamento"),
                 ),
                 (
                     "compra_data_base",
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:00
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0014_remove_venda_item_preco_custo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relatorio',
+            fields=[
+                ('relatorio_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('relatorio_descricao', models.CharField(max_length=255, verbose_name='Relatório')),
+                ('relatorio_modelo', models.CharField(help_text='app_label.model_name do admin que gera o relatório', max_length=100, verbose_name='Modelo')),
+                ('relatorio_acao', models.CharField(max_length=100, verbose_name='Ação')),
+                ('relatorio_ids', models.TextField(help_text='Lista JSON com as chaves selecionadas no admin', verbose_name='Registros selecionados')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na fila'), ('EXECUTANDO', 'Em execução'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro'), ('CANCELADO', 'Cancelado')], default='PENDENTE', max_length=10, verbose_name='Status')),
+                ('relatorio_progresso', models.PositiveSmallIntegerField(default=0, verbose_name='Progresso (%)')),
+                ('relatorio_mensagem', models.TextField(blank=True, default='', verbose_name='Mensagem')),
+                ('relatorio_arquivo', models.FileField(blank=True, max_length=255, storage=core.models._armazenamento_relatorios, upload_to='%Y/%m/', verbose_name='Arquivo')),
+                ('relatorio_nome_arquivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Nome do arquivo')),
+                ('relatorio_content_type', models.CharField(blank=True, default='', max_length=100, verbose_name='Tipo do arquivo')),
+                ('relatorio_criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Solicitado em')),
+                ('relatorio_iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('relatorio_concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('usuario', models.ForeignKey(db_column='usuario_id', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Relatório',
+                'verbose_name_plural': 'Meus relatórios',
+                'db_table': 'relatorio',
+                'ordering': ['-relatorio_criado_em'],
+                'indexes': [models.Index(fields=['status', 'relatorio_criado_em'], name='relatorio_fila_idx')],
+            },
+        ),
+    ]
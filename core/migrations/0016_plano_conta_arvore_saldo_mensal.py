@@ -0,0 +1,124 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncMonth
+import re
+
+
+def preencher_arvore_e_saldos(apps, schema_editor):
+    PlanoConta = apps.get_model('core', 'PlanoConta')
+    Caixa = apps.get_model('core', 'Caixa')
+    PlanoContaSaldoMensal = apps.get_model('core', 'PlanoContaSaldoMensal')
+
+    contas = list(PlanoConta.objects.all())
+    por_caminho = {}
+    for conta in sorted(contas, key=lambda c: -c.plano_conta_id):
+        conta.plano_conta_caminho = '.'.join(re.findall(r'\d+', conta.plano_conta_numero or ''))
+        conta.plano_conta_nivel = len(conta.plano_conta_caminho.split('.')) if conta.plano_conta_caminho else 0
+        por_caminho[conta.plano_conta_caminho] = conta.plano_conta_id
+    for conta in contas:
+        grupos = conta.plano_conta_caminho.split('.') if conta.plano_conta_caminho else []
+        conta.plano_conta_pai_id = None
+        for i in range(len(grupos) - 1, 0, -1):
+            conta.plano_conta_pai_id = por_caminho.get('.'.join(grupos[:i]))
+            if conta.plano_conta_pai_id is not None:
+                break
+    PlanoConta.objects.bulk_update(contas, ['plano_conta_caminho', 'plano_conta_nivel', 'plano_conta_pai'], batch_size=500)
+
+    linhas = (
+        Caixa.objects.exclude(caixa_data_emissao=None)
+        .annotate(competencia=TruncMonth('caixa_data_emissao'))
+        .order_by()
+        .values('plano_conta_id', 'empresa_id', 'competencia')
+        .annotate(
+            entradas=models.Sum('caixa_valor_entrada'),
+            saidas=models.Sum('caixa_valor_saida'),
+            lancamentos=models.Count('pk'),
+        )
+    )
+    PlanoContaSaldoMensal.objects.bulk_create(
+        [
+            PlanoContaSaldoMensal(
+                plano_conta_id=linha['plano_conta_id'],
+                empresa_id=linha['empresa_id'],
+                competencia=linha['competencia'],
+                saldo_valor_entrada=linha['entradas'] or 0,
+                saldo_valor_saida=linha['saidas'] or 0,
+                saldo_lancamentos=linha['lancamentos'],
+            )
+            for linha in linhas
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_relatorio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanoContaSaldoMensal',
+            fields=[
+                ('plano_conta_saldo_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês', verbose_name='Competência')),
+                ('saldo_valor_entrada', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Entradas')),
+                ('saldo_valor_saida', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Saídas')),
+                ('saldo_lancamentos', models.PositiveIntegerField(default=0, verbose_name='Lançamentos')),
+            ],
+            options={
+                'verbose_name': 'Saldo Mensal do Plano de Contas',
+                'verbose_name_plural': 'Saldos Mensais do Plano de Contas',
+                'db_table': 'plano_conta_saldo_mensal',
+            },
+        ),
+        migrations.AddField(
+            model_name='planoconta',
+            name='plano_conta_caminho',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20, verbose_name='Caminho'),
+        ),
+        migrations.AddField(
+            model_name='planoconta',
+            name='plano_conta_nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nível'),
+        ),
+        migrations.AddField(
+            model_name='planoconta',
+            name='plano_conta_pai',
+            field=models.ForeignKey(blank=True, db_column='plano_conta_pai_id', editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='filhos', to='core.planoconta', verbose_name='Conta superior'),
+        ),
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(fields=['plano_conta', 'caixa_data_emissao'], name='caixa_plano_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planoconta',
+            index=models.Index(fields=['plano_conta_caminho'], name='plano_conta_caminho_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planoconta',
+            index=models.Index(fields=['plano_conta_nivel', 'plano_conta_caminho'], name='plano_conta_nivel_idx'),
+        ),
+        migrations.AddField(
+            model_name='planocontasaldomensal',
+            name='empresa',
+            field=models.ForeignKey(db_column='empresa_id', on_delete=django.db.models.deletion.CASCADE, to='core.empresa'),
+        ),
+        migrations.AddField(
+            model_name='planocontasaldomensal',
+            name='plano_conta',
+            field=models.ForeignKey(db_column='plano_conta_id', on_delete=django.db.models.deletion.CASCADE, to='core.planoconta'),
+        ),
+        migrations.AddIndex(
+            model_name='planocontasaldomensal',
+            index=models.Index(fields=['competencia', 'plano_conta'], name='plano_conta_saldo_comp_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='planocontasaldomensal',
+            constraint=models.UniqueConstraint(fields=('plano_conta', 'competencia', 'empresa'), name='plano_conta_saldo_mensal_unico'),
+        ),
+        migrations.RunPython(preencher_arvore_e_saldos, migrations.RunPython.noop),
+    ]
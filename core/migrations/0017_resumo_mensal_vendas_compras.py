@@ -0,0 +1,124 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncMonth
+
+
+def _agregados(prefixo):
+    return {
+        'qtd': Sum(f'{prefixo}_qtd'),
+        'volume': Sum(f'{prefixo}_volume'),
+        'valor': Sum(ExpressionWrapper(F(f'{prefixo}_qtd') * F(f'{prefixo}_preco'), output_field=DecimalField())),
+        'itens': Count('pk'),
+    }
+
+
+def preencher_resumos(apps, schema_editor):
+    VendaItem = apps.get_model('core', 'VendaItem')
+    CompraItem = apps.get_model('core', 'CompraItem')
+    VendaResumoMensal = apps.get_model('core', 'VendaResumoMensal')
+    CompraResumoMensal = apps.get_model('core', 'CompraResumoMensal')
+
+    vendas = (
+        VendaItem.objects.exclude(venda__venda_data_emissao=None)
+        .annotate(competencia=TruncMonth('venda__venda_data_emissao'))
+        .order_by()
+        .values('competencia', 'produto_id', 'produto__grupo_mercadoria_id', 'cliente_id',
+                'plano_conta_id', 'venda__romaneio__compra__empresa_id')
+        .annotate(**_agregados('venda_item'))
+    )
+    VendaResumoMensal.objects.bulk_create([
+        VendaResumoMensal(
+            competencia=linha['competencia'],
+            produto_id=linha['produto_id'],
+            grupo_mercadoria_id=linha['produto__grupo_mercadoria_id'],
+            cliente_id=linha['cliente_id'],
+            plano_conta_id=linha['plano_conta_id'],
+            empresa_id=linha['venda__romaneio__compra__empresa_id'],
+            venda_resumo_qtd=linha['qtd'] or 0,
+            venda_resumo_volume=linha['volume'] or 0,
+            venda_resumo_valor=linha['valor'] or 0,
+            venda_resumo_itens=linha['itens'],
+        )
+        for linha in vendas
+    ], batch_size=500)
+
+    compras = (
+        CompraItem.objects.annotate(competencia=TruncMonth('compra__compra_data_entrada'))
+        .order_by()
+        .values('competencia', 'produto_id', 'compra__fornecedor_id')
+        .annotate(**_agregados('compra_item'))
+    )
+    CompraResumoMensal.objects.bulk_create([
+        CompraResumoMensal(
+            competencia=linha['competencia'],
+            produto_id=linha['produto_id'],
+            fornecedor_id=linha['compra__fornecedor_id'],
+            compra_resumo_qtd=linha['qtd'] or 0,
+            compra_resumo_volume=linha['volume'] or 0,
+            compra_resumo_valor=linha['valor'] or 0,
+            compra_resumo_itens=linha['itens'],
+        )
+        for linha in compras
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_plano_conta_arvore_saldo_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompraResumoMensal',
+            fields=[
+                ('compra_resumo_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês', verbose_name='Competência')),
+                ('compra_resumo_qtd', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Quantidade')),
+                ('compra_resumo_volume', models.IntegerField(default=0, verbose_name='Volume')),
+                ('compra_resumo_valor', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Valor')),
+                ('compra_resumo_itens', models.PositiveIntegerField(default=0, verbose_name='Itens')),
+                ('fornecedor', models.ForeignKey(db_column='fornecedor_id', on_delete=django.db.models.deletion.CASCADE, to='core.fornecedor')),
+                ('produto', models.ForeignKey(db_column='produto_id', on_delete=django.db.models.deletion.CASCADE, to='core.produto')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal de Compras',
+                'verbose_name_plural': 'Resumos Mensais de Compras',
+                'db_table': 'compra_resumo_mensal',
+            },
+        ),
+        migrations.CreateModel(
+            name='VendaResumoMensal',
+            fields=[
+                ('venda_resumo_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês', verbose_name='Competência')),
+                ('venda_resumo_qtd', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Quantidade')),
+                ('venda_resumo_volume', models.IntegerField(default=0, verbose_name='Volume')),
+                ('venda_resumo_valor', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Valor')),
+                ('venda_resumo_itens', models.PositiveIntegerField(default=0, verbose_name='Itens')),
+                ('cliente', models.ForeignKey(db_column='cliente_id', on_delete=django.db.models.deletion.CASCADE, to='core.cliente')),
+                ('empresa', models.ForeignKey(blank=True, db_column='empresa_id', null=True, on_delete=django.db.models.deletion.CASCADE, to='core.empresa')),
+                ('grupo_mercadoria', models.ForeignKey(db_column='grupo_mercadoria_id', on_delete=django.db.models.deletion.CASCADE, to='core.grupomercadoria')),
+                ('plano_conta', models.ForeignKey(db_column='plano_conta_id', on_delete=django.db.models.deletion.CASCADE, to='core.planoconta')),
+                ('produto', models.ForeignKey(db_column='produto_id', on_delete=django.db.models.deletion.CASCADE, to='core.produto')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal de Vendas',
+                'verbose_name_plural': 'Resumos Mensais de Vendas',
+                'db_table': 'venda_resumo_mensal',
+                'indexes': [models.Index(fields=['competencia', 'cliente'], name='venda_resumo_cliente_idx'), models.Index(fields=['competencia', 'produto'], name='venda_resumo_produto_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='vendaresumomensal',
+            constraint=models.UniqueConstraint(fields=('competencia', 'produto', 'cliente', 'plano_conta', 'empresa'), name='venda_resumo_mensal_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='compraresumomensal',
+            constraint=models.UniqueConstraint(fields=('competencia', 'produto', 'fornecedor'), name='compra_resumo_mensal_unico'),
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
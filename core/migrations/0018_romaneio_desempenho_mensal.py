@@ -0,0 +1,88 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+CFOP_ENTRADA = 1
+
+
+def preencher_desempenho(apps, schema_editor):
+    Romaneio = apps.get_model('core', 'Romaneio')
+    VendaItem = apps.get_model('core', 'VendaItem')
+    RomaneioDesempenhoMensal = apps.get_model('core', 'RomaneioDesempenhoMensal')
+
+    devolucao = Q(cfop__cfop_tipo=CFOP_ENTRADA)
+    valor = ExpressionWrapper(F('venda_item_qtd') * F('venda_item_preco'), output_field=DecimalField())
+    itens = {
+        (linha['competencia'], linha['venda__romaneio__funcionario_id'], linha['venda__romaneio__veiculo_id']): linha
+        for linha in VendaItem.objects.exclude(venda__romaneio__romaneio_data_emissao=None)
+        .annotate(competencia=TruncMonth('venda__romaneio__romaneio_data_emissao'))
+        .order_by()
+        .values('competencia', 'venda__romaneio__funcionario_id', 'venda__romaneio__veiculo_id')
+        .annotate(
+            entregue=Sum('venda_item_qtd', filter=~devolucao),
+            devolvido=Sum('venda_item_qtd', filter=devolucao),
+            vendas=Sum(valor, filter=~devolucao),
+            devolucoes=Sum(valor, filter=devolucao),
+        )
+    }
+    romaneios = (
+        Romaneio.objects.exclude(romaneio_data_emissao=None)
+        .annotate(competencia=TruncMonth('romaneio_data_emissao'))
+        .order_by()
+        .values('competencia', 'funcionario_id', 'veiculo_id')
+        .annotate(romaneios=Count('pk'), carregado=Sum('produto_item_qtd'))
+    )
+    novos = []
+    for linha in romaneios:
+        item = itens.get((linha['competencia'], linha['funcionario_id'], linha['veiculo_id']), {})
+        novos.append(RomaneioDesempenhoMensal(
+            competencia=linha['competencia'],
+            funcionario_id=linha['funcionario_id'],
+            veiculo_id=linha['veiculo_id'],
+            desempenho_romaneios=linha['romaneios'],
+            desempenho_carregado=Decimal(str(linha['carregado'] or 0)).quantize(Decimal('0.01')),
+            desempenho_entregue=item.get('entregue') or 0,
+            desempenho_devolvido=item.get('devolvido') or 0,
+            desempenho_valor_vendas=item.get('vendas') or 0,
+            desempenho_valor_devolucoes=item.get('devolucoes') or 0,
+        ))
+    RomaneioDesempenhoMensal.objects.bulk_create(novos, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_resumo_mensal_vendas_compras'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RomaneioDesempenhoMensal',
+            fields=[
+                ('desempenho_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês', verbose_name='Competência')),
+                ('desempenho_romaneios', models.PositiveIntegerField(default=0, verbose_name='Romaneios')),
+                ('desempenho_carregado', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Carregado')),
+                ('desempenho_entregue', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Entregue')),
+                ('desempenho_devolvido', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Devolvido')),
+                ('desempenho_valor_vendas', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Vendas')),
+                ('desempenho_valor_devolucoes', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Devoluções')),
+                ('funcionario', models.ForeignKey(db_column='funcionario_id', on_delete=django.db.models.deletion.CASCADE, to='core.funcionario')),
+                ('veiculo', models.ForeignKey(db_column='veiculo_id', on_delete=django.db.models.deletion.CASCADE, to='core.veiculo')),
+            ],
+            options={
+                'verbose_name': 'Desempenho Mensal de Romaneios',
+                'verbose_name_plural': 'Desempenho Mensal de Romaneios',
+                'db_table': 'romaneio_desempenho_mensal',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='romaneiodesempenhomensal',
+            constraint=models.UniqueConstraint(fields=('competencia', 'funcionario', 'veiculo'), name='romaneio_desempenho_mensal_unico'),
+        ),
+        migrations.RunPython(preencher_desempenho, migrations.RunPython.noop),
+    ]
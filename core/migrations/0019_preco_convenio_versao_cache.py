@@ -0,0 +1,62 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def preencher_precos_convenio(apps, schema_editor):
+    ClienteConvenioGrupoMercadoria = apps.get_model('core', 'ClienteConvenioGrupoMercadoria')
+    PrecoConvenio = apps.get_model('core', 'PrecoConvenio')
+    linhas = {}
+    for pk, cliente_id, grupo_id, preco in ClienteConvenioGrupoMercadoria.objects.order_by('-pk').values_list(
+        'pk', 'cliente_id', 'convenio_grupo_mercadoria__grupo_mercadoria_id',
+        'convenio_grupo_mercadoria__convenio__convenio_preco',
+    ):
+        linhas[(cliente_id, grupo_id)] = (pk, preco)
+    PrecoConvenio.objects.bulk_create([
+        PrecoConvenio(cliente_id=cliente_id, grupo_mercadoria_id=grupo_id, cliente_convenio_id=pk, preco_convenio_valor=preco)
+        for (cliente_id, grupo_id), (pk, preco) in linhas.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_romaneio_desempenho_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoCache',
+            fields=[
+                ('versao_cache_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('versao_cache_nome', models.CharField(max_length=50, unique=True, verbose_name='Nome')),
+                ('versao_cache_versao', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Cache',
+                'verbose_name_plural': 'Versões de Cache',
+                'db_table': 'versao_cache',
+            },
+        ),
+        migrations.CreateModel(
+            name='PrecoConvenio',
+            fields=[
+                ('preco_convenio_id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('preco_convenio_valor', models.FloatField(verbose_name='Preço')),
+                ('cliente', models.ForeignKey(db_column='cliente_id', on_delete=django.db.models.deletion.CASCADE, to='core.cliente')),
+                ('cliente_convenio', models.ForeignKey(db_column='cliente_convenio_grupo_mercadoria_id', on_delete=django.db.models.deletion.CASCADE, to='core.clienteconveniogrupomercadoria', verbose_name='Convênio do Cliente')),
+                ('grupo_mercadoria', models.ForeignKey(db_column='grupo_mercadoria_id', on_delete=django.db.models.deletion.CASCADE, to='core.grupomercadoria')),
+            ],
+            options={
+                'verbose_name': 'Preço de Convênio',
+                'verbose_name_plural': 'Preços de Convênio',
+                'db_table': 'preco_convenio',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='precoconvenio',
+            constraint=models.UniqueConstraint(fields=('cliente', 'grupo_mercadoria'), name='preco_convenio_unico'),
+        ),
+        migrations.RunPython(preencher_precos_convenio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_preco_convenio_versao_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(fields=['caixa_data_emissao', 'caixa_id'], name='caixa_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['pagamento_data_pagamento', 'pagamento_id'], name='pagamento_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recebimento',
+            index=models.Index(fields=['recebimento_data_recebimento', 'recebimento_id'], name='recebimento_data_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+def preencher_indicadores(apps, schema_editor):
+    # Mesma regra de Cfop.atualizar_indicadores (o modelo histórico não tem o método).
+    Cfop = apps.get_model('core', 'Cfop')
+    cfops = list(Cfop.objects.all())
+    for cfop in cfops:
+        integracao = (cfop.cfop_integracao or '').lower()
+        cfop.cfop_gera_receber = 'receber' in integracao
+        cfop.cfop_gera_pagar = 'pagar' in integracao
+        cfop.cfop_gera_caixa = 'caixa' in integracao
+        cfop.cfop_movimenta_estoque = 'estoque' not in integracao
+        cfop.cfop_disponivel_venda = (cfop.cfop_codigo or '')[:1] in ('5', '6', '7') or cfop.cfop_tipo == 2
+        cfop.cfop_disponivel_compra = cfop.cfop_tipo == 1
+    Cfop.objects.bulk_update(
+        cfops,
+        [
+            'cfop_gera_receber', 'cfop_gera_pagar', 'cfop_gera_caixa',
+            'cfop_movimenta_estoque', 'cfop_disponivel_venda', 'cfop_disponivel_compra',
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_indices_paginacao_keyset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_disponivel_compra',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Disponível para compra'),
+        ),
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_disponivel_venda',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Disponível para venda'),
+        ),
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_gera_caixa',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Gera lançamento no caixa'),
+        ),
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_gera_pagar',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Gera contas a pagar'),
+        ),
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_gera_receber',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Gera contas a receber'),
+        ),
+        migrations.AddField(
+            model_name='cfop',
+            name='cfop_movimenta_estoque',
+            field=models.BooleanField(db_index=True, default=True, editable=False, verbose_name='Movimenta estoque'),
+        ),
+        migrations.RunPython(preencher_indicadores, migrations.RunPython.noop),
+    ]
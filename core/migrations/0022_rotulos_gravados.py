@@ -0,0 +1,74 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:19
+
+from django.db import migrations, models
+
+
+def _preencher(model, campo, relacoes, montar):
+    lote = []
+    for obj in model.objects.select_related(*relacoes).iterator(chunk_size=2000):
+        setattr(obj, campo, montar(obj))
+        lote.append(obj)
+        if len(lote) == 1000:
+            model.objects.bulk_update(lote, [campo])
+            lote = []
+    if lote:
+        model.objects.bulk_update(lote, [campo])
+
+
+def preencher_rotulos(apps, schema_editor):
+    # Mesmo texto de montar_rotulo() em cada modelo (o modelo histórico não tem o método).
+    # A ordem importa: o rótulo do romaneio usa o da compra, e o da venda usa o do romaneio.
+    _preencher(
+        apps.get_model('core', 'Compra'), 'compra_rotulo', ('fornecedor',),
+        lambda compra: f'Compra {compra.compra_numero} - {compra.fornecedor.fornecedor_nome}'[:150],
+    )
+    _preencher(
+        apps.get_model('core', 'ContaPagar'), 'conta_pagar_fornecedor_nome', ('fornecedor',),
+        lambda conta: conta.fornecedor.fornecedor_nome[:100],
+    )
+    _preencher(
+        apps.get_model('core', 'Romaneio'), 'romaneio_rotulo', ('compra', 'funcionario', 'veiculo'),
+        lambda romaneio: (
+            f"{romaneio.compra.compra_rotulo if romaneio.compra else None} - "
+            f"{romaneio.funcionario.funcionario_nome} - "
+            f"{romaneio.veiculo.veiculo_modelo} - {romaneio.veiculo.veiculo_placa}"
+        )[:350],
+    )
+    _preencher(
+        apps.get_model('core', 'Venda'), 'venda_rotulo', ('romaneio',),
+        lambda venda: (
+            f"{venda.romaneio.romaneio_rotulo if venda.romaneio else None} - "
+            f"{venda.venda_data_emissao} - {venda.venda_data_vencimento}"
+        )[:400],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_cfop_indicadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compra',
+            name='compra_rotulo',
+            field=models.CharField(default='', editable=False, max_length=150, verbose_name='Rótulo'),
+        ),
+        migrations.AddField(
+            model_name='contapagar',
+            name='conta_pagar_fornecedor_nome',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Fornecedor'),
+        ),
+        migrations.AddField(
+            model_name='romaneio',
+            name='romaneio_rotulo',
+            field=models.CharField(default='', editable=False, max_length=350, verbose_name='Rótulo'),
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='venda_rotulo',
+            field=models.CharField(default='', editable=False, max_length=400, verbose_name='Rótulo'),
+        ),
+        migrations.RunPython(preencher_rotulos, migrations.RunPython.noop),
+    ]
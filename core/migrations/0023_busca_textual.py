@@ -0,0 +1,35 @@
+# Tabelas FTS5 da busca dos changelists (core/busca.py). O texto e os
+# triggers que o mantêm são instalados depois do migrate (post_migrate em
+# core/signals.py), já que o SQLite não permite recriar as tabelas referidas
+# pelos triggers durante as migrações.
+
+from django.db import migrations
+
+TABELAS = ('caixa', 'conta_pagar', 'contas_receber', 'produto', 'compra')
+
+
+def criar_tabelas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabela in TABELAS:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE busca_{tabela} USING fts5(texto, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def remover_tabelas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabela in TABELAS:
+        schema_editor.execute(f'DROP TABLE IF EXISTS busca_{tabela}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_rotulos_gravados'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_tabelas, remover_tabelas),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:47
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remover_duplicados(apps, schema_editor):
+    # Chaves sem empresa gravadas mais de uma vez: fica a linha mais recente
+    # (recalcular_resumos refaz os valores exatos, se necessário).
+    VendaResumoMensal = apps.get_model('core', 'VendaResumoMensal')
+    chave = ('competencia', 'produto_id', 'cliente_id', 'plano_conta_id')
+    duplicados = (
+        VendaResumoMensal.objects.filter(empresa__isnull=True)
+        .values(*chave).annotate(total=Count('pk'), ultimo=Max('pk')).filter(total__gt=1)
+    )
+    for linha in duplicados:
+        VendaResumoMensal.objects.filter(
+            empresa__isnull=True, **{campo: linha[campo] for campo in chave},
+        ).exclude(pk=linha['ultimo']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_busca_textual'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vendaresumomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('empresa__isnull', True)), fields=('competencia', 'produto', 'cliente', 'plano_conta'), name='venda_resumo_mensal_sem_empresa_unico'),
+        ),
+    ]
@@ -1,12 +1,55 @@
 ﻿import re
 from decimal import Decimal
 
-from django.db import models
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.db.models import Sum, F, DecimalField, ExpressionWrapper
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from .metricas import medir_lancamento
+from .rastreamento import rastrear_sinal
+
+
+class RotuloGravadoMixin:
+    """
+    __str__ lido de uma coluna própria (CAMPO_ROTULO) em vez de montado a
+    partir das tabelas relacionadas. O save() refaz o texto com
+    montar_rotulo(); quando um nome relacionado muda, core/rotulos.py refaz
+    os rótulos em lote. `com_relacoes_rotulo` traz as relações usadas por
+    montar_rotulo() numa só consulta.
+    """
+    CAMPO_ROTULO = None
+    RELACOES_ROTULO = ()
+
+    @classmethod
+    def com_relacoes_rotulo(cls, queryset=None):
+        queryset = cls._default_manager.all() if queryset is None else queryset
+        return queryset.select_related(*cls.RELACOES_ROTULO)
+
+    def montar_rotulo(self):
+        raise NotImplementedError
+
+    def atualizar_rotulo(self):
+        tamanho = self._meta.get_field(self.CAMPO_ROTULO).max_length
+        setattr(self, self.CAMPO_ROTULO, self.montar_rotulo()[:tamanho])
+
+    def rotulo(self):
+        """Rótulo gravado ou, se ainda não houver, montado na hora."""
+        return getattr(self, self.CAMPO_ROTULO) or self.montar_rotulo()
+
+    def save(self, *args, **kwargs):
+        anterior = getattr(self, self.CAMPO_ROTULO)
+        self.atualizar_rotulo()
+        # Usado pelos sinais para refazer os rótulos que incluem este.
+        self.rotulo_alterado = self.pk is not None and getattr(self, self.CAMPO_ROTULO) != anterior
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {self.CAMPO_ROTULO}
+        super().save(*args, **kwargs)
+
 class Empresa(models.Model):
     empresa_id = models.AutoField("ID", primary_key=True)
     empresa_nome = models.CharField("Empresa",max_length=45)
@@ -93,21 +136,116 @@ class Veiculo(models.Model):
     def __str__(self):
         return f'{self.veiculo_modelo} - {self.veiculo_placa}'
 
+def normalizar_caminho_conta(numero):
+    """
+    Converte o número da conta em caminho materializado: apenas os grupos de
+    dígitos separados por ponto ("1.01.001", " 1-01-001 " -> "1.01.001").
+    """
+    if not numero:
+        return ''
+    return '.'.join(re.findall(r'\d+', str(numero)))
+
+def limite_subarvore(caminho):
+    """
+    Limite superior (exclusivo) da subárvore de `caminho`.
+    Como o caminho só contém dígitos e pontos, o intervalo [caminho, caminho + '/')
+    cobre exatamente a própria conta e as descendentes ('/' vem logo após '.').
+    """
+    return f'{caminho}/'
+
 class PlanoConta(models.Model):
     plano_conta_id = models.AutoField("ID", primary_key=True)
     plano_conta_numero = models.CharField("Número da Conta", max_length=20, null=True, blank=True, help_text="1=Receita, 3=Despesa, 5=Banco")
     plano_conta_nome = models.CharField("Conta", max_length=50)
+    plano_conta_caminho = models.CharField("Caminho", max_length=20, blank=True, default='', editable=False)
+    plano_conta_nivel = models.PositiveSmallIntegerField("Nível", default=0, editable=False)
+    plano_conta_pai = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, db_column='plano_conta_pai_id', null=True, blank=True,
+        editable=False, related_name='filhos', verbose_name='Conta superior',
+    )
 
     class Meta:
         db_table = 'plano_conta'
         verbose_name = 'Plano de Conta'
         verbose_name_plural = 'Planos de Conta'
         ordering = ['plano_conta_numero', 'plano_conta_nome']
+        indexes = [
+            models.Index(fields=['plano_conta_caminho'], name='plano_conta_caminho_idx'),
+            models.Index(fields=['plano_conta_nivel', 'plano_conta_caminho'], name='plano_conta_nivel_idx'),
+        ]
 
     def __str__(self):
         if self.plano_conta_numero:
             return f"{self.plano_conta_numero} - {self.plano_conta_nome}"
         return self.plano_conta_nome
+
+    def save(self, *args, **kwargs):
+        caminho_anterior = None
+        if self.pk:
+            caminho_anterior = PlanoConta.objects.filter(pk=self.pk).values_list('plano_conta_caminho', flat=True).first()
+        self.plano_conta_caminho = normalizar_caminho_conta(self.plano_conta_numero)
+        self.plano_conta_nivel = len(self.plano_conta_caminho.split('.')) if self.plano_conta_caminho else 0
+        self.plano_conta_pai_id = self._localizar_pai_id()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'plano_conta_numero' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'plano_conta_caminho', 'plano_conta_nivel', 'plano_conta_pai'}
+        super().save(*args, **kwargs)
+        for caminho in {caminho_anterior, self.plano_conta_caminho}:
+            if caminho:
+                PlanoConta.reorganizar_subarvore(caminho)
+
+    def _localizar_pai_id(self):
+        """Conta existente mais próxima cujo caminho é prefixo (por grupos) do caminho atual."""
+        partes = self.plano_conta_caminho.split('.') if self.plano_conta_caminho else []
+        prefixos = ['.'.join(partes[:i]) for i in range(1, len(partes))]
+        if not prefixos:
+            return None
+        return (
+            PlanoConta.objects.filter(plano_conta_caminho__in=prefixos)
+            .exclude(pk=self.pk)
+            .order_by('-plano_conta_nivel', 'plano_conta_id')
+            .values_list('pk', flat=True)
+            .first()
+        )
+
+    @classmethod
+    def reorganizar_subarvore(cls, caminho):
+        """Recalcula o pai das contas abaixo de `caminho` (após inclusão, renumeração ou exclusão)."""
+        descendentes = list(cls.objects.filter(
+            plano_conta_caminho__gt=caminho,
+            plano_conta_caminho__lt=limite_subarvore(caminho),
+        ).only('plano_conta_id', 'plano_conta_caminho', 'plano_conta_pai_id'))
+        if not descendentes:
+            return
+        partes = caminho.split('.')
+        ancestrais = ['.'.join(partes[:i]) for i in range(1, len(partes) + 1)]
+        candidatos = {}
+        for pk, caminho_candidato in cls.objects.filter(
+            models.Q(plano_conta_caminho__in=ancestrais)
+            | models.Q(plano_conta_caminho__gt=caminho, plano_conta_caminho__lt=limite_subarvore(caminho))
+        ).order_by('-plano_conta_id').values_list('pk', 'plano_conta_caminho'):
+            candidatos[caminho_candidato] = pk
+        alterados = []
+        for conta in descendentes:
+            grupos = conta.plano_conta_caminho.split('.')
+            pai_id = None
+            for i in range(len(grupos) - 1, 0, -1):
+                pai_id = candidatos.get('.'.join(grupos[:i]))
+                if pai_id is not None:
+                    break
+            if conta.plano_conta_pai_id != pai_id:
+                conta.plano_conta_pai_id = pai_id
+                alterados.append(conta)
+        if alterados:
+            cls.objects.bulk_update(alterados, ['plano_conta_pai'])
+
+    @classmethod
+    def filtro_subarvore(cls, caminho, prefixo=''):
+        """Q com o intervalo indexado que seleciona a conta `caminho` e todas as descendentes."""
+        return models.Q(**{
+            f'{prefixo}plano_conta_caminho__gte': caminho,
+            f'{prefixo}plano_conta_caminho__lt': limite_subarvore(caminho),
+        })
     
     def get_primeiro_digito(self):
         """Retorna o primeiro dígito do número da conta."""
@@ -186,6 +324,20 @@ class Cfop(models.Model):
     cfop_operacao = models.CharField("Operação",max_length=255, null=True, blank=True)
     cfop_integracao = models.CharField("Integração", max_length=50, choices=IntegracaoChoice.choices, null=True, blank=True)
     cfop_tipo = models.IntegerField("Tipo", choices=TipoCfop.choices, null=True, blank=True)
+    # Indicadores derivados de integração, código e tipo, recalculados em save():
+    # lançamentos, totais e formulários filtram por eles com igualdade, sem LIKE
+    # em cfop_integracao nem regex em cfop_codigo.
+    cfop_gera_receber = models.BooleanField("Gera contas a receber", default=False, editable=False, db_index=True)
+    cfop_gera_pagar = models.BooleanField("Gera contas a pagar", default=False, editable=False, db_index=True)
+    cfop_gera_caixa = models.BooleanField("Gera lançamento no caixa", default=False, editable=False, db_index=True)
+    cfop_movimenta_estoque = models.BooleanField("Movimenta estoque", default=True, editable=False, db_index=True)
+    cfop_disponivel_venda = models.BooleanField("Disponível para venda", default=False, editable=False, db_index=True)
+    cfop_disponivel_compra = models.BooleanField("Disponível para compra", default=False, editable=False, db_index=True)
+
+    CAMPOS_INDICADORES = (
+        'cfop_gera_receber', 'cfop_gera_pagar', 'cfop_gera_caixa',
+        'cfop_movimenta_estoque', 'cfop_disponivel_venda', 'cfop_disponivel_compra',
+    )
 
     class Meta:
         db_table = 'cfop'
@@ -195,6 +347,32 @@ class Cfop(models.Model):
 
     def __str__(self):
         return f'{self.cfop_codigo} - {self.cfop_operacao}'
+
+    def save(self, *args, **kwargs):
+        self.atualizar_indicadores()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'cfop_codigo', 'cfop_integracao', 'cfop_tipo'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_INDICADORES)
+        super().save(*args, **kwargs)
+
+    def atualizar_indicadores(self):
+        """
+        Recalcula os indicadores. Chame antes de bulk_create/bulk_update, que
+        não passam por save().
+        - Receber, pagar e caixa: a integração contém a palavra (ex.:
+          'estoque/receber', 'caixa/cheque').
+        - Estoque: as integrações 'estoque...' não movimentam estoque.
+        - Venda: códigos 5, 6 e 7 ou tipo SAÍDA; compra: tipo ENTRADA.
+        """
+        integracao = (self.cfop_integracao or '').lower()
+        self.cfop_gera_receber = 'receber' in integracao
+        self.cfop_gera_pagar = 'pagar' in integracao
+        self.cfop_gera_caixa = 'caixa' in integracao
+        self.cfop_movimenta_estoque = 'estoque' not in integracao
+        self.cfop_disponivel_venda = (
+            (self.cfop_codigo or '')[:1] in ('5', '6', '7') or self.cfop_tipo == self.TipoCfop.SAIDA
+        )
+        self.cfop_disponivel_compra = self.cfop_tipo == self.TipoCfop.ENTRADA
     
     def get_first_digit(self):
         """Retorna o primeiro dígito do código CFOP."""
@@ -283,7 +461,7 @@ class Produto(models.Model):
     def __str__(self):
         return self.produto_nome
 
-class Compra(models.Model):
+class Compra(RotuloGravadoMixin, models.Model):
     compra_id = models.AutoField("ID", primary_key=True)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, db_column='empresa_id')
     fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, db_column='fornecedor_id')
@@ -293,6 +471,10 @@ class Compra(models.Model):
     compra_data_saida_fornecedor = models.DateField("Data de Saída do Fornecedor", null=True, blank=True)
     compra_prazo_pagamento = models.CharField("Prazo de Pagamento", max_length=50)
     compra_data_base = models.DateField("Data Base", null=True, blank=True)
+    compra_rotulo = models.CharField("Rótulo", max_length=150, editable=False, default='')
+
+    CAMPO_ROTULO = 'compra_rotulo'
+    RELACOES_ROTULO = ('fornecedor',)
 
     class Meta:
         db_table = 'compra'
@@ -300,13 +482,16 @@ class Compra(models.Model):
         verbose_name_plural = 'Compras'
 
     def __str__(self):
+        return self.rotulo()
+
+    def montar_rotulo(self):
         return f'Compra {self.compra_numero} - {self.fornecedor.fornecedor_nome}'
 
     def calcular_total_pagar(self):
         from .models import CompraItem  # evitar import circular
         total = CompraItem.objects.filter(
             compra=self,
-            cfop__cfop_integracao__icontains="pagar"
+            cfop__cfop_gera_pagar=True
         ).aggregate(
             total=Sum(
                 ExpressionWrapper(
@@ -334,7 +519,7 @@ class CompraItem(models.Model):
     def __str__(self):
         return f'Item {self.produto.produto_nome} da Compra {self.compra.compra_id}'
 
-class ContaPagar(models.Model):
+class ContaPagar(RotuloGravadoMixin, models.Model):
     conta_pagar_id = models.AutoField(primary_key=True)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, db_column='empresa_id')
     fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, db_column='fornecedor_id')
@@ -347,6 +532,11 @@ class ContaPagar(models.Model):
     conta_pagar_valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     conta_pagar_portador = models.CharField(max_length=50, null=True, blank=True)
     conta_pagar_nosso_numero = models.CharField(max_length=50, null=True, blank=True)
+    # Só o nome do fornecedor: o número da conta é a chave, conhecida depois do INSERT.
+    conta_pagar_fornecedor_nome = models.CharField("Fornecedor", max_length=100, editable=False, default='')
+
+    CAMPO_ROTULO = 'conta_pagar_fornecedor_nome'
+    RELACOES_ROTULO = ('fornecedor',)
 
     class Meta:
         db_table = 'conta_pagar'
@@ -354,7 +544,10 @@ class ContaPagar(models.Model):
         verbose_name_plural = 'Contas a Pagar'
 
     def __str__(self):
-        return f'Conta a Pagar {self.conta_pagar_id} - {self.fornecedor.fornecedor_nome}'
+        return f'Conta a Pagar {self.conta_pagar_id} - {self.rotulo()}'
+
+    def montar_rotulo(self):
+        return self.fornecedor.fornecedor_nome
 
 class ContasReceber(models.Model):
     contas_receber_id = models.AutoField(primary_key=True)
@@ -390,6 +583,9 @@ class Pagamento(models.Model):
         db_table = 'pagamento'
         verbose_name = 'Pagamento'      
         verbose_name_plural = 'Pagamentos'
+        indexes = [
+            models.Index(fields=['pagamento_data_pagamento', 'pagamento_id'], name='pagamento_data_idx'),
+        ]
 
     def __str__(self):
         return f'Pagamento Nº {self.pagamento_id}'
@@ -406,6 +602,9 @@ class Recebimento(models.Model):
         db_table = 'recebimento'
         verbose_name = 'Recebimento'
         verbose_name_plural = 'Recebimentos'
+        indexes = [
+            models.Index(fields=['recebimento_data_recebimento', 'recebimento_id'], name='recebimento_data_idx'),
+        ]
 
     def __str__(self):
         return f'Recebimento Nº {self.recebimento_id}'    
@@ -424,6 +623,10 @@ class Caixa(models.Model):
         verbose_name = 'caixa'
         verbose_name_plural = 'Caixa'
         ordering = ['-caixa_data_emissao']
+        indexes = [
+            models.Index(fields=['plano_conta', 'caixa_data_emissao'], name='caixa_plano_data_idx'),
+            models.Index(fields=['caixa_data_emissao', 'caixa_id'], name='caixa_data_idx'),
+        ]
 
     def __str__(self):
         """Retorna uma representação legível do lançamento de caixa."""
@@ -438,7 +641,7 @@ class Caixa(models.Model):
         """Calcula o saldo do movimento (entrada - saída)."""
         return self.caixa_valor_entrada - self.caixa_valor_saida
 
-class Romaneio(models.Model):
+class Romaneio(RotuloGravadoMixin, models.Model):
     romaneio_id = models.AutoField("ID", primary_key=True)
     compra = models.ForeignKey(Compra, on_delete=models.CASCADE, db_column='compra_id', null=True, blank=True)
     funcionario = models.ForeignKey(Funcionario, on_delete=models.CASCADE, db_column='funcionario_id')
@@ -458,6 +661,10 @@ class Romaneio(models.Model):
         default=StatusChoices.ABERTO,
         help_text="Status definido manualmente: Aberto ou Fechado"
     )
+    romaneio_rotulo = models.CharField("Rótulo", max_length=350, editable=False, default='')
+
+    CAMPO_ROTULO = 'romaneio_rotulo'
+    RELACOES_ROTULO = ('compra', 'funcionario', 'veiculo')
 
     class Meta:
         db_table = 'romaneio'
@@ -465,14 +672,21 @@ class Romaneio(models.Model):
         verbose_name_plural = 'Romaneios'
 
     def __str__(self):
+        return self.rotulo()
+
+    def montar_rotulo(self):
         return f"{self.compra} - {self.funcionario} - {self.veiculo}"
 
-class Venda(models.Model):
+class Venda(RotuloGravadoMixin, models.Model):
     venda_id = models.AutoField(primary_key=True)
     romaneio = models.ForeignKey(Romaneio, on_delete=models.CASCADE, db_column='romaneio_id', null=True, blank=True)
     plano_conta = models.ForeignKey(PlanoConta, on_delete=models.CASCADE, db_column='plano_conta_id', verbose_name="Plano de Contas")
     venda_data_emissao = models.DateField("Data de Emissão",)
     venda_data_vencimento = models.DateField("Data de Vencimento",)
+    venda_rotulo = models.CharField("Rótulo", max_length=400, editable=False, default='')
+
+    CAMPO_ROTULO = 'venda_rotulo'
+    RELACOES_ROTULO = ('romaneio',)
 
     class Meta:
         db_table = 'venda'
@@ -480,13 +694,16 @@ class Venda(models.Model):
         verbose_name_plural = 'Vendas'
     
     def __str__(self):
+        return self.rotulo()
+
+    def montar_rotulo(self):
         return f"{self.romaneio} - {self.venda_data_emissao} - {self.venda_data_vencimento}"
     
     def calcular_total_receber(self):
         from django.db.models import Sum, F, DecimalField, ExpressionWrapper
         total = VendaItem.objects.filter(
             venda=self,
-            cfop__cfop_integracao__icontains="receber"
+            cfop__cfop_gera_receber=True
         ).aggregate(
             total=Sum(
                 ExpressionWrapper(
@@ -542,33 +759,246 @@ class ClienteConvenioGrupoMercadoria(models.Model):
     def __str__(self):
         return f"{self.cliente} -> {self.convenio_grupo_mercadoria}"
 
-_PLANO_CONTA_PADRAO_CACHE = None
+class PrecoConvenio(models.Model):
+    """
+    Preço de convênio já resolvido por cliente e grupo de mercadoria
+    (core/precos.py). Mantido pelos sinais dos convênios.
+    """
+    preco_convenio_id = models.AutoField("ID", primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_column='cliente_id')
+    grupo_mercadoria = models.ForeignKey(GrupoMercadoria, on_delete=models.CASCADE, db_column='grupo_mercadoria_id')
+    cliente_convenio = models.ForeignKey(
+        ClienteConvenioGrupoMercadoria, on_delete=models.CASCADE,
+        db_column='cliente_convenio_grupo_mercadoria_id', verbose_name='Convênio do Cliente',
+    )
+    preco_convenio_valor = models.FloatField("Preço")
+
+    class Meta:
+        db_table = 'preco_convenio'
+        verbose_name = 'Preço de Convênio'
+        verbose_name_plural = 'Preços de Convênio'
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'grupo_mercadoria'], name='preco_convenio_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.cliente} - {self.grupo_mercadoria}: {self.preco_convenio_valor}'
+
+class VersaoCache(models.Model):
+    """Contador de versão usado para invalidar caches em memória entre processos (core/versoes.py)."""
+    versao_cache_id = models.AutoField("ID", primary_key=True)
+    versao_cache_nome = models.CharField("Nome", max_length=50, unique=True)
+    versao_cache_versao = models.PositiveBigIntegerField("Versão", default=0)
+
+    class Meta:
+        db_table = 'versao_cache'
+        verbose_name = 'Versão de Cache'
+        verbose_name_plural = 'Versões de Cache'
+
+    def __str__(self):
+        return f'{self.versao_cache_nome} v{self.versao_cache_versao}'
+
+class PlanoContaSaldoMensal(models.Model):
+    """
+    Totais mensais do Caixa por conta e empresa. Mantido pelos sinais do Caixa
+    (core/resumos.py) e reconstruído por `manage.py recalcular_resumos`.
+    """
+    plano_conta_saldo_id = models.AutoField("ID", primary_key=True)
+    plano_conta = models.ForeignKey(PlanoConta, on_delete=models.CASCADE, db_column='plano_conta_id')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, db_column='empresa_id')
+    competencia = models.DateField("Competência", help_text="Primeiro dia do mês")
+    saldo_valor_entrada = models.DecimalField("Entradas", max_digits=15, decimal_places=2, default=0)
+    saldo_valor_saida = models.DecimalField("Saídas", max_digits=15, decimal_places=2, default=0)
+    saldo_lancamentos = models.PositiveIntegerField("Lançamentos", default=0)
+
+    class Meta:
+        db_table = 'plano_conta_saldo_mensal'
+        verbose_name = 'Saldo Mensal do Plano de Contas'
+        verbose_name_plural = 'Saldos Mensais do Plano de Contas'
+        constraints = [
+            models.UniqueConstraint(fields=['plano_conta', 'competencia', 'empresa'], name='plano_conta_saldo_mensal_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['competencia', 'plano_conta'], name='plano_conta_saldo_comp_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.plano_conta} - {self.competencia:%m/%Y}'
+
+class VendaResumoMensal(models.Model):
+    """
+    Itens de venda agregados por mês, produto, grupo, cliente, plano de contas e
+    empresa (empresa da compra do romaneio, quando houver). Mantido pelos sinais
+    (core/resumos.py) e reconstruído por `manage.py recalcular_resumos`.
+    """
+    venda_resumo_id = models.AutoField("ID", primary_key=True)
+    competencia = models.DateField("Competência", help_text="Primeiro dia do mês")
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, db_column='produto_id')
+    grupo_mercadoria = models.ForeignKey(GrupoMercadoria, on_delete=models.CASCADE, db_column='grupo_mercadoria_id')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_column='cliente_id')
+    plano_conta = models.ForeignKey(PlanoConta, on_delete=models.CASCADE, db_column='plano_conta_id')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, db_column='empresa_id', null=True, blank=True)
+    venda_resumo_qtd = models.DecimalField("Quantidade", max_digits=15, decimal_places=2, default=0)
+    venda_resumo_volume = models.IntegerField("Volume", default=0)
+    venda_resumo_valor = models.DecimalField("Valor", max_digits=15, decimal_places=2, default=0)
+    venda_resumo_itens = models.PositiveIntegerField("Itens", default=0)
+
+    class Meta:
+        db_table = 'venda_resumo_mensal'
+        verbose_name = 'Resumo Mensal de Vendas'
+        verbose_name_plural = 'Resumos Mensais de Vendas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['competencia', 'produto', 'cliente', 'plano_conta', 'empresa'],
+                name='venda_resumo_mensal_unico',
+            ),
+            # No SQLite os NULLs são todos distintos: sem esta, dois update_or_create
+            # simultâneos de vendas sem empresa gravariam a mesma chave duas vezes.
+            models.UniqueConstraint(
+                fields=['competencia', 'produto', 'cliente', 'plano_conta'],
+                condition=models.Q(empresa__isnull=True),
+                name='venda_resumo_mensal_sem_empresa_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['competencia', 'cliente'], name='venda_resumo_cliente_idx'),
+            models.Index(fields=['competencia', 'produto'], name='venda_resumo_produto_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.competencia:%m/%Y} - {self.produto} - {self.cliente}'
+
+class CompraResumoMensal(models.Model):
+    """Itens de compra agregados por mês, produto e fornecedor."""
+    compra_resumo_id = models.AutoField("ID", primary_key=True)
+    competencia = models.DateField("Competência", help_text="Primeiro dia do mês")
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, db_column='produto_id')
+    fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, db_column='fornecedor_id')
+    compra_resumo_qtd = models.DecimalField("Quantidade", max_digits=15, decimal_places=2, default=0)
+    compra_resumo_volume = models.IntegerField("Volume", default=0)
+    compra_resumo_valor = models.DecimalField("Valor", max_digits=15, decimal_places=2, default=0)
+    compra_resumo_itens = models.PositiveIntegerField("Itens", default=0)
+
+    class Meta:
+        db_table = 'compra_resumo_mensal'
+        verbose_name = 'Resumo Mensal de Compras'
+        verbose_name_plural = 'Resumos Mensais de Compras'
+        constraints = [
+            models.UniqueConstraint(fields=['competencia', 'produto', 'fornecedor'], name='compra_resumo_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.competencia:%m/%Y} - {self.produto} - {self.fornecedor}'
+
+class RomaneioDesempenhoMensal(models.Model):
+    """
+    Desempenho dos romaneios por mês, funcionário e veículo: viagens, quantidade
+    carregada x entregue, vendas e devoluções (itens com CFOP de entrada).
+    """
+    desempenho_id = models.AutoField("ID", primary_key=True)
+    competencia = models.DateField("Competência", help_text="Primeiro dia do mês")
+    funcionario = models.ForeignKey(Funcionario, on_delete=models.CASCADE, db_column='funcionario_id')
+    veiculo = models.ForeignKey(Veiculo, on_delete=models.CASCADE, db_column='veiculo_id')
+    desempenho_romaneios = models.PositiveIntegerField("Romaneios", default=0)
+    desempenho_carregado = models.DecimalField("Carregado", max_digits=15, decimal_places=2, default=0)
+    desempenho_entregue = models.DecimalField("Entregue", max_digits=15, decimal_places=2, default=0)
+    desempenho_devolvido = models.DecimalField("Devolvido", max_digits=15, decimal_places=2, default=0)
+    desempenho_valor_vendas = models.DecimalField("Vendas", max_digits=15, decimal_places=2, default=0)
+    desempenho_valor_devolucoes = models.DecimalField("Devoluções", max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'romaneio_desempenho_mensal'
+        verbose_name = 'Desempenho Mensal de Romaneios'
+        verbose_name_plural = 'Desempenho Mensal de Romaneios'
+        constraints = [
+            models.UniqueConstraint(fields=['competencia', 'funcionario', 'veiculo'], name='romaneio_desempenho_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.competencia:%m/%Y} - {self.funcionario} - {self.veiculo}'
+
+def _armazenamento_relatorios():
+    """Armazenamento privado dos relatórios gerados (fora do MEDIA público)."""
+    return FileSystemStorage(location=settings.RELATORIOS_ROOT)
+
+class Relatorio(models.Model):
+    class StatusChoices(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Na fila'
+        EXECUTANDO = 'EXECUTANDO', 'Em execução'
+        CONCLUIDO = 'CONCLUIDO', 'Concluído'
+        ERRO = 'ERRO', 'Erro'
+        CANCELADO = 'CANCELADO', 'Cancelado'
+
+    relatorio_id = models.AutoField("ID", primary_key=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_column='usuario_id', verbose_name="Usuário")
+    relatorio_descricao = models.CharField("Relatório", max_length=255)
+    relatorio_modelo = models.CharField("Modelo", max_length=100, help_text="app_label.model_name do admin que gera o relatório")
+    relatorio_acao = models.CharField("Ação", max_length=100)
+    relatorio_ids = models.TextField("Registros selecionados", help_text="Lista JSON com as chaves selecionadas no admin")
+    status = models.CharField("Status", max_length=10, choices=StatusChoices.choices, default=StatusChoices.PENDENTE)
+    relatorio_progresso = models.PositiveSmallIntegerField("Progresso (%)", default=0)
+    relatorio_mensagem = models.TextField("Mensagem", blank=True, default='')
+    relatorio_arquivo = models.FileField("Arquivo", upload_to='%Y/%m/', storage=_armazenamento_relatorios, max_length=255, blank=True)
+    relatorio_nome_arquivo = models.CharField("Nome do arquivo", max_length=255, blank=True, default='')
+    relatorio_content_type = models.CharField("Tipo do arquivo", max_length=100, blank=True, default='')
+    relatorio_criado_em = models.DateTimeField("Solicitado em", auto_now_add=True)
+    relatorio_iniciado_em = models.DateTimeField("Iniciado em", null=True, blank=True)
+    relatorio_concluido_em = models.DateTimeField("Concluído em", null=True, blank=True)
+
+    class Meta:
+        db_table = 'relatorio'
+        verbose_name = 'Relatório'
+        verbose_name_plural = 'Meus relatórios'
+        ordering = ['-relatorio_criado_em']
+        indexes = [
+            models.Index(fields=['status', 'relatorio_criado_em'], name='relatorio_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.relatorio_descricao} #{self.relatorio_id}'
+
+    @property
+    def finalizado(self):
+        return self.status in (
+            self.StatusChoices.CONCLUIDO,
+            self.StatusChoices.ERRO,
+            self.StatusChoices.CANCELADO,
+        )
+
+@receiver(post_delete, sender=Relatorio)
+def apagar_arquivo_do_relatorio(sender, instance, **kwargs):
+    # O arquivo só sai do RELATORIOS_ROOT depois do commit: se a exclusão for
+    # desfeita, a linha continua apontando para ele.
+    arquivo = instance.relatorio_arquivo
+    if arquivo:
+        transaction.on_commit(lambda: arquivo.storage.delete(arquivo.name))
 
 def _obter_plano_para_pagamento(conta_pagar):
+    from .referencias import obter
+
     if conta_pagar is None:
         return None
     if getattr(conta_pagar, 'plano_conta_id', None):
-        return conta_pagar.plano_conta
+        return obter(PlanoConta, conta_pagar.plano_conta_id)
     compra = getattr(conta_pagar, 'compra', None)
     if compra and getattr(compra, 'plano_conta_id', None):
-        return compra.plano_conta
-    global _PLANO_CONTA_PADRAO_CACHE
-    if _PLANO_CONTA_PADRAO_CACHE is None:
-        _PLANO_CONTA_PADRAO_CACHE = PlanoConta.objects.filter(pk=1).first()
-    return _PLANO_CONTA_PADRAO_CACHE
+        return obter(PlanoConta, compra.plano_conta_id)
+    return obter(PlanoConta, 1)
 
 def _historico_pagamento(pagamento):
     conta = pagamento.conta_pagar
     numero = getattr(conta, 'conta_pagar_numero_documento', None) or conta.conta_pagar_id
     return f'Pagamento #{pagamento.pk} da conta {numero}'
 
+@medir_lancamento('Pagamento')
 def _remover_pagamento_do_caixa(pagamento):
     conta = getattr(pagamento, 'conta_pagar', None)
     if not getattr(conta, 'pk', None) or not getattr(conta, 'empresa_id', None):
         return
     historico = _historico_pagamento(pagamento)
-    Caixa.objects.filter(empresa=conta.empresa, caixa_historico=historico).delete()
+    Caixa.objects.filter(empresa_id=conta.empresa_id, caixa_historico=historico).delete()
 
+@medir_lancamento('Pagamento')
 def _registrar_pagamento_no_caixa(pagamento):
     conta = getattr(pagamento, 'conta_pagar', None)
     if not getattr(conta, 'pk', None) or not getattr(conta, 'empresa_id', None):
@@ -584,7 +1014,7 @@ def _registrar_pagamento_no_caixa(pagamento):
     historico = _historico_pagamento(pagamento)
     data_pagamento = pagamento.pagamento_data_pagamento or timezone.localdate()
     Caixa.objects.update_or_create(
-        empresa=conta.empresa,
+        empresa_id=conta.empresa_id,
         caixa_historico=historico,
         defaults={
             'plano_conta': plano,
@@ -595,16 +1025,19 @@ def _registrar_pagamento_no_caixa(pagamento):
     )
 
 @receiver(post_save, sender=Pagamento)
+@rastrear_sinal
 def sincronizar_caixa_apos_salvar_pagamento(sender, instance, **kwargs):
     _registrar_pagamento_no_caixa(instance)
 
 @receiver(post_delete, sender=Pagamento)
+@rastrear_sinal
 def sincronizar_caixa_apos_excluir_pagamento(sender, instance, **kwargs):
     _remover_pagamento_do_caixa(instance)
 
 PAGAMENTO_HISTORICO_PATTERN = re.compile(r'^Pagamento #(\d+)')
 
 @receiver(post_delete, sender=Caixa)
+@rastrear_sinal
 def sincronizar_pagamento_ao_excluir_caixa(sender, instance, **kwargs):
     historico = (instance.caixa_historico or '').strip()
     match = PAGAMENTO_HISTORICO_PATTERN.match(historico)
@@ -0,0 +1,330 @@
+# core/paginacao.py
+#
+# Contagens mais baratas nos changelists do admin.
+#
+# O ChangeList do Django conta as linhas com COUNT(*) sobre o queryset do
+# ModelAdmin já anotado (somas de pagamentos com GROUP BY, estoque com dois
+# joins, subconsultas de compra/venda) e, para o link "mostrar tudo", faz
+# ainda outro COUNT(*) sem filtros. ChangeListContagem:
+#
+# - conta sobre o queryset "leve" do modelo (get_queryset_contagem, sem as
+#   anotações), aplicando os mesmos filtros e a busca. Se algum filtro
+#   depender de uma anotação do get_queryset, volta a contar sobre o
+#   queryset completo;
+# - guarda as contagens num CacheVersionado por modelo, com chave formada
+#   pelos parâmetros da URL e pela data do dia (há filtros relativos a hoje).
+#   Gravações do modelo ou de `contagem_dependencias` sobem a versão uma
+#   vez por transação, depois do commit;
+# - sem filtros nem busca, usa a estimativa do sqlite_stat1 (gerado por
+#   ANALYZE) quando ela passa de PAGINACAO['ESTIMAR_CONTAGEM_ACIMA'] linhas.
+#   A estimativa aparece como "cerca de N" e não serve para paginar: os links
+#   numerados vão só até a página seguinte, se ela existir.
+#
+# Com `paginacao_keyset = True` no ModelAdmin, a paginação deixa de usar
+# OFFSET e passa a buscar a página pela posição na ordenação padrão do
+# admin (por exemplo caixa_data_emissao, caixa_id): "próxima" pede as linhas
+# depois da última linha da página, "anterior" as linhas antes da primeira e
+# "última" lê a ordenação ao contrário. Todas custam o mesmo que a primeira
+# página. Filtros, busca e date_hierarchy continuam valendo; ordenar por uma
+# coluna (?o=) ou abrir uma página numerada (?p=) volta ao OFFSET.
+
+import json
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .versoes import CacheVersionado, depender_de
+
+CURSOR_APOS = '_apos'
+CURSOR_ANTES = '_antes'
+ULTIMA_PAGINA = '_ultima'
+PARAMETROS_KEYSET = (CURSOR_APOS, CURSOR_ANTES, ULTIMA_PAGINA)
+
+_caches_contagem = {}
+
+
+def nome_versao_contagem(model):
+    return f'contagem:{model._meta.label_lower}'
+
+
+def registrar_contagem(model, dependencias=()):
+    """Associa o changelist de `model` às gravações de `model` e das dependências."""
+    nome = nome_versao_contagem(model)
+    depender_de(nome, (model, *dependencias))
+    if nome not in _caches_contagem:
+        _caches_contagem[nome] = CacheVersionado(nome, tamanho=512)
+    return _caches_contagem[nome]
+
+
+def estimar_linhas(model):
+    """Número de linhas segundo o sqlite_stat1, ou None se não houver estatística."""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [model._meta.db_table])
+            linha = cursor.fetchone()
+    except DatabaseError:
+        return None
+    try:
+        return int(linha[0].split()[0]) if linha else None
+    except (ValueError, IndexError):
+        return None
+
+
+def posteriores(campos, valores):
+    """
+    Q das linhas que vêm depois de `valores` na ordenação `campos`, uma lista
+    de (campo, decrescente). NULL é o menor valor, como no SQLite.
+    """
+    (campo, decrescente), *resto = campos
+    valor, *demais = valores
+    if valor is None:
+        depois = None if decrescente else Q(**{f'{campo.name}__isnull': False})
+        igual = Q(**{f'{campo.name}__isnull': True})
+    elif decrescente:
+        depois = Q(**{f'{campo.name}__lt': valor}) | Q(**{f'{campo.name}__isnull': True})
+        igual = Q(**{campo.name: valor})
+    else:
+        depois = Q(**{f'{campo.name}__gt': valor})
+        igual = Q(**{campo.name: valor})
+    if resto:
+        seguintes = igual & posteriores(resto, demais)
+        return seguintes if depois is None else depois | seguintes
+    return depois if depois is not None else Q(pk__in=[])
+
+
+def _ordem(campos):
+    return [f"{'-' if decrescente else ''}{campo.name}" for campo, decrescente in campos]
+
+
+def _invertida(campos):
+    return [(campo, not decrescente) for campo, decrescente in campos]
+
+
+class ChangeListContagem(ChangeList):
+    _filtros = None
+    _contando = False
+    queryset_contagem = None
+    contagem_estimada = False
+    cursor_keyset = None
+    ordenacao_keyset = None
+    paginacao_keyset = None
+    paginas_estimadas = None
+
+    def get_filters(self, request):
+        # A segunda passada (queryset leve) reaproveita os filtros já montados.
+        if self._filtros is None:
+            self._filtros = super().get_filters(request)
+        return self._filtros
+
+    def get_ordering(self, request, queryset):
+        if self._contando:
+            return []
+        return super().get_ordering(request, queryset)
+
+    def get_queryset(self, request):
+        # O cursor não é filtro: sai dos parâmetros antes dos filtros e dos
+        # links (mudar filtro ou ordenação volta à primeira página).
+        self.cursor_keyset = {nome: self.params.pop(nome) for nome in PARAMETROS_KEYSET if nome in self.params}
+        queryset = super().get_queryset(request)
+        self.queryset_contagem = self._queryset_leve(request)
+        self.ordenacao_keyset = self._ordenacao_keyset(request, queryset)
+        return queryset
+
+    def _queryset_leve(self, request):
+        raiz = self.root_queryset
+        self.root_queryset = self.model_admin.get_queryset_contagem(request)
+        self._contando = True
+        try:
+            return super().get_queryset(request)
+        except (FieldError, IncorrectLookupParameters):
+            return None
+        finally:
+            self.root_queryset = raiz
+            self._contando = False
+
+    def _ordenacao_keyset(self, request, queryset):
+        """[(campo, decrescente), ...] da ordenação padrão terminada na PK, ou None se não der para usar keyset."""
+        if (
+            not self.model_admin.paginacao_keyset
+            or ORDER_VAR in self.params
+            or self.queryset_contagem is None
+            or (self.page_num != 1 and not self.cursor_keyset)
+        ):
+            return None
+        campos = []
+        for item in self.get_ordering(request, queryset):
+            if not isinstance(item, str):
+                return None
+            nome = item.lstrip('-')
+            try:
+                campo = self.opts.pk if nome == 'pk' else self.opts.get_field(nome)
+            except FieldDoesNotExist:
+                return None
+            if not campo.concrete or campo.is_relation:
+                return None
+            campos.append((campo, item.startswith('-')))
+            if campo.primary_key:
+                return campos
+        return None
+
+    def _codificar(self, valores):
+        return json.dumps(list(valores), cls=DjangoJSONEncoder, separators=(',', ':'))
+
+    def _decodificar(self, cursor):
+        try:
+            valores = json.loads(cursor)
+            if not isinstance(valores, list) or len(valores) != len(self.ordenacao_keyset):
+                raise ValueError(cursor)
+            return [campo.to_python(valor) for (campo, _), valor in zip(self.ordenacao_keyset, valores)]
+        except (ValueError, ValidationError):
+            raise IncorrectLookupParameters
+
+    def anteriores(self, obj):
+        """Linhas filtradas (queryset leve) que vêm antes de `obj` na ordenação do keyset."""
+        valores = [getattr(obj, campo.attname) for campo, _ in self.ordenacao_keyset]
+        return self.queryset_contagem.filter(posteriores(_invertida(self.ordenacao_keyset), valores))
+
+    def _pagina_keyset(self, request):
+        campos = self.ordenacao_keyset
+        por_pagina = self.list_per_page
+        nomes = [campo.name for campo, _ in campos]
+        base = self.queryset_contagem
+        if CURSOR_APOS in self.cursor_keyset:
+            valores = self._decodificar(self.cursor_keyset[CURSOR_APOS])
+            linhas = list(base.filter(posteriores(campos, valores)).order_by(*_ordem(campos)).values_list(*nomes)[:por_pagina + 1])
+            tem_anterior, tem_proxima = True, len(linhas) > por_pagina
+            linhas = linhas[:por_pagina]
+        elif CURSOR_ANTES in self.cursor_keyset:
+            valores = self._decodificar(self.cursor_keyset[CURSOR_ANTES])
+            invertida = _invertida(campos)
+            linhas = list(base.filter(posteriores(invertida, valores)).order_by(*_ordem(invertida)).values_list(*nomes)[:por_pagina + 1])
+            tem_anterior, tem_proxima = len(linhas) > por_pagina, True
+            linhas = linhas[:por_pagina][::-1]
+        elif ULTIMA_PAGINA in self.cursor_keyset:
+            linhas = list(base.order_by(*_ordem(_invertida(campos))).values_list(*nomes)[:por_pagina])[::-1]
+            tem_anterior, tem_proxima = True, False
+        else:
+            linhas = list(base.order_by(*_ordem(campos)).values_list(*nomes)[:por_pagina + 1])
+            tem_anterior, tem_proxima = False, len(linhas) > por_pagina
+            linhas = linhas[:por_pagina]
+
+        self.paginacao_keyset = {
+            'primeira': self.get_query_string() if tem_anterior else None,
+            'anterior': self.get_query_string({CURSOR_ANTES: self._codificar(linhas[0])}) if tem_anterior and linhas else None,
+            'proxima': self.get_query_string({CURSOR_APOS: self._codificar(linhas[-1])}) if tem_proxima and linhas else None,
+            'ultima': self.get_query_string({ULTIMA_PAGINA: 1}) if tem_proxima else None,
+        }
+        # A página completa (com as anotações do admin) é lida pelas PKs.
+        pagina = self.queryset.filter(pk__in=[linha[-1] for linha in linhas])
+        return self.model_admin.ajustar_pagina_keyset(request, self, pagina)
+
+    def _pagina_estimada(self):
+        """
+        Página numerada quando a contagem é a estimativa, que pode passar ou
+        ficar aquém do total real: a página e a seguinte são conferidas no
+        banco e os links vão até a última página que sabemos existir.
+        """
+        base = (self.queryset_contagem if self.queryset_contagem is not None else self.queryset).order_by()
+        inicio = (self.page_num - 1) * self.list_per_page
+        if self.page_num < 1 or (self.page_num > 1 and not base[inicio:].exists()):
+            raise IncorrectLookupParameters
+        ultima = self.page_num + 1 if base[inicio + self.list_per_page:].exists() else self.page_num
+        self.paginas_estimadas = list(Paginator(range(ultima), 1).get_elided_page_range(self.page_num))
+        return self.queryset[inicio:inicio + self.list_per_page]
+
+    def _chave_filtros(self):
+        return tuple(sorted(
+            (nome, str(valor)) for nome, valor in self.params.items() if nome != ORDER_VAR
+        ))
+
+    def _contar(self, chave, queryset, estimavel):
+        limite = getattr(settings, 'PAGINACAO', {}).get('ESTIMAR_CONTAGEM_ACIMA')
+
+        def carregar():
+            if estimavel and limite:
+                estimativa = estimar_linhas(self.model)
+                if estimativa is not None and estimativa > limite:
+                    return estimativa, True
+            return queryset.count(), False
+
+        cache = registrar_contagem(self.model, self.model_admin.contagem_dependencias)
+        return cache.obter((chave, timezone.localdate()), carregar)
+
+    def get_results(self, request):
+        # Mesmo fluxo de ChangeList.get_results, com as contagens acima.
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        sem_filtros = not self.has_active_filters and not self.query
+        queryset = self.queryset_contagem if self.queryset_contagem is not None else self.queryset
+        result_count, self.contagem_estimada = self._contar(
+            ('filtrada', self._chave_filtros()), queryset, estimavel=sem_filtros,
+        )
+        paginator.count = result_count
+
+        if self.model_admin.show_full_result_count:
+            full_result_count, _ = self._contar(
+                ('total',), self.model_admin.get_queryset_contagem(request), estimavel=True,
+            )
+        else:
+            full_result_count = None
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+
+        if (self.show_all and can_show_all) or not multi_page:
+            result_list = self.queryset._clone()
+        elif self.ordenacao_keyset is not None:
+            result_list = self._pagina_keyset(request)
+        elif self.contagem_estimada:
+            result_list = self._pagina_estimada()
+        else:
+            try:
+                result_list = paginator.page(self.page_num).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+
+        self.result_count = result_count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+        self.paginator = paginator
+
+
+class ContagemLeveAdminMixin:
+    """
+    Usa ChangeListContagem no changelist. `contagem_dependencias` lista os
+    modelos cujas gravações mudam o resultado dos filtros (por exemplo,
+    Pagamento para o status das contas a pagar). `paginacao_keyset = True`
+    troca o OFFSET pela paginação por chave na ordenação padrão do admin.
+    """
+    contagem_dependencias = ()
+    paginacao_keyset = False
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        registrar_contagem(model, self.contagem_dependencias)
+
+    def get_queryset_contagem(self, request):
+        """Queryset sem anotações usado nas contagens."""
+        return self.model._default_manager.get_queryset()
+
+    def ajustar_pagina_keyset(self, request, changelist, pagina):
+        """
+        Completa a página lida por keyset. Anotações que dependem das linhas
+        anteriores (janelas) só enxergam a página; `changelist.anteriores`
+        devolve o que ficou antes dela.
+        """
+        return pagina
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListContagem
@@ -0,0 +1,126 @@
+# core/precos.py
+#
+# Preço de convênio por (cliente, grupo de mercadoria).
+#
+# PrecoConvenio é a versão "achatada" de Cliente -> ClienteConvenioGrupoMercadoria
+# -> ConvenioGrupoMercadoria -> Convenio. Quando um cliente tem mais de um
+# convênio para o mesmo grupo, vale o vínculo mais antigo (menor ID), como a
+# consulta original fazia na prática. Os sinais recalculam as chaves afetadas
+# e sobem a versão "precos", que invalida o LRU em memória de cada processo.
+
+from django.db import transaction
+
+from .models import ClienteConvenioGrupoMercadoria, PrecoConvenio, Produto
+from .versoes import CacheVersionado, incrementar_versao, versao_atual
+
+VERSAO_PRECOS = 'precos'
+
+_cache_precos = CacheVersionado(VERSAO_PRECOS)
+
+
+def preco_convenio(cliente_id, produto_id):
+    """Preço de convênio do cliente para o grupo do produto, ou None."""
+    chave = (int(cliente_id), int(produto_id))
+    return _cache_precos.obter(chave, lambda: _carregar_preco(*chave))
+
+
+def _carregar_preco(cliente_id, produto_id):
+    return (
+        PrecoConvenio.objects.filter(cliente_id=cliente_id, grupo_mercadoria__produto__produto_id=produto_id)
+        .values_list('preco_convenio_valor', flat=True)
+        .first()
+    )
+
+
+def precos_em_lote(pares):
+    """
+    Resolve vários pares (cliente_id, produto_id) de uma vez. Com cliente vale
+    o preço de convênio; sem cliente (None), o preço de venda do produto.
+    Devolve {(cliente_id, produto_id): preço ou None}, com no máximo uma
+    consulta para cada tipo de preço ausente do cache.
+    """
+    chaves = {}
+    for cliente_id, produto_id in pares:
+        if cliente_id:
+            chaves[(cliente_id, produto_id)] = (int(cliente_id), int(produto_id))
+        else:
+            chaves[(cliente_id, produto_id)] = ('produto', int(produto_id))
+    valores = _cache_precos.obter_varios(set(chaves.values()), _carregar_precos)
+    return {par: valores[chave] for par, chave in chaves.items()}
+
+
+def _carregar_precos(chaves):
+    encontrados = {}
+    produtos = {chave[1] for chave in chaves if chave[0] == 'produto'}
+    if produtos:
+        for produto_id, preco in Produto.objects.filter(pk__in=produtos).values_list('produto_id', 'produto_preco'):
+            encontrados[('produto', produto_id)] = float(preco) if preco is not None else None
+    convenios = [chave for chave in chaves if chave[0] != 'produto']
+    if convenios:
+        for cliente_id, produto_id, preco in PrecoConvenio.objects.filter(
+            cliente_id__in={c for c, _ in convenios},
+            grupo_mercadoria__produto__produto_id__in={p for _, p in convenios},
+        ).values_list('cliente_id', 'grupo_mercadoria__produto__produto_id', 'preco_convenio_valor'):
+            encontrados[(cliente_id, produto_id)] = preco
+    return encontrados
+
+
+def versao_precos():
+    return versao_atual(VERSAO_PRECOS)
+
+
+def chaves_preco_convenio(vinculos):
+    """Chaves (cliente, grupo) dos vínculos (queryset de ClienteConvenioGrupoMercadoria)."""
+    return set(
+        vinculos.order_by().values_list('cliente_id', 'convenio_grupo_mercadoria__grupo_mercadoria_id').distinct()
+    )
+
+
+def recalcular_precos_convenio(chaves):
+    for cliente_id, grupo_mercadoria_id in chaves:
+        vinculo = (
+            ClienteConvenioGrupoMercadoria.objects.filter(
+                cliente_id=cliente_id,
+                convenio_grupo_mercadoria__grupo_mercadoria_id=grupo_mercadoria_id,
+            )
+            .order_by('pk')
+            .values_list('pk', 'convenio_grupo_mercadoria__convenio__convenio_preco')
+            .first()
+        )
+        chave = dict(cliente_id=cliente_id, grupo_mercadoria_id=grupo_mercadoria_id)
+        if vinculo is None:
+            PrecoConvenio.objects.filter(**chave).delete()
+        else:
+            PrecoConvenio.objects.update_or_create(
+                **chave,
+                defaults={'cliente_convenio_id': vinculo[0], 'preco_convenio_valor': vinculo[1]},
+            )
+    if chaves:
+        incrementar_versao(VERSAO_PRECOS)
+
+
+def recalcular_todos_precos_convenio():
+    linhas = {}
+    for pk, cliente_id, grupo_id, preco in (
+        ClienteConvenioGrupoMercadoria.objects.order_by('-pk').values_list(
+            'pk', 'cliente_id', 'convenio_grupo_mercadoria__grupo_mercadoria_id',
+            'convenio_grupo_mercadoria__convenio__convenio_preco',
+        )
+    ):
+        linhas[(cliente_id, grupo_id)] = (pk, preco)
+    with transaction.atomic():
+        PrecoConvenio.objects.all().delete()
+        novos = PrecoConvenio.objects.bulk_create(
+            [
+                PrecoConvenio(
+                    cliente_id=cliente_id,
+                    grupo_mercadoria_id=grupo_id,
+                    cliente_convenio_id=pk,
+                    preco_convenio_valor=preco,
+                )
+                for (cliente_id, grupo_id), (pk, preco) in linhas.items()
+            ],
+            batch_size=500,
+        )
+        incrementar_versao(VERSAO_PRECOS)
+    return len(novos)
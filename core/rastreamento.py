@@ -0,0 +1,198 @@
+# core/rastreamento.py
+#
+# Rastreamento das cascatas de sinais.
+#
+# Um save no admin dispara receptores que salvam outros objetos, que disparam
+# outros receptores (Venda -> ContasReceber/Caixa -> saldo mensal; exclusão de
+# Caixa -> Pagamento -> Caixa ...). Cada receptor decorado com @rastrear_sinal
+# vira um "span" com pai, duração e número de consultas. Os spans de uma
+# requisição (RastreamentoSinaisMiddleware) ou, fora dela, de um receptor
+# raiz e tudo o que ele disparou, formam um rastro gravado em
+# DIAGNOSTICO_ROOT/sinais.jsonl e exibido em /admin/diagnostico/sinais/.
+#
+# A decisão de amostrar é tomada uma vez por rastro; fora da amostra o
+# custo é um getattr por receptor.
+
+import functools
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from .diagnostico import armazem, percentil
+
+ARMAZEM_SINAIS = armazem('sinais')
+
+NOMES_SINAIS = {
+    pre_save: 'pre_save',
+    post_save: 'post_save',
+    pre_delete: 'pre_delete',
+    post_delete: 'post_delete',
+}
+
+_FORA_DE_CASCATA = object()
+_estado = threading.local()
+
+
+class _Rastro:
+    """Spans de uma cascata; o contador de consultas é compartilhado por todos."""
+
+    def __init__(self, origem):
+        self.id = uuid.uuid4().hex[:12]
+        self.origem = origem
+        self.inicio = time.perf_counter()
+        self.spans = []
+        self.pilha = []
+        self.consultas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+    def executar(self, receptor, funcao, sender, args, kwargs):
+        instancia = kwargs.get('instance')
+        span = {
+            'id': len(self.spans),
+            'pai': self.pilha[-1]['id'] if self.pilha else None,
+            'receptor': receptor,
+            'sinal': NOMES_SINAIS.get(kwargs.get('signal'), ''),
+            'modelo': getattr(sender, '__name__', str(sender)),
+            'pk': getattr(instancia, 'pk', None),
+            'inicio_ms': round((time.perf_counter() - self.inicio) * 1000, 2),
+        }
+        self.spans.append(span)
+        self.pilha.append(span)
+        consultas_antes = self.consultas
+        inicio = time.perf_counter()
+        try:
+            return funcao(sender, *args, **kwargs)
+        except Exception as exc:
+            span['erro'] = f'{exc.__class__.__name__}: {exc}'
+            raise
+        finally:
+            span['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            span['consultas'] = self.consultas - consultas_antes
+            self.pilha.pop()
+
+    def registro(self):
+        raizes = [span for span in self.spans if span['pai'] is None]
+        return {
+            'rastro': self.id,
+            'em': timezone.now().isoformat(timespec='seconds'),
+            'origem': self.origem,
+            'modelo': raizes[0]['modelo'],
+            'sinal': raizes[0]['sinal'],
+            'duracao_ms': round(sum(span['duracao_ms'] for span in raizes), 2),
+            'consultas': sum(span['consultas'] for span in raizes),
+            'spans': self.spans,
+        }
+
+
+def _amostragem():
+    return getattr(settings, 'DIAGNOSTICO', {}).get('AMOSTRAGEM_SINAIS', 0.0)
+
+
+@contextmanager
+def rastrear_cascata(origem):
+    """
+    Agrupa num único rastro todos os receptores executados dentro do bloco
+    (por exemplo, todos os saves de uma requisição do admin).
+    """
+    if getattr(_estado, 'rastro', _FORA_DE_CASCATA) is not _FORA_DE_CASCATA:
+        yield
+        return
+    amostragem = _amostragem()
+    if not amostragem or random.random() >= amostragem:
+        _estado.rastro = None
+        try:
+            yield
+        finally:
+            _estado.rastro = _FORA_DE_CASCATA
+        return
+
+    rastro = _estado.rastro = _Rastro(origem)
+    wrappers = [conexao.execute_wrapper(rastro) for conexao in connections.all()]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    try:
+        yield
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+        _estado.rastro = _FORA_DE_CASCATA
+        if rastro.spans:
+            ARMAZEM_SINAIS.registrar(rastro.registro())
+
+
+def rastrear_sinal(funcao):
+    """Decora um receptor de sinal para que apareça nos rastros de cascata."""
+    receptor = f'{funcao.__module__}.{funcao.__name__}'
+
+    @functools.wraps(funcao)
+    def wrapper(sender, *args, **kwargs):
+        rastro = getattr(_estado, 'rastro', _FORA_DE_CASCATA)
+        if rastro is _FORA_DE_CASCATA:
+            with rastrear_cascata(receptor):
+                return wrapper(sender, *args, **kwargs)
+        if rastro is None:
+            return funcao(sender, *args, **kwargs)
+        return rastro.executar(receptor, funcao, sender, args, kwargs)
+
+    return wrapper
+
+
+def _tempo_proprio(spans):
+    """Duração de cada span descontando a dos filhos diretos."""
+    filhos = {}
+    for span in spans:
+        if span.get('pai') is not None:
+            filhos[span['pai']] = filhos.get(span['pai'], 0) + span.get('duracao_ms', 0)
+    return {span['id']: round(span.get('duracao_ms', 0) - filhos.get(span['id'], 0), 2) for span in spans}
+
+
+def resumir_sinais(registros):
+    """Estatísticas por receptor, a partir dos rastros gravados."""
+    por_receptor = {}
+    for registro in registros:
+        spans = registro.get('spans', [])
+        proprio = _tempo_proprio(spans)
+        for span in spans:
+            dados = por_receptor.setdefault(span['receptor'], {'duracoes': [], 'proprio': 0.0, 'consultas': []})
+            dados['duracoes'].append(span.get('duracao_ms', 0))
+            dados['proprio'] += proprio[span['id']]
+            dados['consultas'].append(span.get('consultas', 0))
+
+    linhas = []
+    for receptor, dados in por_receptor.items():
+        duracoes = sorted(dados['duracoes'])
+        consultas = sorted(dados['consultas'])
+        linhas.append({
+            'receptor': receptor,
+            'chamadas': len(duracoes),
+            'total_ms': sum(duracoes),
+            'proprio_ms': dados['proprio'],
+            'duracao_p50': percentil(duracoes, 50),
+            'duracao_p95': percentil(duracoes, 95),
+            'consultas_p95': percentil(consultas, 95),
+        })
+    linhas.sort(key=lambda linha: linha['proprio_ms'], reverse=True)
+    return linhas
+
+
+def arvore_rastro(registro):
+    """Spans do rastro em ordem de execução, com a profundidade e o tempo próprio."""
+    spans = registro.get('spans', [])
+    proprio = _tempo_proprio(spans)
+    profundidade = {}
+    linhas = []
+    for span in spans:
+        nivel = 0 if span.get('pai') is None else profundidade.get(span['pai'], 0) + 1
+        profundidade[span['id']] = nivel
+        linhas.append({**span, 'nivel': nivel, 'recuo': nivel * 20, 'proprio_ms': proprio[span['id']]})
+    return linhas
@@ -0,0 +1,76 @@
+# core/referencias.py
+#
+# Cadastros de referência (empresas, plano de contas, CFOPs, grupos de
+# mercadoria e convênios) em memória em cada processo. São tabelas pequenas
+# lidas a todo momento pelos sinais e pelo admin (empresa padrão, conta
+# padrão, CFOP de um item): aqui cada uma é lida inteira uma vez e fica num
+# CacheVersionado com versão própria, que sobe quando o modelo é gravado ou
+# excluído (versoes.depender_de).
+#
+# O CadastrosReferenciaMiddleware marca o início de cada requisição; o
+# primeiro acesso ao registro na requisição confere as versões das cinco
+# tabelas numa só consulta. Fora de requisições (comandos, fila de
+# relatórios) vale o intervalo do CacheVersionado.
+#
+# Os objetos são compartilhados entre requisições: use-os só para leitura
+# (atribuir a uma FK, ler campos). Para alterar um registro, busque-o no banco.
+
+import threading
+
+from .models import Cfop, Convenio, Empresa, GrupoMercadoria, PlanoConta
+from .versoes import CacheVersionado, depender_de, incrementar_versao, verificar_versoes
+
+MODELOS = (Empresa, PlanoConta, Cfop, GrupoMercadoria, Convenio)
+
+_caches = {}
+for _modelo in MODELOS:
+    _caches[_modelo] = CacheVersionado(f'referencias:{_modelo._meta.label_lower}', tamanho=1)
+    depender_de(_caches[_modelo].nome, (_modelo,))
+
+_requisicao = threading.local()
+
+
+def nova_requisicao():
+    """Faz o próximo acesso desta thread conferir as versões (chamado pelo middleware)."""
+    _requisicao.verificar = True
+
+
+def _carregar(model):
+    queryset = model._default_manager.all()
+    if not queryset.ordered:
+        queryset = queryset.order_by('pk')
+    objetos = tuple(queryset)
+    return objetos, {obj.pk: obj for obj in objetos}
+
+
+def _tabela(model):
+    if getattr(_requisicao, 'verificar', False):
+        _requisicao.verificar = False
+        verificar_versoes(list(_caches.values()))
+    return _caches[model].obter('tabela', lambda: _carregar(model))
+
+
+def todos(model):
+    """Registros de `model` na ordem de model.objects.all() (ou por pk, se o modelo não tiver ordering)."""
+    return _tabela(model)[0]
+
+
+def obter(model, pk):
+    """Registro de `model` com chave `pk`, ou None."""
+    return _tabela(model)[1].get(pk)
+
+
+def primeiro(model):
+    """Equivalente a model.objects.first()."""
+    objetos = todos(model)
+    return objetos[0] if objetos else None
+
+
+def filtrar(model, **valores):
+    """Registros de `model` com os campos iguais a `valores` (ex.: cfop_gera_caixa=True)."""
+    return [obj for obj in todos(model) if all(getattr(obj, campo) == valor for campo, valor in valores.items())]
+
+
+def invalidar(model):
+    """Descarta a tabela em todos os processos; para gravações sem sinais (bulk_update, update())."""
+    incrementar_versao(_caches[model].nome)
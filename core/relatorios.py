@@ -0,0 +1,273 @@
+# core/relatorios.py
+#
+# Execução de relatórios do admin em segundo plano.
+#
+# As ações de relatório (gerar_pdf_detalhado, gerar_relatorio_word, ...) continuam
+# escritas como ações comuns do admin: recebem (request, queryset) e devolvem um
+# HttpResponse com o arquivo. O RelatorioAssincronoMixin cria, para cada ação
+# listada em `acoes_assincronas`, uma variante "(em segundo plano)" que apenas
+# grava um Relatorio na fila. O comando `processar_relatorios` reexecuta a ação
+# original fora da requisição HTTP e guarda o arquivo para download.
+
+import json
+import re
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.messages.storage.base import Message
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .metricas import RELATORIO_SEGUNDOS
+from .models import Relatorio
+
+_NOME_ARQUIVO_PATTERN = re.compile(r'filename="?([^";]+)"?')
+
+
+class _ColetorMensagens:
+    """Substitui o storage de mensagens: guarda o que a ação enviaria ao usuário."""
+
+    def __init__(self):
+        self.mensagens = []
+
+    def add(self, level, message, extra_tags=''):
+        self.mensagens.append(Message(level, message, extra_tags=extra_tags))
+
+    def __iter__(self):
+        return iter(self.mensagens)
+
+    def __len__(self):
+        return len(self.mensagens)
+
+
+class RelatorioCancelado(Exception):
+    pass
+
+
+def _descricao_acao(model_admin, acao):
+    funcao = getattr(model_admin, acao)
+    descricao = getattr(funcao, 'short_description', None) or acao.replace('_', ' ')
+    return str(descricao)
+
+
+def enfileirar_relatorio(usuario, model_admin, acao, queryset):
+    """Grava um Relatorio pendente com as chaves selecionadas no changelist."""
+    opts = model_admin.model._meta
+    ids = [str(pk) for pk in queryset.order_by().values_list('pk', flat=True)]
+    return Relatorio.objects.create(
+        usuario=usuario,
+        relatorio_descricao=_descricao_acao(model_admin, acao)[:255],
+        relatorio_modelo=f'{opts.app_label}.{opts.model_name}',
+        relatorio_acao=acao,
+        relatorio_ids=json.dumps(ids),
+    )
+
+
+def _obter_model_admin(relatorio):
+    from django.apps import apps
+
+    model = apps.get_model(relatorio.relatorio_modelo)
+    model_admin = admin.site._registry.get(model)
+    if model_admin is None:
+        raise LookupError(f'Modelo {relatorio.relatorio_modelo} não está registrado no admin.')
+    if relatorio.relatorio_acao not in getattr(model_admin, 'acoes_assincronas', ()):
+        raise LookupError(f'Ação {relatorio.relatorio_acao} não pode ser executada em segundo plano.')
+    return model_admin
+
+
+def _montar_requisicao(relatorio):
+    request = RequestFactory().get('/')
+    request.user = relatorio.usuario
+    request._messages = _ColetorMensagens()
+    return request
+
+
+def _atualizar(relatorio, **campos):
+    """
+    Atualiza só os campos informados, sem sobrescrever um cancelamento
+    concorrente: a gravação só acontece se o relatório ainda estiver
+    EXECUTANDO pela reserva deste worker (mesmo relatorio_iniciado_em).
+    Devolve False se o relatório foi cancelado ou dado como abandonado.
+    """
+    atualizados = Relatorio.objects.filter(
+        pk=relatorio.pk,
+        status=Relatorio.StatusChoices.EXECUTANDO,
+        relatorio_iniciado_em=relatorio.relatorio_iniciado_em,
+    ).update(**campos)
+    for nome, valor in campos.items():
+        setattr(relatorio, nome, valor)
+    return bool(atualizados)
+
+
+def _verificar_cancelamento(relatorio):
+    status = Relatorio.objects.filter(pk=relatorio.pk).values_list('status', flat=True).first()
+    if status == Relatorio.StatusChoices.CANCELADO:
+        raise RelatorioCancelado()
+
+
+def recuperar_abandonados(tempo_maximo=None):
+    """
+    Marca como ERRO os relatórios EXECUTANDO há mais de `tempo_maximo`
+    segundos (padrão: settings.RELATORIOS_TEMPO_MAXIMO): o worker que os
+    reservou morreu no meio. Não voltam à fila para não derrubar outro worker
+    com o mesmo relatório; o usuário pode pedi-lo de novo.
+    """
+    if tempo_maximo is None:
+        tempo_maximo = settings.RELATORIOS_TEMPO_MAXIMO
+    limite = timezone.now() - timedelta(seconds=tempo_maximo)
+    return Relatorio.objects.filter(
+        status=Relatorio.StatusChoices.EXECUTANDO, relatorio_iniciado_em__lt=limite,
+    ).update(
+        status=Relatorio.StatusChoices.ERRO,
+        relatorio_mensagem='O processamento foi interrompido (o worker parou durante a execução).',
+        relatorio_concluido_em=timezone.now(),
+    )
+
+
+def _reservar_proximo():
+    """Marca o próximo relatório pendente como EXECUTANDO (um worker por relatório)."""
+    pendentes = (
+        Relatorio.objects.filter(status=Relatorio.StatusChoices.PENDENTE)
+        .order_by('relatorio_criado_em', 'relatorio_id')
+        .values_list('pk', flat=True)
+    )
+    for pk in pendentes[:10]:
+        reservado = Relatorio.objects.filter(pk=pk, status=Relatorio.StatusChoices.PENDENTE).update(
+            status=Relatorio.StatusChoices.EXECUTANDO,
+            relatorio_progresso=5,
+            relatorio_iniciado_em=timezone.now(),
+        )
+        if reservado:
+            return Relatorio.objects.select_related('usuario').get(pk=pk)
+    return None
+
+
+def executar_relatorio(relatorio):
+    """Executa a ação original do admin e guarda o arquivo devolvido por ela."""
+    request = _montar_requisicao(relatorio)
+    try:
+        model_admin = _obter_model_admin(relatorio)
+        ids = json.loads(relatorio.relatorio_ids or '[]')
+        queryset = model_admin.get_queryset(request).filter(pk__in=ids)
+        _atualizar(relatorio, relatorio_progresso=10)
+
+        _verificar_cancelamento(relatorio)
+        inicio = time.perf_counter()
+        response = getattr(model_admin, relatorio.relatorio_acao)(request, queryset)
+        RELATORIO_SEGUNDOS.observar(
+            time.perf_counter() - inicio, acao=relatorio.relatorio_acao, modo='segundo_plano'
+        )
+        _verificar_cancelamento(relatorio)
+
+        if not isinstance(response, HttpResponse) or response.streaming:
+            raise ValueError('A ação não devolveu um arquivo para download.')
+        _atualizar(relatorio, relatorio_progresso=90)
+
+        disposicao = response.get('Content-Disposition', '')
+        encontrado = _NOME_ARQUIVO_PATTERN.search(disposicao)
+        nome_arquivo = encontrado.group(1) if encontrado else f'relatorio_{relatorio.pk}'
+
+        relatorio.relatorio_arquivo.save(nome_arquivo, ContentFile(response.content), save=False)
+        mensagens = '\n'.join(str(m) for m in request._messages)
+        concluido = _atualizar(
+            relatorio,
+            relatorio_arquivo=relatorio.relatorio_arquivo.name,
+            relatorio_nome_arquivo=nome_arquivo,
+            relatorio_content_type=response.get('Content-Type', 'application/octet-stream'),
+            relatorio_mensagem=mensagens,
+            relatorio_progresso=100,
+            status=Relatorio.StatusChoices.CONCLUIDO,
+            relatorio_concluido_em=timezone.now(),
+        )
+        if not concluido:
+            raise RelatorioCancelado()
+    except RelatorioCancelado:
+        if relatorio.relatorio_arquivo:
+            relatorio.relatorio_arquivo.delete(save=False)
+        Relatorio.objects.filter(pk=relatorio.pk, status=Relatorio.StatusChoices.CANCELADO).update(
+            relatorio_concluido_em=timezone.now(),
+        )
+    except Exception as exc:
+        _atualizar(
+            relatorio,
+            status=Relatorio.StatusChoices.ERRO,
+            relatorio_mensagem=f'{exc.__class__.__name__}: {exc}',
+            relatorio_concluido_em=timezone.now(),
+        )
+    except BaseException:
+        # Worker interrompido (Ctrl+C, SystemExit): o relatório volta para a fila.
+        _atualizar(relatorio, status=Relatorio.StatusChoices.PENDENTE, relatorio_progresso=0, relatorio_iniciado_em=None)
+        raise
+    return relatorio
+
+
+def processar_fila(limite=None):
+    """Processa relatórios pendentes até esvaziar a fila (ou atingir o limite)."""
+    recuperar_abandonados()
+    processados = 0
+    while limite is None or processados < limite:
+        relatorio = _reservar_proximo()
+        if relatorio is None:
+            break
+        executar_relatorio(relatorio)
+        processados += 1
+    return processados
+
+
+def _criar_acao_assincrona(acao):
+    def acao_assincrona(modeladmin, request, queryset):
+        relatorio = enfileirar_relatorio(request.user, modeladmin, acao, queryset)
+        url = reverse('admin:core_relatorio_changelist')
+        modeladmin.message_user(
+            request,
+            format_html(
+                'Relatório "{}" enviado para a fila. Acompanhe o andamento em <a href="{}">Meus relatórios</a>.',
+                relatorio.relatorio_descricao,
+                url,
+            ),
+            messages.SUCCESS,
+        )
+        return None
+
+    acao_assincrona.__name__ = f'{acao}_segundo_plano'
+    return acao_assincrona
+
+
+def _medir_acao_sincrona(funcao, acao):
+    @wraps(funcao)
+    def acao_medida(modeladmin, request, queryset):
+        inicio = time.perf_counter()
+        try:
+            return funcao(modeladmin, request, queryset)
+        finally:
+            RELATORIO_SEGUNDOS.observar(time.perf_counter() - inicio, acao=acao, modo='sincrono')
+
+    return acao_medida
+
+
+class RelatorioAssincronoMixin:
+    """
+    Adiciona ao ModelAdmin uma versão "(em segundo plano)" de cada ação
+    listada em `acoes_assincronas`. A ação original continua disponível
+    (e tem a duração registrada em compufour_relatorio_segundos).
+    """
+    acoes_assincronas = ()
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for acao in self.acoes_assincronas:
+            if acao not in actions:
+                continue
+            funcao, nome_acao, descricao_acao = actions[acao]
+            actions[acao] = (_medir_acao_sincrona(funcao, acao), nome_acao, descricao_acao)
+            nome = f'{acao}_segundo_plano'
+            descricao = f'{_descricao_acao(self, acao)} (em segundo plano)'
+            actions[nome] = (_criar_acao_assincrona(acao), nome, descricao)
+        return actions
@@ -0,0 +1,617 @@
+# core/resumos.py
+#
+# Tabelas de resumo (rollups) mantidas a partir dos lançamentos.
+#
+# Cada resumo é identificado por uma chave (ex.: conta, empresa, mês). Os sinais
+# recalculam somente as chaves afetadas por um save/delete; o comando
+# `manage.py recalcular_resumos` reconstrói tudo (útil após cargas com
+# queryset.update() ou bulk_create, que não disparam sinais).
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, Func, OuterRef, Q, Subquery, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce, Concat, TruncMonth
+
+from . import referencias
+from .precos import chaves_preco_convenio, recalcular_precos_convenio, recalcular_todos_precos_convenio
+from .models import (
+    Caixa, Cfop, CompraItem, CompraResumoMensal, Empresa, PlanoConta, PlanoContaSaldoMensal,
+    Romaneio, RomaneioDesempenhoMensal, VendaItem, VendaResumoMensal, normalizar_caminho_conta,
+)
+
+ZERO = Decimal('0.00')
+
+# Seções do DRE: (título, início do intervalo de caminho, fim exclusivo, sinal).
+# Segue a convenção do plano: 1=Receita, 3=Despesa.
+SECOES_DRE = (
+    ('Receitas', '1', '2', 1),
+    ('Despesas', '3', '4', -1),
+)
+
+
+def primeiro_dia_mes(data):
+    return data.replace(day=1)
+
+
+def proximo_mes(data):
+    return (data.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+# ============================================================================
+# SALDO MENSAL DO PLANO DE CONTAS (alimentado pelo Caixa)
+# ============================================================================
+
+def chave_saldo_caixa(plano_conta_id, empresa_id, data_emissao):
+    if not (plano_conta_id and empresa_id and data_emissao):
+        return None
+    return (plano_conta_id, empresa_id, primeiro_dia_mes(data_emissao))
+
+
+def recalcular_saldo_mensal(plano_conta_id, empresa_id, competencia):
+    """Recalcula uma linha de PlanoContaSaldoMensal a partir do Caixa do mês."""
+    totais = Caixa.objects.filter(
+        plano_conta_id=plano_conta_id,
+        empresa_id=empresa_id,
+        caixa_data_emissao__gte=competencia,
+        caixa_data_emissao__lt=proximo_mes(competencia),
+    ).aggregate(
+        entradas=Coalesce(Sum('caixa_valor_entrada'), Value(ZERO)),
+        saidas=Coalesce(Sum('caixa_valor_saida'), Value(ZERO)),
+        lancamentos=Count('pk'),
+    )
+    chave = dict(plano_conta_id=plano_conta_id, empresa_id=empresa_id, competencia=competencia)
+    if not totais['lancamentos']:
+        PlanoContaSaldoMensal.objects.filter(**chave).delete()
+        return
+    PlanoContaSaldoMensal.objects.update_or_create(
+        **chave,
+        defaults={
+            'saldo_valor_entrada': totais['entradas'],
+            'saldo_valor_saida': totais['saidas'],
+            'saldo_lancamentos': totais['lancamentos'],
+        },
+    )
+
+
+def recalcular_saldos_plano_conta():
+    """Reconstrói todos os saldos mensais com uma única agregação sobre o Caixa."""
+    linhas = (
+        Caixa.objects.exclude(caixa_data_emissao=None)
+        .annotate(competencia=TruncMonth('caixa_data_emissao'))
+        .order_by()
+        .values('plano_conta_id', 'empresa_id', 'competencia')
+        .annotate(
+            entradas=Coalesce(Sum('caixa_valor_entrada'), Value(ZERO)),
+            saidas=Coalesce(Sum('caixa_valor_saida'), Value(ZERO)),
+            lancamentos=Count('pk'),
+        )
+    )
+    with transaction.atomic():
+        PlanoContaSaldoMensal.objects.all().delete()
+        novos = PlanoContaSaldoMensal.objects.bulk_create(
+            (
+                PlanoContaSaldoMensal(
+                    plano_conta_id=linha['plano_conta_id'],
+                    empresa_id=linha['empresa_id'],
+                    competencia=linha['competencia'],
+                    saldo_valor_entrada=linha['entradas'],
+                    saldo_valor_saida=linha['saidas'],
+                    saldo_lancamentos=linha['lancamentos'],
+                )
+                for linha in linhas.iterator()
+            ),
+            batch_size=500,
+        )
+    return len(novos)
+
+
+def recalcular_arvore_plano_conta():
+    """Recalcula caminho, nível e conta superior de todo o plano (após importações)."""
+    contas = list(PlanoConta.objects.only('plano_conta_id', 'plano_conta_numero'))
+    por_caminho = {}
+    for conta in sorted(contas, key=lambda c: -c.plano_conta_id):
+        conta.plano_conta_caminho = normalizar_caminho_conta(conta.plano_conta_numero)
+        conta.plano_conta_nivel = len(conta.plano_conta_caminho.split('.')) if conta.plano_conta_caminho else 0
+        por_caminho[conta.plano_conta_caminho] = conta.plano_conta_id
+    for conta in contas:
+        grupos = conta.plano_conta_caminho.split('.') if conta.plano_conta_caminho else []
+        conta.plano_conta_pai_id = None
+        for i in range(len(grupos) - 1, 0, -1):
+            conta.plano_conta_pai_id = por_caminho.get('.'.join(grupos[:i]))
+            if conta.plano_conta_pai_id is not None:
+                break
+    PlanoConta.objects.bulk_update(
+        contas, ['plano_conta_caminho', 'plano_conta_nivel', 'plano_conta_pai'], batch_size=500
+    )
+    referencias.invalidar(PlanoConta)
+    return len(contas)
+
+
+def recalcular_resumo_plano_conta():
+    recalcular_arvore_plano_conta()
+    return recalcular_saldos_plano_conta()
+
+
+# ============================================================================
+# RESUMOS MENSAIS DE VENDAS E COMPRAS
+# As chaves são obtidas dos próprios itens (antes e depois da alteração) e
+# cada chave afetada é recalculada por completo.
+# ============================================================================
+
+_CAMPOS_CHAVE_VENDA = (
+    'competencia', 'produto_id', 'produto__grupo_mercadoria_id', 'cliente_id',
+    'plano_conta_id', 'venda__romaneio__compra__empresa_id',
+)
+_CAMPOS_CHAVE_COMPRA = ('competencia', 'produto_id', 'compra__fornecedor_id')
+
+
+def _agregados_itens(prefixo):
+    return {
+        'qtd': Coalesce(Sum(f'{prefixo}_qtd'), Value(ZERO)),
+        'volume': Coalesce(Sum(f'{prefixo}_volume'), Value(0)),
+        'valor': Coalesce(
+            Sum(ExpressionWrapper(F(f'{prefixo}_qtd') * F(f'{prefixo}_preco'), output_field=DecimalField())),
+            Value(ZERO),
+        ),
+        'itens': Count('pk'),
+    }
+
+
+def _itens_venda_por_competencia(itens):
+    return itens.exclude(venda__venda_data_emissao=None).annotate(
+        competencia=TruncMonth('venda__venda_data_emissao')
+    )
+
+
+def _itens_compra_por_competencia(itens):
+    return itens.annotate(competencia=TruncMonth('compra__compra_data_entrada'))
+
+
+def chaves_resumo_venda(itens):
+    """Chaves de VendaResumoMensal às quais os itens (queryset de VendaItem) pertencem."""
+    return set(_itens_venda_por_competencia(itens).order_by().values_list(*_CAMPOS_CHAVE_VENDA).distinct())
+
+
+def chaves_resumo_compra(itens):
+    """Chaves de CompraResumoMensal às quais os itens (queryset de CompraItem) pertencem."""
+    return set(_itens_compra_por_competencia(itens).order_by().values_list(*_CAMPOS_CHAVE_COMPRA).distinct())
+
+
+def recalcular_resumo_venda(chaves):
+    for competencia, produto_id, grupo_id, cliente_id, plano_conta_id, empresa_id in chaves:
+        totais = VendaItem.objects.filter(
+            venda__venda_data_emissao__gte=competencia,
+            venda__venda_data_emissao__lt=proximo_mes(competencia),
+            produto_id=produto_id,
+            produto__grupo_mercadoria_id=grupo_id,
+            cliente_id=cliente_id,
+            plano_conta_id=plano_conta_id,
+            venda__romaneio__compra__empresa_id=empresa_id,
+        ).aggregate(**_agregados_itens('venda_item'))
+        chave = dict(
+            competencia=competencia, produto_id=produto_id, cliente_id=cliente_id,
+            plano_conta_id=plano_conta_id, empresa_id=empresa_id,
+        )
+        if not totais['itens']:
+            VendaResumoMensal.objects.filter(grupo_mercadoria_id=grupo_id, **chave).delete()
+            continue
+        VendaResumoMensal.objects.update_or_create(
+            **chave,
+            defaults={
+                'grupo_mercadoria_id': grupo_id,
+                'venda_resumo_qtd': totais['qtd'],
+                'venda_resumo_volume': totais['volume'],
+                'venda_resumo_valor': totais['valor'],
+                'venda_resumo_itens': totais['itens'],
+            },
+        )
+
+
+def recalcular_resumo_compra(chaves):
+    for competencia, produto_id, fornecedor_id in chaves:
+        totais = CompraItem.objects.filter(
+            compra__compra_data_entrada__gte=competencia,
+            compra__compra_data_entrada__lt=proximo_mes(competencia),
+            produto_id=produto_id,
+            compra__fornecedor_id=fornecedor_id,
+        ).aggregate(**_agregados_itens('compra_item'))
+        chave = dict(competencia=competencia, produto_id=produto_id, fornecedor_id=fornecedor_id)
+        if not totais['itens']:
+            CompraResumoMensal.objects.filter(**chave).delete()
+            continue
+        CompraResumoMensal.objects.update_or_create(
+            **chave,
+            defaults={
+                'compra_resumo_qtd': totais['qtd'],
+                'compra_resumo_volume': totais['volume'],
+                'compra_resumo_valor': totais['valor'],
+                'compra_resumo_itens': totais['itens'],
+            },
+        )
+
+
+def recalcular_resumos_vendas():
+    linhas = (
+        _itens_venda_por_competencia(VendaItem.objects.all())
+        .order_by()
+        .values(*_CAMPOS_CHAVE_VENDA)
+        .annotate(**_agregados_itens('venda_item'))
+    )
+    with transaction.atomic():
+        VendaResumoMensal.objects.all().delete()
+        novos = VendaResumoMensal.objects.bulk_create(
+            (
+                VendaResumoMensal(
+                    competencia=linha['competencia'],
+                    produto_id=linha['produto_id'],
+                    grupo_mercadoria_id=linha['produto__grupo_mercadoria_id'],
+                    cliente_id=linha['cliente_id'],
+                    plano_conta_id=linha['plano_conta_id'],
+                    empresa_id=linha['venda__romaneio__compra__empresa_id'],
+                    venda_resumo_qtd=linha['qtd'],
+                    venda_resumo_volume=linha['volume'],
+                    venda_resumo_valor=linha['valor'],
+                    venda_resumo_itens=linha['itens'],
+                )
+                for linha in linhas.iterator()
+            ),
+            batch_size=500,
+        )
+    return len(novos)
+
+
+def recalcular_resumos_compras():
+    linhas = (
+        _itens_compra_por_competencia(CompraItem.objects.all())
+        .order_by()
+        .values(*_CAMPOS_CHAVE_COMPRA)
+        .annotate(**_agregados_itens('compra_item'))
+    )
+    with transaction.atomic():
+        CompraResumoMensal.objects.all().delete()
+        novos = CompraResumoMensal.objects.bulk_create(
+            (
+                CompraResumoMensal(
+                    competencia=linha['competencia'],
+                    produto_id=linha['produto_id'],
+                    fornecedor_id=linha['compra__fornecedor_id'],
+                    compra_resumo_qtd=linha['qtd'],
+                    compra_resumo_volume=linha['volume'],
+                    compra_resumo_valor=linha['valor'],
+                    compra_resumo_itens=linha['itens'],
+                )
+                for linha in linhas.iterator()
+            ),
+            batch_size=500,
+        )
+    return len(novos)
+
+
+# ============================================================================
+# DESEMPENHO DE ROMANEIOS (funcionário x veículo x mês)
+# Itens com CFOP de entrada são devoluções; os demais contam como entregues.
+# ============================================================================
+
+_CAMPOS_CHAVE_DESEMPENHO = ('competencia', 'funcionario_id', 'veiculo_id')
+
+
+def _valor_item():
+    return ExpressionWrapper(F('venda_item_qtd') * F('venda_item_preco'), output_field=DecimalField())
+
+
+def _agregados_desempenho_itens():
+    devolucao = Q(cfop__cfop_tipo=Cfop.TipoCfop.ENTRADA)
+    return {
+        'entregue': Coalesce(Sum('venda_item_qtd', filter=~devolucao), Value(ZERO)),
+        'devolvido': Coalesce(Sum('venda_item_qtd', filter=devolucao), Value(ZERO)),
+        'vendas': Coalesce(Sum(_valor_item(), filter=~devolucao), Value(ZERO)),
+        'devolucoes': Coalesce(Sum(_valor_item(), filter=devolucao), Value(ZERO)),
+    }
+
+
+def _agregados_desempenho_romaneios():
+    return {
+        'romaneios': Count('pk'),
+        'carregado': Coalesce(Sum('produto_item_qtd'), Value(0.0)),
+    }
+
+
+def chaves_desempenho_romaneio(romaneios):
+    """Chaves de RomaneioDesempenhoMensal dos romaneios (queryset de Romaneio)."""
+    return set(
+        romaneios.exclude(romaneio_data_emissao=None)
+        .annotate(competencia=TruncMonth('romaneio_data_emissao'))
+        .order_by().values_list(*_CAMPOS_CHAVE_DESEMPENHO).distinct()
+    )
+
+
+def _linha_desempenho(romaneios, itens):
+    return {
+        'desempenho_romaneios': romaneios['romaneios'],
+        'desempenho_carregado': Decimal(str(romaneios['carregado'] or 0)).quantize(ZERO),
+        'desempenho_entregue': itens['entregue'],
+        'desempenho_devolvido': itens['devolvido'],
+        'desempenho_valor_vendas': itens['vendas'],
+        'desempenho_valor_devolucoes': itens['devolucoes'],
+    }
+
+
+def recalcular_desempenho_romaneio(chaves):
+    for competencia, funcionario_id, veiculo_id in chaves:
+        romaneios = Romaneio.objects.filter(
+            romaneio_data_emissao__gte=competencia,
+            romaneio_data_emissao__lt=proximo_mes(competencia),
+            funcionario_id=funcionario_id,
+            veiculo_id=veiculo_id,
+        )
+        totais_romaneios = romaneios.aggregate(**_agregados_desempenho_romaneios())
+        chave = dict(competencia=competencia, funcionario_id=funcionario_id, veiculo_id=veiculo_id)
+        if not totais_romaneios['romaneios']:
+            RomaneioDesempenhoMensal.objects.filter(**chave).delete()
+            continue
+        totais_itens = VendaItem.objects.filter(venda__romaneio__in=romaneios).aggregate(**_agregados_desempenho_itens())
+        RomaneioDesempenhoMensal.objects.update_or_create(
+            **chave, defaults=_linha_desempenho(totais_romaneios, totais_itens),
+        )
+
+
+def recalcular_desempenhos_romaneio():
+    romaneios = (
+        Romaneio.objects.exclude(romaneio_data_emissao=None)
+        .annotate(competencia=TruncMonth('romaneio_data_emissao'))
+        .order_by()
+        .values(*_CAMPOS_CHAVE_DESEMPENHO)
+        .annotate(**_agregados_desempenho_romaneios())
+    )
+    itens = {
+        (linha['competencia'], linha['venda__romaneio__funcionario_id'], linha['venda__romaneio__veiculo_id']): linha
+        for linha in VendaItem.objects.exclude(venda__romaneio__romaneio_data_emissao=None)
+        .annotate(competencia=TruncMonth('venda__romaneio__romaneio_data_emissao'))
+        .order_by()
+        .values('competencia', 'venda__romaneio__funcionario_id', 'venda__romaneio__veiculo_id')
+        .annotate(**_agregados_desempenho_itens())
+    }
+    sem_itens = {'entregue': ZERO, 'devolvido': ZERO, 'vendas': ZERO, 'devolucoes': ZERO}
+    with transaction.atomic():
+        RomaneioDesempenhoMensal.objects.all().delete()
+        novos = RomaneioDesempenhoMensal.objects.bulk_create(
+            (
+                RomaneioDesempenhoMensal(
+                    competencia=linha['competencia'],
+                    funcionario_id=linha['funcionario_id'],
+                    veiculo_id=linha['veiculo_id'],
+                    **_linha_desempenho(
+                        linha,
+                        itens.get((linha['competencia'], linha['funcionario_id'], linha['veiculo_id']), sem_itens),
+                    ),
+                )
+                for linha in romaneios
+            ),
+            batch_size=500,
+        )
+    return len(novos)
+
+
+def desempenho_romaneios(dimensao, inicio, fim):
+    """
+    Relatório de desempenho agrupado por 'funcionario' ou 'veiculo' entre os
+    meses de `inicio` e `fim`, lido de RomaneioDesempenhoMensal.
+    """
+    rotulos = {
+        'funcionario': ('funcionario_id', 'funcionario__funcionario_nome'),
+        'veiculo': ('veiculo_id', 'veiculo__veiculo_placa', 'veiculo__veiculo_modelo'),
+    }[dimensao]
+    linhas = (
+        RomaneioDesempenhoMensal.objects.filter(
+            competencia__gte=primeiro_dia_mes(inicio), competencia__lte=primeiro_dia_mes(fim),
+        )
+        .order_by()
+        .values(*rotulos)
+        .annotate(
+            romaneios=Sum('desempenho_romaneios'),
+            carregado=Sum('desempenho_carregado'),
+            entregue=Sum('desempenho_entregue'),
+            devolvido=Sum('desempenho_devolvido'),
+            vendas=Sum('desempenho_valor_vendas'),
+            devolucoes=Sum('desempenho_valor_devolucoes'),
+        )
+        .order_by('-vendas')
+    )
+    resultado = []
+    for linha in linhas:
+        linha['nome'] = ' - '.join(str(linha[campo]) for campo in rotulos[1:])
+        linha['receita_liquida'] = linha['vendas'] - linha['devolucoes']
+        linha['receita_por_viagem'] = (
+            (linha['receita_liquida'] / linha['romaneios']).quantize(ZERO) if linha['romaneios'] else ZERO
+        )
+        linha['percentual_entregue'] = (
+            linha['entregue'] / linha['carregado'] * 100 if linha['carregado'] else None
+        )
+        resultado.append(linha)
+    return resultado
+
+
+def painel_gerencial(hoje, meses=6, limite_ranking=5):
+    """
+    Indicadores do painel da página inicial do admin, lidos apenas das
+    tabelas de resumo: faturamento e volume do mês, variação sobre o mês
+    anterior, tendência dos últimos `meses` e os maiores clientes/produtos.
+    """
+    mes_atual = primeiro_dia_mes(hoje)
+    inicio = mes_atual
+    for _ in range(meses - 1):
+        inicio = primeiro_dia_mes(inicio - timedelta(days=1))
+
+    vendas = {
+        linha['competencia']: linha
+        for linha in VendaResumoMensal.objects.filter(competencia__gte=inicio, competencia__lte=mes_atual)
+        .order_by().values('competencia')
+        .annotate(valor=Sum('venda_resumo_valor'), qtd=Sum('venda_resumo_qtd'), itens=Sum('venda_resumo_itens'))
+    }
+    compras = dict(
+        CompraResumoMensal.objects.filter(competencia__gte=inicio, competencia__lte=mes_atual)
+        .order_by().values('competencia')
+        .annotate(valor=Sum('compra_resumo_valor'))
+        .values_list('competencia', 'valor')
+    )
+
+    tendencia = []
+    anterior = None
+    competencia = inicio
+    while competencia <= mes_atual:
+        linha = vendas.get(competencia, {})
+        valor = linha.get('valor') or ZERO
+        variacao = None
+        if anterior:
+            variacao = (valor - anterior) / anterior * 100
+        tendencia.append({
+            'competencia': competencia,
+            'valor': valor,
+            'qtd': linha.get('qtd') or ZERO,
+            'compras': compras.get(competencia) or ZERO,
+            'variacao': variacao,
+        })
+        anterior = valor
+        competencia = proximo_mes(competencia)
+
+    periodo = VendaResumoMensal.objects.filter(competencia=mes_atual).order_by()
+    top_clientes = (
+        periodo.values('cliente__cliente_nome')
+        .annotate(valor=Sum('venda_resumo_valor'))
+        .order_by('-valor')[:limite_ranking]
+    )
+    top_produtos = (
+        periodo.values('produto__produto_nome')
+        .annotate(valor=Sum('venda_resumo_valor'), qtd=Sum('venda_resumo_qtd'))
+        .order_by('-valor')[:limite_ranking]
+    )
+    return {
+        'mes': tendencia[-1],
+        'tendencia': tendencia,
+        'top_clientes': list(top_clientes),
+        'top_produtos': list(top_produtos),
+    }
+
+
+# Resumos reconstruídos por `manage.py recalcular_resumos`.
+RESUMOS = {
+    'plano_conta': ('Saldos mensais do plano de contas', recalcular_resumo_plano_conta),
+    'vendas': ('Resumo mensal de vendas', recalcular_resumos_vendas),
+    'compras': ('Resumo mensal de compras', recalcular_resumos_compras),
+    'desempenho': ('Desempenho mensal de romaneios', recalcular_desempenhos_romaneio),
+    'precos_convenio': ('Preços de convênio por cliente e grupo', recalcular_todos_precos_convenio),
+}
+
+# Chaves usadas pelos sinais: (obter chaves de um queryset, recalcular chaves).
+CHAVES_RESUMO = {
+    'venda': (chaves_resumo_venda, recalcular_resumo_venda),
+    'compra': (chaves_resumo_compra, recalcular_resumo_compra),
+    'desempenho': (chaves_desempenho_romaneio, recalcular_desempenho_romaneio),
+    'preco_convenio': (chaves_preco_convenio, recalcular_precos_convenio),
+}
+
+
+# ============================================================================
+# DRE
+# ============================================================================
+
+def _dividir_periodo(inicio, fim):
+    """
+    Separa [inicio, fim] em meses completos (lidos do resumo) e pontas de
+    meses parciais (lidas direto do Caixa).
+    Retorna (primeiro_mes, ultimo_mes, pontas) — meses podem ser None.
+    """
+    pontas = []
+    primeiro_mes = inicio if inicio.day == 1 else proximo_mes(inicio)
+    ultimo_mes_excl = primeiro_dia_mes(fim) if proximo_mes(fim) - timedelta(days=1) != fim else proximo_mes(fim)
+    if primeiro_mes >= ultimo_mes_excl:
+        return None, None, [(inicio, fim)]
+    if inicio < primeiro_mes:
+        pontas.append((inicio, primeiro_mes - timedelta(days=1)))
+    if ultimo_mes_excl <= fim:
+        pontas.append((ultimo_mes_excl, fim))
+    ultimo_mes = primeiro_dia_mes(ultimo_mes_excl - timedelta(days=1))
+    return primeiro_mes, ultimo_mes, pontas
+
+
+def _soma_liquida(queryset, campo_entrada, campo_saida):
+    """SUM(entrada - saída) como subquery escalar (sem GROUP BY)."""
+    return Subquery(
+        queryset.annotate(
+            liquido=Func(F(campo_entrada) - F(campo_saida), function='SUM', output_field=DecimalField())
+        ).values('liquido')[:1],
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def _fontes(inicio, fim, empresa_id):
+    """Querysets (resumo mensal + pontas do Caixa) que compõem o período."""
+    primeiro_mes, ultimo_mes, pontas = _dividir_periodo(inicio, fim)
+    fontes = []
+    if primeiro_mes:
+        qs = PlanoContaSaldoMensal.objects.filter(competencia__gte=primeiro_mes, competencia__lte=ultimo_mes)
+        if empresa_id:
+            qs = qs.filter(empresa_id=empresa_id)
+        fontes.append((qs, 'saldo_valor_entrada', 'saldo_valor_saida'))
+    for ponta_inicio, ponta_fim in pontas:
+        qs = Caixa.objects.filter(caixa_data_emissao__gte=ponta_inicio, caixa_data_emissao__lte=ponta_fim)
+        if empresa_id:
+            qs = qs.filter(empresa_id=empresa_id)
+        fontes.append((qs, 'caixa_valor_entrada', 'caixa_valor_saida'))
+    return fontes
+
+
+def _total_intervalo(inicio, fim, empresa_id, caminho_de, caminho_ate):
+    """Total líquido de todas as contas com caminho em [caminho_de, caminho_ate)."""
+    total = ZERO
+    for qs, entrada, saida in _fontes(inicio, fim, empresa_id):
+        valor = qs.filter(
+            plano_conta__plano_conta_caminho__gte=caminho_de,
+            plano_conta__plano_conta_caminho__lt=caminho_ate,
+        ).aggregate(liquido=Sum(F(entrada) - F(saida)))['liquido']
+        total += valor or ZERO
+    return total
+
+
+def montar_dre(inicio, fim, empresa_id=None, nivel_maximo=None):
+    """
+    Monta o DRE do período: para cada seção, as contas até `nivel_maximo`
+    com o total da própria conta e de todas as descendentes.
+
+    Cada conta é totalizada por uma subquery no intervalo indexado
+    [caminho, caminho + '/') — não há percurso da árvore em Python.
+    """
+    secoes = []
+    resultado = ZERO
+    for titulo, caminho_de, caminho_ate, sinal in SECOES_DRE:
+        contas = PlanoConta.objects.filter(
+            plano_conta_caminho__gte=caminho_de,
+            plano_conta_caminho__lt=caminho_ate,
+        )
+        if nivel_maximo:
+            contas = contas.filter(plano_conta_nivel__lte=nivel_maximo)
+        valor_total = Value(ZERO)
+        for qs, entrada, saida in _fontes(inicio, fim, empresa_id):
+            subarvore = qs.filter(
+                plano_conta__plano_conta_caminho__gte=OuterRef('plano_conta_caminho'),
+                plano_conta__plano_conta_caminho__lt=Concat(OuterRef('plano_conta_caminho'), Value('/')),
+            )
+            valor_total = valor_total + Coalesce(_soma_liquida(subarvore, entrada, saida), Value(ZERO))
+        linhas = []
+        for conta in contas.annotate(liquido=valor_total).order_by('plano_conta_caminho', 'plano_conta_id'):
+            valor = (conta.liquido or ZERO) * sinal
+            if not valor:
+                continue
+            linhas.append({'conta': conta, 'nivel': conta.plano_conta_nivel, 'valor': valor})
+        total = _total_intervalo(inicio, fim, empresa_id, caminho_de, caminho_ate) * sinal + ZERO
+        resultado += total * sinal
+        secoes.append({'titulo': titulo, 'linhas': linhas, 'total': total})
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'empresa': Empresa.objects.filter(pk=empresa_id).first() if empresa_id else None,
+        'secoes': secoes,
+        'resultado': resultado,
+    }
@@ -0,0 +1,59 @@
+# core/rotulos.py
+#
+# Rótulos gravados de Compra, ContaPagar, Romaneio e Venda.
+#
+# O __str__ desses modelos junta nomes de tabelas relacionadas: um str(venda)
+# passava pelo romaneio, pela compra, pelo fornecedor, pelo funcionário e pelo
+# veículo, uma consulta cada, repetidas em cada opção de um <select>, linha de
+# changelist, histórico de lançamento e PDF. Agora o texto fica numa coluna
+# do próprio registro (RotuloGravadoMixin em core/models.py), montada no
+# save(). Quando um nome relacionado muda, `propagar` refaz em lote os
+# rótulos que o incluem, seguindo DEPENDENTES:
+#
+#   Fornecedor -> Compra, ContaPagar
+#   Compra, Funcionario, Veiculo -> Romaneio
+#   Romaneio -> Venda
+#
+# As gravações em lote não disparam sinais; os caches que dependem dos
+# modelos alterados são invalidados aqui.
+
+from .models import Compra, ContaPagar, Fornecedor, Funcionario, Romaneio, Veiculo, Venda
+from .versoes import invalidar_por_modelo
+
+DEPENDENTES = {
+    Fornecedor: ((Compra, 'fornecedor'), (ContaPagar, 'fornecedor')),
+    Compra: ((Romaneio, 'compra'),),
+    Funcionario: ((Romaneio, 'funcionario'),),
+    Veiculo: ((Romaneio, 'veiculo'),),
+    Romaneio: ((Venda, 'romaneio'),),
+}
+
+TAMANHO_LOTE = 500
+
+
+def atualizar_rotulos(queryset):
+    """Refaz o rótulo gravado das linhas de `queryset`; grava só os que mudaram e devolve os pks deles."""
+    model = queryset.model
+    campo = model.CAMPO_ROTULO
+    alterados = []
+    for obj in model.com_relacoes_rotulo(queryset).iterator(chunk_size=2000):
+        anterior = getattr(obj, campo)
+        obj.atualizar_rotulo()
+        if getattr(obj, campo) != anterior:
+            alterados.append(obj)
+    if alterados:
+        model._default_manager.bulk_update(alterados, [campo], batch_size=TAMANHO_LOTE)
+        invalidar_por_modelo(model)
+    return [obj.pk for obj in alterados]
+
+
+def propagar(model, pks):
+    """Refaz os rótulos que incluem os registros `pks` de `model`, e os que incluem esses, em cadeia."""
+    pks = list(pks)
+    for dependente, campo in DEPENDENTES.get(model, ()):
+        alterados = []
+        for inicio in range(0, len(pks), TAMANHO_LOTE):
+            lote = pks[inicio:inicio + TAMANHO_LOTE]
+            alterados += atualizar_rotulos(dependente._default_manager.filter(**{f'{campo}__in': lote}))
+        if alterados:
+            propagar(dependente, alterados)
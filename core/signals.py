@@ -1,15 +1,32 @@
 # core/signals.py
 
+import logging
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import timedelta
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, pre_migrate, post_migrate
 from django.dispatch import receiver
-from .models import Compra, CompraItem, ContaPagar, Venda, VendaItem, ContasReceber, PlanoConta, Caixa
+from .models import (
+    Compra, CompraItem, ContaPagar, Venda, VendaItem, ContasReceber, PlanoConta, Caixa, Produto, Romaneio,
+    ClienteConvenioGrupoMercadoria, Convenio, ConvenioGrupoMercadoria, Empresa, Cfop,
+    Fornecedor, Funcionario, Veiculo,
+)
+from .precos import VERSAO_PRECOS
+from . import busca, referencias, rotulos
+from .versoes import incrementar_versao, invalidar_por_modelo
+from . import resumos
+from .metricas import medir_lancamento
+from .rastreamento import rastrear_sinal
+
+# Trilha dos lançamentos automáticos. Em DEBUG registra cada item processado;
+# com o nível padrão (WARNING) nenhuma mensagem de depuração é formatada e
+# nenhum objeto relacionado é buscado só para compor o log.
+logger = logging.getLogger(__name__)
 
 # -----------------------------------------------------------------------------
 # LÓGICA CENTRALIZADA
 # Esta função auxiliar contém toda a lógica para evitar repetição de código.
 # -----------------------------------------------------------------------------
+@medir_lancamento('Compra')
 def _atualizar_conta_para_compra(compra_instance):
     """
     Função auxiliar que recebe uma instância de Compra e cria/atualiza/deleta
@@ -22,12 +39,14 @@ def _atualizar_conta_para_compra(compra_instance):
         contas_existentes.delete()
         return
 
-    plano_conta_utilizada = compra_instance.plano_conta
+    plano_conta_utilizada = referencias.obter(PlanoConta, compra_instance.plano_conta_id)
     if plano_conta_utilizada is None:
-        try:
-            plano_conta_utilizada = PlanoConta.objects.get(pk=1)
-        except PlanoConta.DoesNotExist:
-            print(f"AVISO: Plano de Contas padrão (ID=1) não encontrado. Compra ID {compra_instance.pk} não gerou contas a pagar.")
+        plano_conta_utilizada = referencias.obter(PlanoConta, 1)
+        if plano_conta_utilizada is None:
+            logger.warning(
+                "Plano de Contas padrão (ID=1) não encontrado. Compra ID %s não gerou contas a pagar.",
+                compra_instance.pk, extra={'compra_id': compra_instance.pk},
+            )
             return
 
     data_base = compra_instance.compra_data_base or compra_instance.compra_data_entrada
@@ -93,9 +112,15 @@ def _atualizar_preco_custo_produto(compra_item_instance):
             produto.produto_preco_custo = preco_compra
             produto.save(update_fields=['produto_preco_custo'])
             
-            print(f"✅ Preço de custo do produto '{produto.produto_nome}' atualizado para R$ {preco_compra}")
-    except Exception as e:
-        print(f"⚠️ Erro ao atualizar preço de custo do produto: {e}")
+            logger.debug(
+                "Preço de custo do produto '%s' atualizado para R$ %s", produto.produto_nome, preco_compra,
+                extra={'produto_id': produto.pk},
+            )
+    except Exception:
+        logger.exception(
+            "Erro ao atualizar preço de custo do produto (CompraItem ID %s)", compra_item_instance.pk,
+            extra={'compra_item_id': compra_item_instance.pk},
+        )
 
 
 # -----------------------------------------------------------------------------
@@ -104,12 +129,14 @@ def _atualizar_preco_custo_produto(compra_item_instance):
 # -----------------------------------------------------------------------------
 
 @receiver(post_save, sender=Compra)
+@rastrear_sinal
 def atualizar_conta_apos_salvar_compra(sender, instance, **kwargs):
     """Sinal para quando a Compra principal é salva."""
     _atualizar_conta_para_compra(instance)
 
 
 @receiver(post_save, sender=CompraItem)
+@rastrear_sinal
 def atualizar_conta_apos_salvar_item(sender, instance, **kwargs):
     """NOVO SINAL: para quando um CompraItem é criado ou atualizado."""
     if instance.compra:
@@ -120,6 +147,7 @@ def atualizar_conta_apos_salvar_item(sender, instance, **kwargs):
 
 
 @receiver(post_delete, sender=CompraItem)
+@rastrear_sinal
 def atualizar_conta_apos_deletar_item(sender, instance, **kwargs):
     """NOVO SINAL: para quando um CompraItem é deletado."""
     # Verificar se a compra ainda existe (não foi deletada em cascata)
@@ -136,6 +164,7 @@ def atualizar_conta_apos_deletar_item(sender, instance, **kwargs):
 # LÓGICA PARA VENDA -> CONTAS A RECEBER
 # Similar à lógica de Compra -> Contas a Pagar
 # -----------------------------------------------------------------------------
+@medir_lancamento('Venda')
 def _atualizar_conta_receber_para_venda(venda_instance):
     """
     Função auxiliar que recebe uma instância de Venda e cria/atualiza/deleta
@@ -145,24 +174,22 @@ def _atualizar_conta_receber_para_venda(venda_instance):
     nos itens da venda que tenham CFOP com "receber" na integração.
     """
     from django.db.models import Sum, F, DecimalField, ExpressionWrapper
-    from .models import Empresa
-    
     contas_existentes = ContasReceber.objects.filter(venda=venda_instance)
 
     # Buscar empresa através do romaneio->compra, ou usar a primeira empresa cadastrada
     empresa = None
     if venda_instance.romaneio and venda_instance.romaneio.compra:
-        empresa = venda_instance.romaneio.compra.empresa
+        empresa = referencias.obter(Empresa, venda_instance.romaneio.compra.empresa_id)
     
     # Se não encontrou empresa através do romaneio, tenta buscar a primeira empresa cadastrada
     if not empresa:
-        try:
-            empresa = Empresa.objects.first()
-        except:
-            pass
+        empresa = referencias.primeiro(Empresa)
     
     if not empresa:
-        print(f"AVISO: Nenhuma empresa encontrada para a Venda ID {venda_instance.pk}. Contas a receber não foram geradas.")
+        logger.warning(
+            "Nenhuma empresa encontrada para a Venda ID %s. Contas a receber não foram geradas.",
+            venda_instance.pk, extra={'venda_id': venda_instance.pk},
+        )
         contas_existentes.delete()
         return
 
@@ -174,28 +201,35 @@ def _atualizar_conta_receber_para_venda(venda_instance):
     # Buscar plano de contas padrão para fallback
     plano_conta_padrao = None
     if venda_instance.romaneio and venda_instance.romaneio.compra:
-        plano_conta_padrao = venda_instance.romaneio.compra.plano_conta
+        plano_conta_padrao = referencias.obter(PlanoConta, venda_instance.romaneio.compra.plano_conta_id)
     if plano_conta_padrao is None:
-        try:
-            plano_conta_padrao = PlanoConta.objects.get(pk=1)
-        except PlanoConta.DoesNotExist:
-            print(f"AVISO: Plano de Contas padrão (ID=1) não encontrado.")
-            plano_conta_padrao = None
+        plano_conta_padrao = referencias.obter(PlanoConta, 1)
+        if plano_conta_padrao is None:
+            logger.warning("Plano de Contas padrão (ID=1) não encontrado.", extra={'venda_id': venda_instance.pk})
 
     # Buscar todos os itens da venda com CFOP de "receber"
     itens_receber = venda_instance.vendaitem_set.filter(
-        cfop__cfop_integracao__icontains="receber"
+        cfop__cfop_gera_receber=True
     ).select_related('cliente', 'plano_conta', 'cfop')
 
-    print(f"DEBUG: Venda ID {venda_instance.pk} - Total de itens: {venda_instance.vendaitem_set.count()}")
-    print(f"DEBUG: Venda ID {venda_instance.pk} - Itens com CFOP 'receber': {itens_receber.count()}")
-    
-    if itens_receber.exists():
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Venda ID %s - Total de itens: %s - Itens com CFOP 'receber': %s",
+            venda_instance.pk, venda_instance.vendaitem_set.count(), itens_receber.count(),
+            extra={'venda_id': venda_instance.pk},
+        )
         for item in itens_receber:
-            print(f"DEBUG: Item - Cliente: {item.cliente}, CFOP: {item.cfop.cfop_codigo}, Integração: {item.cfop.cfop_integracao}")
+            logger.debug(
+                "Item - Cliente: %s, CFOP: %s, Integração: %s",
+                item.cliente, item.cfop.cfop_codigo, item.cfop.cfop_integracao,
+                extra={'venda_id': venda_instance.pk, 'venda_item_id': item.pk},
+            )
 
     if not itens_receber.exists():
-        print(f"AVISO: Venda ID {venda_instance.pk} não possui itens com CFOP de 'receber'. Contas a receber não foram geradas.")
+        logger.info(
+            "Venda ID %s não possui itens com CFOP de 'receber'. Contas a receber não foram geradas.",
+            venda_instance.pk, extra={'venda_id': venda_instance.pk},
+        )
         contas_existentes.delete()
         return
 
@@ -215,17 +249,15 @@ def _atualizar_conta_receber_para_venda(venda_instance):
     quantize_unit = Decimal('0.01')
     numero_venda = f"V{venda_instance.venda_id}"
     
-    print(f"DEBUG: Venda ID {venda_instance.pk} - Criando {itens_receber.count()} contas a receber (uma por item)...")
-    
     for idx, item in enumerate(itens_receber, start=1):
         if not item.cliente:
-            print(f"DEBUG: Item {idx} - Sem cliente, pulando...")
+            logger.debug("Item %s - Sem cliente, pulando...", idx, extra={'venda_item_id': item.pk})
             continue
             
         # Usar plano_conta do item, ou padrão
         plano = item.plano_conta or plano_conta_padrao
         if not plano:
-            print(f"DEBUG: Item {idx} - Sem plano de contas, pulando...")
+            logger.debug("Item %s - Sem plano de contas, pulando...", idx, extra={'venda_item_id': item.pk})
             continue
         
         # Calcular valor do item
@@ -234,7 +266,10 @@ def _atualizar_conta_receber_para_venda(venda_instance):
         valor_item = (qtd * preco).quantize(quantize_unit, rounding=ROUND_HALF_UP)
         
         if valor_item <= 0:
-            print(f"DEBUG: Item {idx} (ID {item.pk}) - Valor zero ou negativo ({valor_item}), pulando...")
+            logger.debug(
+                "Item %s (ID %s) - Valor zero ou negativo (%s), pulando...", idx, item.pk, valor_item,
+                extra={'venda_item_id': item.pk},
+            )
             continue
         
         # Criar histórico detalhado com informações do item
@@ -258,7 +293,11 @@ def _atualizar_conta_receber_para_venda(venda_instance):
             contas_receber_data_vencimento=data_venc,
             contas_receber_valor=valor_item,
         )
-        print(f"DEBUG: Conta a Receber criada - ID: {conta_receber.pk}, Item ID {item.pk}, Cliente: {item.cliente.cliente_nome}, Produto: {produto_nome}, Valor: R$ {valor_item}")
+        logger.debug(
+            "Conta a Receber criada - ID: %s, Item ID %s, Cliente: %s, Produto: %s, Valor: R$ %s",
+            conta_receber.pk, item.pk, item.cliente.cliente_nome, produto_nome, valor_item,
+            extra={'venda_id': venda_instance.pk, 'venda_item_id': item.pk, 'contas_receber_id': conta_receber.pk},
+        )
 
 
 # -----------------------------------------------------------------------------
@@ -266,26 +305,32 @@ def _atualizar_conta_receber_para_venda(venda_instance):
 # -----------------------------------------------------------------------------
 
 @receiver(post_save, sender=Venda)
+@rastrear_sinal
 def atualizar_conta_receber_apos_salvar_venda(sender, instance, **kwargs):
     """Sinal para quando a Venda principal é salva."""
-    print(f"========== SIGNAL: Venda ID {instance.pk} foi salva ==========")
+    logger.debug("Venda ID %s foi salva", instance.pk, extra={'venda_id': instance.pk})
     _atualizar_conta_receber_para_venda(instance)
 
 
 @receiver(post_save, sender=VendaItem)
+@rastrear_sinal
 def atualizar_conta_receber_apos_salvar_item(sender, instance, **kwargs):
     """Sinal para quando um VendaItem é criado ou atualizado."""
-    print(f"========== SIGNAL: VendaItem ID {instance.pk} foi salvo (Venda: {instance.venda_id}) ==========")
+    logger.debug(
+        "VendaItem ID %s foi salvo (Venda: %s)", instance.pk, instance.venda_id,
+        extra={'venda_id': instance.venda_id, 'venda_item_id': instance.pk},
+    )
     if instance.venda:
         # VendaItem vinculado a uma Venda - processa via Venda
         _atualizar_conta_receber_para_venda(instance.venda)
     else:
         # VendaItem standalone - processa diretamente
-        print(f"DEBUG: VendaItem ID {instance.pk} é STANDALONE (sem venda)")
+        logger.debug("VendaItem ID %s é STANDALONE (sem venda)", instance.pk, extra={'venda_item_id': instance.pk})
         _processar_vendaitem_standalone(instance)
 
 
 @receiver(post_delete, sender=VendaItem)
+@rastrear_sinal
 def atualizar_conta_receber_apos_deletar_item(sender, instance, **kwargs):
     """Sinal para quando um VendaItem é deletado."""
     # Verificar se a venda ainda existe (não foi deletada em cascata)
@@ -302,6 +347,7 @@ def atualizar_conta_receber_apos_deletar_item(sender, instance, **kwargs):
 # LÓGICA PARA VENDA -> LANÇAMENTO NO CAIXA
 # Quando CFOP tem integração com "caixa"
 # -----------------------------------------------------------------------------
+@medir_lancamento('Venda')
 def _atualizar_lancamento_caixa_para_venda(venda_instance):
     """
     Função auxiliar que recebe uma instância de Venda e cria/atualiza/deleta
@@ -311,7 +357,6 @@ def _atualizar_lancamento_caixa_para_venda(venda_instance):
     nos itens da venda que tenham CFOP com "caixa" na integração.
     """
     from django.db.models import Sum, F, DecimalField, ExpressionWrapper
-    from .models import Empresa
     
     # Buscar lançamentos existentes vinculados a esta venda
     # Vamos usar o histórico como identificador (contém "venda ID X")
@@ -322,51 +367,61 @@ def _atualizar_lancamento_caixa_para_venda(venda_instance):
     # Buscar empresa através do romaneio->compra, ou usar a primeira empresa cadastrada
     empresa = None
     if venda_instance.romaneio and venda_instance.romaneio.compra:
-        empresa = venda_instance.romaneio.compra.empresa
+        empresa = referencias.obter(Empresa, venda_instance.romaneio.compra.empresa_id)
     
     if not empresa:
-        try:
-            empresa = Empresa.objects.first()
-        except:
-            pass
+        empresa = referencias.primeiro(Empresa)
     
     if not empresa:
-        print(f"AVISO: Nenhuma empresa encontrada para a Venda ID {venda_instance.pk}. Lançamentos no caixa não foram gerados.")
+        logger.warning(
+            "Nenhuma empresa encontrada para a Venda ID %s. Lançamentos no caixa não foram gerados.",
+            venda_instance.pk, extra={'venda_id': venda_instance.pk},
+        )
         lancamentos_existentes.delete()
         return
 
     data_emissao = venda_instance.venda_data_emissao
     if not data_emissao:
-        print(f"AVISO: Venda ID {venda_instance.pk} sem data de emissão. Lançamentos no caixa não foram gerados.")
+        logger.warning(
+            "Venda ID %s sem data de emissão. Lançamentos no caixa não foram gerados.",
+            venda_instance.pk, extra={'venda_id': venda_instance.pk},
+        )
         lancamentos_existentes.delete()
         return
 
     # Buscar plano de contas padrão para fallback
-    plano_conta_padrao = venda_instance.plano_conta
+    plano_conta_padrao = referencias.obter(PlanoConta, venda_instance.plano_conta_id)
     if plano_conta_padrao is None:
         if venda_instance.romaneio and venda_instance.romaneio.compra:
-            plano_conta_padrao = venda_instance.romaneio.compra.plano_conta
+            plano_conta_padrao = referencias.obter(PlanoConta, venda_instance.romaneio.compra.plano_conta_id)
     if plano_conta_padrao is None:
-        try:
-            plano_conta_padrao = PlanoConta.objects.get(pk=1)
-        except PlanoConta.DoesNotExist:
-            print(f"AVISO: Plano de Contas padrão não encontrado.")
-            plano_conta_padrao = None
+        plano_conta_padrao = referencias.obter(PlanoConta, 1)
+        if plano_conta_padrao is None:
+            logger.warning("Plano de Contas padrão não encontrado.", extra={'venda_id': venda_instance.pk})
 
     # Buscar todos os itens da venda com CFOP de "caixa"
     itens_caixa = venda_instance.vendaitem_set.filter(
-        cfop__cfop_integracao__icontains="caixa"
+        cfop__cfop_gera_caixa=True
     ).select_related('cliente', 'plano_conta', 'cfop')
 
-    print(f"DEBUG CAIXA: Venda ID {venda_instance.pk} - Total de itens: {venda_instance.vendaitem_set.count()}")
-    print(f"DEBUG CAIXA: Venda ID {venda_instance.pk} - Itens com CFOP 'caixa': {itens_caixa.count()}")
-    
-    if itens_caixa.exists():
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Caixa: Venda ID %s - Total de itens: %s - Itens com CFOP 'caixa': %s",
+            venda_instance.pk, venda_instance.vendaitem_set.count(), itens_caixa.count(),
+            extra={'venda_id': venda_instance.pk},
+        )
         for item in itens_caixa:
-            print(f"DEBUG CAIXA: Item - Cliente: {item.cliente}, CFOP: {item.cfop.cfop_codigo}, Integração: {item.cfop.cfop_integracao}")
+            logger.debug(
+                "Caixa: Item - Cliente: %s, CFOP: %s, Integração: %s",
+                item.cliente, item.cfop.cfop_codigo, item.cfop.cfop_integracao,
+                extra={'venda_id': venda_instance.pk, 'venda_item_id': item.pk},
+            )
 
     if not itens_caixa.exists():
-        print(f"AVISO: Venda ID {venda_instance.pk} não possui itens com CFOP de 'caixa'. Lançamentos no caixa não foram gerados.")
+        logger.info(
+            "Venda ID %s não possui itens com CFOP de 'caixa'. Lançamentos no caixa não foram gerados.",
+            venda_instance.pk, extra={'venda_id': venda_instance.pk},
+        )
         lancamentos_existentes.delete()
         return
 
@@ -376,17 +431,15 @@ def _atualizar_lancamento_caixa_para_venda(venda_instance):
     # Criar um lançamento de caixa (ENTRADA) para CADA ITEM (SEM AGRUPAR)
     quantize_unit = Decimal('0.01')
     
-    print(f"DEBUG CAIXA: Venda ID {venda_instance.pk} - Criando {itens_caixa.count()} lançamentos no caixa (um por item)...")
-    
     for idx, item in enumerate(itens_caixa, start=1):
         if not item.cliente:
-            print(f"DEBUG CAIXA: Item {idx} - Sem cliente, pulando...")
+            logger.debug("Caixa: Item %s - Sem cliente, pulando...", idx, extra={'venda_item_id': item.pk})
             continue
             
         # Usar plano_conta do item, ou padrão
         plano = item.plano_conta or plano_conta_padrao
         if not plano:
-            print(f"DEBUG CAIXA: Item {idx} - Sem plano de contas, pulando...")
+            logger.debug("Caixa: Item %s - Sem plano de contas, pulando...", idx, extra={'venda_item_id': item.pk})
             continue
         
         # Calcular valor do item
@@ -395,7 +448,10 @@ def _atualizar_lancamento_caixa_para_venda(venda_instance):
         valor_item = (qtd * preco).quantize(quantize_unit, rounding=ROUND_HALF_UP)
         
         if valor_item <= 0:
-            print(f"DEBUG CAIXA: Item {idx} (ID {item.pk}) - Valor zero ou negativo ({valor_item}), pulando...")
+            logger.debug(
+                "Caixa: Item %s (ID %s) - Valor zero ou negativo (%s), pulando...", idx, item.pk, valor_item,
+                extra={'venda_item_id': item.pk},
+            )
             continue
         
         # Criar histórico detalhado com informações do item
@@ -415,13 +471,18 @@ def _atualizar_lancamento_caixa_para_venda(venda_instance):
             caixa_valor_entrada=valor_item,  # ENTRADA no caixa (venda = dinheiro entrando)
             caixa_valor_saida=Decimal('0.00'),
         )
-        print(f"DEBUG CAIXA: Lançamento criado - ID: {lancamento_caixa.pk}, Item ID {item.pk}, Cliente: {item.cliente.cliente_nome}, Produto: {produto_nome}, Entrada: R$ {valor_item}")
+        logger.debug(
+            "Caixa: Lançamento criado - ID: %s, Item ID %s, Cliente: %s, Produto: %s, Entrada: R$ %s",
+            lancamento_caixa.pk, item.pk, item.cliente.cliente_nome, produto_nome, valor_item,
+            extra={'venda_id': venda_instance.pk, 'venda_item_id': item.pk, 'caixa_id': lancamento_caixa.pk},
+        )
 
 
 # -----------------------------------------------------------------------------
 # LÓGICA PARA VENDAITEM STANDALONE (sem Venda)
 # Processa VendaItems criados diretamente, sem venda associada
 # -----------------------------------------------------------------------------
+@medir_lancamento('Venda')
 def _processar_vendaitem_standalone(vendaitem_instance):
     """
     Função auxiliar que processa um VendaItem standalone (sem venda vinculada).
@@ -430,44 +491,39 @@ def _processar_vendaitem_standalone(vendaitem_instance):
     - "caixa" → Cria lançamento no Caixa (entrada)
     - "receber" → Cria Conta a Receber
     """
-    from .models import Empresa
     from django.utils import timezone
     
-    print(f"DEBUG STANDALONE: Processando VendaItem ID {vendaitem_instance.pk}")
+    extra = {'venda_item_id': vendaitem_instance.pk}
+    logger.debug("Standalone: Processando VendaItem ID %s", vendaitem_instance.pk, extra=extra)
     
     # Verificar se tem CFOP
-    if not vendaitem_instance.cfop:
-        print(f"AVISO: VendaItem ID {vendaitem_instance.pk} sem CFOP. Não foi processado.")
+    cfop = referencias.obter(Cfop, vendaitem_instance.cfop_id)
+    if not cfop:
+        logger.warning("VendaItem ID %s sem CFOP. Não foi processado.", vendaitem_instance.pk, extra=extra)
         return
     
-    cfop_integracao = vendaitem_instance.cfop.cfop_integracao or ''
-    print(f"DEBUG STANDALONE: CFOP {vendaitem_instance.cfop.cfop_codigo} - Integração: '{cfop_integracao}'")
+    logger.debug(
+        "Standalone: CFOP %s - Integração: '%s'", cfop.cfop_codigo, cfop.cfop_integracao or '', extra=extra
+    )
     
     # Buscar empresa padrão
-    empresa = None
-    try:
-        empresa = Empresa.objects.first()
-    except:
-        pass
+    empresa = referencias.primeiro(Empresa)
     
     if not empresa:
-        print(f"AVISO: Nenhuma empresa encontrada para VendaItem ID {vendaitem_instance.pk}.")
+        logger.warning("Nenhuma empresa encontrada para VendaItem ID %s.", vendaitem_instance.pk, extra=extra)
         return
     
     # Verificar cliente e plano_conta
     if not vendaitem_instance.cliente:
-        print(f"AVISO: VendaItem ID {vendaitem_instance.pk} sem cliente.")
+        logger.warning("VendaItem ID %s sem cliente.", vendaitem_instance.pk, extra=extra)
         return
     
-    plano_conta = vendaitem_instance.plano_conta
+    plano_conta = referencias.obter(PlanoConta, vendaitem_instance.plano_conta_id)
     if not plano_conta:
-        try:
-            plano_conta = PlanoConta.objects.first()
-        except:
-            pass
+        plano_conta = referencias.primeiro(PlanoConta)
     
     if not plano_conta:
-        print(f"AVISO: VendaItem ID {vendaitem_instance.pk} sem plano de contas.")
+        logger.warning("VendaItem ID %s sem plano de contas.", vendaitem_instance.pk, extra=extra)
         return
     
     # Calcular valor do item
@@ -476,16 +532,16 @@ def _processar_vendaitem_standalone(vendaitem_instance):
     valor_total = (qtd * preco).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     if valor_total <= 0:
-        print(f"AVISO: VendaItem ID {vendaitem_instance.pk} com valor zero ou negativo.")
+        logger.warning("VendaItem ID %s com valor zero ou negativo.", vendaitem_instance.pk, extra=extra)
         return
     
     data_emissao = timezone.now().date()
     cliente = vendaitem_instance.cliente
     
     # Processar baseado na integração do CFOP
-    if 'caixa' in cfop_integracao.lower():
+    if cfop.cfop_gera_caixa:
         # Criar lançamento no CAIXA
-        print(f"DEBUG STANDALONE: Criando lançamento no CAIXA para VendaItem ID {vendaitem_instance.pk}")
+        logger.debug("Standalone: Criando lançamento no CAIXA para VendaItem ID %s", vendaitem_instance.pk, extra=extra)
         
         # Deletar lançamentos anteriores deste item
         Caixa.objects.filter(
@@ -502,11 +558,14 @@ def _processar_vendaitem_standalone(vendaitem_instance):
             caixa_valor_entrada=valor_total,
             caixa_valor_saida=Decimal('0.00'),
         )
-        print(f"DEBUG STANDALONE: Lançamento no CAIXA criado - ID: {lancamento.pk}, Valor: R$ {valor_total}")
+        logger.debug(
+            "Standalone: Lançamento no CAIXA criado - ID: %s, Valor: R$ %s", lancamento.pk, valor_total,
+            extra={**extra, 'caixa_id': lancamento.pk},
+        )
         
-    elif 'receber' in cfop_integracao.lower():
+    elif cfop.cfop_gera_receber:
         # Criar Conta a RECEBER
-        print(f"DEBUG STANDALONE: Criando CONTA A RECEBER para VendaItem ID {vendaitem_instance.pk}")
+        logger.debug("Standalone: Criando CONTA A RECEBER para VendaItem ID %s", vendaitem_instance.pk, extra=extra)
         
         # Deletar contas anteriores deste item
         ContasReceber.objects.filter(
@@ -530,10 +589,13 @@ def _processar_vendaitem_standalone(vendaitem_instance):
             contas_receber_data_vencimento=data_vencimento,
             contas_receber_valor=valor_total,
         )
-        print(f"DEBUG STANDALONE: Conta a Receber criada - ID: {conta.pk}, Valor: R$ {valor_total}, Vencimento: {data_vencimento}")
+        logger.debug(
+            "Standalone: Conta a Receber criada - ID: %s, Valor: R$ %s, Vencimento: %s",
+            conta.pk, valor_total, data_vencimento, extra={**extra, 'contas_receber_id': conta.pk},
+        )
     
     else:
-        print(f"DEBUG STANDALONE: CFOP sem integração 'caixa' ou 'receber'. Nenhum lançamento criado.")
+        logger.debug("Standalone: CFOP sem integração 'caixa' ou 'receber'. Nenhum lançamento criado.", extra=extra)
 
 
 # -----------------------------------------------------------------------------
@@ -541,16 +603,21 @@ def _processar_vendaitem_standalone(vendaitem_instance):
 # -----------------------------------------------------------------------------
 
 @receiver(post_save, sender=Venda)
+@rastrear_sinal
 def atualizar_caixa_apos_salvar_venda(sender, instance, **kwargs):
     """Sinal para quando a Venda principal é salva - gera lançamento no caixa se necessário."""
-    print(f"========== SIGNAL CAIXA: Venda ID {instance.pk} foi salva ==========")
+    logger.debug("Caixa: Venda ID %s foi salva", instance.pk, extra={'venda_id': instance.pk})
     _atualizar_lancamento_caixa_para_venda(instance)
 
 
 @receiver(post_save, sender=VendaItem)
+@rastrear_sinal
 def atualizar_caixa_apos_salvar_item(sender, instance, **kwargs):
     """Sinal para quando um VendaItem é criado ou atualizado - atualiza caixa."""
-    print(f"========== SIGNAL CAIXA: VendaItem ID {instance.pk} foi salvo (Venda: {instance.venda_id}) ==========")
+    logger.debug(
+        "Caixa: VendaItem ID %s foi salvo (Venda: %s)", instance.pk, instance.venda_id,
+        extra={'venda_id': instance.venda_id, 'venda_item_id': instance.pk},
+    )
     if instance.venda:
         # VendaItem vinculado a uma Venda - processa via Venda
         _atualizar_lancamento_caixa_para_venda(instance.venda)
@@ -561,6 +628,7 @@ def atualizar_caixa_apos_salvar_item(sender, instance, **kwargs):
 
 
 @receiver(post_delete, sender=VendaItem)
+@rastrear_sinal
 def atualizar_caixa_apos_deletar_item(sender, instance, **kwargs):
     """Sinal para quando um VendaItem é deletado - atualiza caixa."""
     if instance.venda_id:
@@ -571,6 +639,375 @@ def atualizar_caixa_apos_deletar_item(sender, instance, **kwargs):
             pass
     else:
         # VendaItem standalone foi deletado - deletar lançamentos associados
-        print(f"DEBUG STANDALONE DELETE: Deletando lançamentos do VendaItem ID {instance.pk}")
+        logger.debug("Standalone: Deletando lançamentos do VendaItem ID %s", instance.pk, extra={'venda_item_id': instance.pk})
         Caixa.objects.filter(caixa_historico__icontains=f"VendaItem ID {instance.pk}").delete()
-        ContasReceber.objects.filter(contas_receber_historico__icontains=f"VendaItem ID {instance.pk}").delete()
\ No newline at end of file
+        ContasReceber.objects.filter(contas_receber_historico__icontains=f"VendaItem ID {instance.pk}").delete()
+
+# =============================================================================
+# SALDO MENSAL DO PLANO DE CONTAS
+# Mantém PlanoContaSaldoMensal em dia a cada lançamento de caixa.
+# =============================================================================
+
+@receiver(pre_save, sender=Caixa)
+@rastrear_sinal
+def guardar_chave_saldo_anterior(sender, instance, **kwargs):
+    """Guarda (conta, empresa, mês) antes da alteração, para recalcular o mês antigo."""
+    instance._chave_saldo_anterior = None
+    if instance.pk:
+        anterior = Caixa.objects.filter(pk=instance.pk).values_list(
+            'plano_conta_id', 'empresa_id', 'caixa_data_emissao'
+        ).first()
+        if anterior:
+            instance._chave_saldo_anterior = resumos.chave_saldo_caixa(*anterior)
+
+
+@receiver(post_save, sender=Caixa)
+@rastrear_sinal
+def atualizar_saldo_mensal_apos_salvar_caixa(sender, instance, **kwargs):
+    chaves = {
+        getattr(instance, '_chave_saldo_anterior', None),
+        resumos.chave_saldo_caixa(instance.plano_conta_id, instance.empresa_id, instance.caixa_data_emissao),
+    }
+    for chave in chaves - {None}:
+        resumos.recalcular_saldo_mensal(*chave)
+
+
+@receiver(post_delete, sender=Caixa)
+@rastrear_sinal
+def atualizar_saldo_mensal_apos_deletar_caixa(sender, instance, **kwargs):
+    chave = resumos.chave_saldo_caixa(instance.plano_conta_id, instance.empresa_id, instance.caixa_data_emissao)
+    if chave:
+        resumos.recalcular_saldo_mensal(*chave)
+
+
+@receiver(post_delete, sender=PlanoConta)
+@rastrear_sinal
+def reorganizar_arvore_apos_deletar_conta(sender, instance, **kwargs):
+    """As contas filhas passam a apontar para o ancestral existente mais próximo."""
+    if instance.plano_conta_caminho:
+        PlanoConta.reorganizar_subarvore(instance.plano_conta_caminho)
+
+
+# =============================================================================
+# RESUMOS MENSAIS (VENDAS, COMPRAS E DESEMPENHO DE ROMANEIOS)
+# Antes da alteração guardamos as chaves de resumo dos registros afetados;
+# depois, recalculamos as chaves antigas e as novas.
+# =============================================================================
+
+def _campos_alterados(instance, campos, update_fields=None):
+    """Indica se algum dos campos mudou em relação ao que está gravado."""
+    if not instance.pk:
+        return False
+    if update_fields is not None and not {c.removesuffix('_id') for c in campos} & set(update_fields):
+        return False
+    anterior = type(instance).objects.filter(pk=instance.pk).values(*campos).first()
+    return anterior is not None and any(anterior[c] != getattr(instance, c) for c in campos)
+
+
+def _guardar_chaves(instance, **querysets):
+    """Guarda na instância as chaves atuais de cada resumo (venda=, compra=, desempenho=)."""
+    guardadas = instance.__dict__.setdefault('_chaves_resumo', {})
+    for resumo, queryset in querysets.items():
+        obter_chaves = resumos.CHAVES_RESUMO[resumo][0]
+        guardadas[resumo] = guardadas.get(resumo, set()) | obter_chaves(queryset)
+
+
+def _recalcular_chaves_guardadas(instance, **querysets):
+    """Recalcula as chaves guardadas somadas às chaves atuais dos querysets informados."""
+    guardadas = instance.__dict__.pop('_chaves_resumo', {})
+    for resumo, anteriores in guardadas.items():
+        obter_chaves, recalcular = resumos.CHAVES_RESUMO[resumo]
+        atuais = obter_chaves(querysets[resumo]) if resumo in querysets else set()
+        recalcular(anteriores | atuais)
+
+
+def _romaneios_do_item(vendaitem_id):
+    return Romaneio.objects.filter(venda__vendaitem__pk=vendaitem_id)
+
+
+@receiver(pre_save, sender=VendaItem)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_vendaitem(sender, instance, **kwargs):
+    if instance.pk:
+        _guardar_chaves(
+            instance,
+            venda=VendaItem.objects.filter(pk=instance.pk),
+            desempenho=_romaneios_do_item(instance.pk),
+        )
+    else:
+        instance._chaves_resumo = {'venda': set(), 'desempenho': set()}
+
+
+@receiver(post_save, sender=VendaItem)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_vendaitem(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        venda=VendaItem.objects.filter(pk=instance.pk),
+        desempenho=_romaneios_do_item(instance.pk),
+    )
+
+
+@receiver(pre_delete, sender=VendaItem)
+@rastrear_sinal
+def guardar_resumo_antes_deletar_vendaitem(sender, instance, **kwargs):
+    _guardar_chaves(
+        instance,
+        venda=VendaItem.objects.filter(pk=instance.pk),
+        desempenho=_romaneios_do_item(instance.pk),
+    )
+
+
+@receiver(post_delete, sender=VendaItem)
+@rastrear_sinal
+def atualizar_resumo_apos_deletar_vendaitem(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance)
+
+
+@receiver(pre_save, sender=CompraItem)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_compraitem(sender, instance, **kwargs):
+    if instance.pk:
+        _guardar_chaves(instance, compra=CompraItem.objects.filter(pk=instance.pk))
+    else:
+        instance._chaves_resumo = {'compra': set()}
+
+
+@receiver(post_save, sender=CompraItem)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_compraitem(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance, compra=CompraItem.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=CompraItem)
+@rastrear_sinal
+def guardar_resumo_antes_deletar_compraitem(sender, instance, **kwargs):
+    _guardar_chaves(instance, compra=CompraItem.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=CompraItem)
+@rastrear_sinal
+def atualizar_resumo_apos_deletar_compraitem(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance)
+
+
+# Alterações nos cabeçalhos mudam a chave de todos os registros vinculados.
+
+@receiver(pre_save, sender=Venda)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_venda(sender, instance, update_fields=None, **kwargs):
+    if _campos_alterados(instance, ('venda_data_emissao', 'romaneio_id'), update_fields):
+        _guardar_chaves(instance, venda=VendaItem.objects.filter(venda_id=instance.pk))
+        _guardar_chaves(instance, desempenho=Romaneio.objects.filter(venda__pk=instance.pk))
+
+
+@receiver(post_save, sender=Venda)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_venda(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        venda=VendaItem.objects.filter(venda_id=instance.pk),
+        desempenho=Romaneio.objects.filter(venda__pk=instance.pk),
+    )
+
+
+@receiver(pre_save, sender=Romaneio)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_romaneio(sender, instance, update_fields=None, **kwargs):
+    if _campos_alterados(instance, ('compra_id',), update_fields):
+        _guardar_chaves(instance, venda=VendaItem.objects.filter(venda__romaneio_id=instance.pk))
+    if instance.pk:
+        _guardar_chaves(instance, desempenho=Romaneio.objects.filter(pk=instance.pk))
+    else:
+        _guardar_chaves(instance, desempenho=Romaneio.objects.none())
+
+
+@receiver(post_save, sender=Romaneio)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_romaneio(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        venda=VendaItem.objects.filter(venda__romaneio_id=instance.pk),
+        desempenho=Romaneio.objects.filter(pk=instance.pk),
+    )
+
+
+@receiver(pre_delete, sender=Romaneio)
+@rastrear_sinal
+def guardar_resumo_antes_deletar_romaneio(sender, instance, **kwargs):
+    _guardar_chaves(instance, desempenho=Romaneio.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Romaneio)
+@rastrear_sinal
+def atualizar_resumo_apos_deletar_romaneio(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance)
+
+
+@receiver(pre_save, sender=Compra)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_compra(sender, instance, update_fields=None, **kwargs):
+    if _campos_alterados(instance, ('empresa_id',), update_fields):
+        _guardar_chaves(instance, venda=VendaItem.objects.filter(venda__romaneio__compra_id=instance.pk))
+    if _campos_alterados(instance, ('compra_data_entrada', 'fornecedor_id'), update_fields):
+        _guardar_chaves(instance, compra=CompraItem.objects.filter(compra_id=instance.pk))
+
+
+@receiver(post_save, sender=Compra)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_compra(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        venda=VendaItem.objects.filter(venda__romaneio__compra_id=instance.pk),
+        compra=CompraItem.objects.filter(compra_id=instance.pk),
+    )
+
+
+@receiver(pre_save, sender=Produto)
+@rastrear_sinal
+def guardar_resumo_antes_salvar_produto(sender, instance, update_fields=None, **kwargs):
+    grupo_alterado = _campos_alterados(instance, ('grupo_mercadoria_id',), update_fields)
+    if grupo_alterado:
+        _guardar_chaves(instance, venda=VendaItem.objects.filter(produto_id=instance.pk))
+    instance._preco_alterado = grupo_alterado or _campos_alterados(instance, ('produto_preco',), update_fields)
+
+
+@receiver(post_save, sender=Produto)
+@rastrear_sinal
+def atualizar_resumo_apos_salvar_produto(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance, venda=VendaItem.objects.filter(produto_id=instance.pk))
+    # O cache de preços é indexado por produto: muda com o grupo e com o preço de venda.
+    if instance.__dict__.pop('_preco_alterado', False):
+        incrementar_versao(VERSAO_PRECOS)
+
+
+# =============================================================================
+# PREÇOS DE CONVÊNIO
+# Mantém a tabela PrecoConvenio (cliente x grupo) e invalida o cache de preços.
+# =============================================================================
+
+@receiver(pre_save, sender=ClienteConvenioGrupoMercadoria)
+@rastrear_sinal
+def guardar_preco_antes_salvar_convenio_cliente(sender, instance, **kwargs):
+    if instance.pk:
+        _guardar_chaves(instance, preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(pk=instance.pk))
+    else:
+        instance._chaves_resumo = {'preco_convenio': set()}
+
+
+@receiver(post_save, sender=ClienteConvenioGrupoMercadoria)
+@rastrear_sinal
+def atualizar_preco_apos_salvar_convenio_cliente(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance, preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(pk=instance.pk)
+    )
+
+
+@receiver(pre_delete, sender=ClienteConvenioGrupoMercadoria)
+@rastrear_sinal
+def guardar_preco_antes_deletar_convenio_cliente(sender, instance, **kwargs):
+    _guardar_chaves(instance, preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=ClienteConvenioGrupoMercadoria)
+@rastrear_sinal
+def atualizar_preco_apos_deletar_convenio_cliente(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(instance)
+
+
+@receiver(pre_save, sender=ConvenioGrupoMercadoria)
+@rastrear_sinal
+def guardar_preco_antes_salvar_convenio_grupo(sender, instance, update_fields=None, **kwargs):
+    if _campos_alterados(instance, ('convenio_id', 'grupo_mercadoria_id'), update_fields):
+        _guardar_chaves(
+            instance,
+            preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(convenio_grupo_mercadoria_id=instance.pk),
+        )
+
+
+@receiver(post_save, sender=ConvenioGrupoMercadoria)
+@rastrear_sinal
+def atualizar_preco_apos_salvar_convenio_grupo(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(convenio_grupo_mercadoria_id=instance.pk),
+    )
+
+
+@receiver(pre_save, sender=Convenio)
+@rastrear_sinal
+def guardar_preco_antes_salvar_convenio(sender, instance, update_fields=None, **kwargs):
+    if _campos_alterados(instance, ('convenio_preco',), update_fields):
+        _guardar_chaves(
+            instance,
+            preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(
+                convenio_grupo_mercadoria__convenio_id=instance.pk
+            ),
+        )
+
+
+@receiver(post_save, sender=Convenio)
+@rastrear_sinal
+def atualizar_preco_apos_salvar_convenio(sender, instance, **kwargs):
+    _recalcular_chaves_guardadas(
+        instance,
+        preco_convenio=ClienteConvenioGrupoMercadoria.objects.filter(convenio_grupo_mercadoria__convenio_id=instance.pk),
+    )
+
+
+# -----------------------------------------------------------------------------
+# RÓTULOS GRAVADOS
+# Compra, Romaneio, Venda e ContaPagar guardam o próprio __str__ (ver
+# core/rotulos.py). Ao renomear um fornecedor, funcionário ou veículo, ou ao
+# mudar o rótulo de uma compra ou de um romaneio, os rótulos que os incluem
+# são refeitos.
+# -----------------------------------------------------------------------------
+
+@receiver(post_save, sender=Fornecedor)
+@receiver(post_save, sender=Funcionario)
+@receiver(post_save, sender=Veiculo)
+@rastrear_sinal
+def atualizar_rotulos_apos_salvar_cadastro(sender, instance, created, **kwargs):
+    if not created:
+        rotulos.propagar(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Compra)
+@receiver(post_save, sender=Romaneio)
+@rastrear_sinal
+def atualizar_rotulos_apos_salvar_documento(sender, instance, created, **kwargs):
+    if not created and instance.__dict__.pop('rotulo_alterado', False):
+        rotulos.propagar(sender, [instance.pk])
+
+
+# -----------------------------------------------------------------------------
+# BUSCA TEXTUAL
+# Os triggers das tabelas FTS5 (core/busca.py) saem antes do migrate, para
+# que o Django possa recriar as tabelas referidas por eles, e voltam depois.
+# Se alguma migração foi aplicada, o texto é refeito por inteiro.
+# -----------------------------------------------------------------------------
+
+@receiver(pre_migrate)
+def remover_triggers_busca(sender, app_config, using, **kwargs):
+    if app_config.name == 'core':
+        busca.remover_triggers(using)
+
+
+@receiver(post_migrate)
+def instalar_triggers_busca(sender, app_config, using, plan=None, **kwargs):
+    if app_config.name == 'core':
+        busca.instalar(using, refazer_texto=bool(plan))
+
+
+# -----------------------------------------------------------------------------
+# CACHES DEPENDENTES DE MODELOS
+# Gravações dos modelos registrados com versoes.depender_de (contagens dos
+# changelists, índices do autocomplete) sobem as versões dos caches uma vez
+# por transação, após o commit. Recebe os sinais de todos os modelos, por
+# isso não é rastreado: para os demais o custo é uma consulta a um dict.
+# -----------------------------------------------------------------------------
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_caches_por_modelo(sender, **kwargs):
+    invalidar_por_modelo(sender)
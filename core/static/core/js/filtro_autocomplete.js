@@ -0,0 +1,17 @@
+// Filtros da lateral com autocomplete (core/autocomplete.py, FiltroAutocomplete):
+// escolher ou limpar a opção recarrega o changelist com o parâmetro do filtro.
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('.filtro-autocomplete select').on('change', function() {
+            const base = this.dataset.queryString || '?';
+            const partes = base.length > 1 ? [base.slice(1)] : [];
+            if (this.value) {
+                partes.push(encodeURIComponent(this.name) + '=' + encodeURIComponent(this.value));
+            }
+            window.location.search = partes.join('&');
+        });
+    });
+}
@@ -1,20 +1,5 @@
 ﻿django.jQuery(document).ready(function($) {
     console.log('=== JavaScript venda_item_inline.js carregado ===');
-    function getCookie(name) {
-        var cookieValue = null;
-        if (document.cookie && document.cookie !== '') {
-            var cookies = document.cookie.split(';');
-            for (var i = 0; i < cookies.length; i++) {
-                var cookie = cookies[i].trim();
-                if (cookie.substring(0, name.length + 1) === (name + '=')) {
-                    cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
-                    break;
-                }
-            }
-        }
-        return cookieValue;
-    }
-
     function parseDecimal(value) {
         if (value === null || value === undefined) {
             return null;
@@ -94,8 +79,97 @@
         updateRowTotal($(this).closest('tr'));
     });
 
+    // ------------------------------------------------------------------
+    // Preços: as linhas pedem preços ao `precos`, que junta os pedidos feitos
+    // em um intervalo curto numa única requisição a /core/precos/ e guarda as
+    // respostas na página. Chave: "cliente:produto" (cliente vazio = preço do
+    // produto, sem convênio).
+    // ------------------------------------------------------------------
+    var precos = {
+        cache: {},
+        pendentes: {},
+        timer: null,
+        atraso: 150,
+        maxPares: 200,
+
+        chave: function(clienteId, produtoId) {
+            return (clienteId || '') + ':' + produtoId;
+        },
+
+        obter: function(clienteId, produtoId) {
+            var chave = this.chave(clienteId, produtoId);
+            if (Object.prototype.hasOwnProperty.call(this.cache, chave)) {
+                return $.Deferred().resolve(this.cache[chave]).promise();
+            }
+            if (!this.pendentes[chave]) {
+                this.pendentes[chave] = $.Deferred();
+            }
+            this.agendar();
+            return this.pendentes[chave].promise();
+        },
+
+        agendar: function() {
+            var self = this;
+            clearTimeout(this.timer);
+            this.timer = setTimeout(function() { self.enviar(); }, this.atraso);
+        },
+
+        enviar: function() {
+            var lote = this.pendentes;
+            var chaves = Object.keys(lote);
+            this.pendentes = {};
+            for (var i = 0; i < chaves.length; i += this.maxPares) {
+                this.buscar(chaves.slice(i, i + this.maxPares), lote);
+            }
+        },
+
+        buscar: function(chaves, lote) {
+            var self = this;
+            $.ajax({
+                url: '/core/precos/',
+                type: 'GET',
+                data: { pares: chaves.join(',') },
+                dataType: 'json'
+            }).done(function(data) {
+                var resultado = (data && data.precos) || {};
+                chaves.forEach(function(chave) {
+                    var preco = resultado.hasOwnProperty(chave) ? resultado[chave] : null;
+                    self.cache[chave] = preco;
+                    lote[chave].resolve(preco);
+                });
+            }).fail(function(xhr, status, error) {
+                console.error('Erro ao buscar precos', status, error);
+                chaves.forEach(function(chave) {
+                    lote[chave].reject(error || status);
+                });
+            });
+        }
+    };
+
+    function aplicarPreco(precoInput, preco) {
+        var valor = Number(preco);
+        if (preco !== null && preco !== undefined && Number.isFinite(valor)) {
+            setPrecoValue(precoInput, valor.toFixed(2));
+            return true;
+        }
+        return false;
+    }
+
+    function precoAutomaticoPermitido(row, precoInput) {
+        var instanceId = row.find('input[name$="-id"]').val();
+        if (instanceId) {
+            markAutoPrice(precoInput, false);
+            updateRowTotal(row);
+            return false;
+        }
+        if (precoInput.attr('data-auto-price') === 'false' && precoInput.val()) {
+            updateRowTotal(row);
+            return false;
+        }
+        return true;
+    }
+
     $(document).on('change', '.field-produto select', function() {
-        console.log('===== EVENTO PRODUTO SELECIONADO DISPARADO =====');
         var row = $(this).closest('tr');
         var produtoSelect = row.find('.field-produto select');
         var clienteSelect = row.find('.field-cliente select');
@@ -107,85 +181,30 @@
         }
 
         var produtoId = produtoSelect.val();
-        console.log('Produto ID:', produtoId);
-
         if (!produtoId) {
             setPrecoValue(precoInput, '');
             return;
         }
 
-        var instanceId = row.find('input[name$="-id"]').val();
-        if (instanceId) {
-            markAutoPrice(precoInput, false);
-            updateRowTotal(row);
-            return;
-        }
-
-        var precoValor = precoInput.val();
-        var autoFlag = precoInput.attr('data-auto-price');
-
-        if (autoFlag === 'false' && precoValor) {
-            updateRowTotal(row);
+        if (!precoAutomaticoPermitido(row, precoInput)) {
             return;
         }
 
+        // Com cliente vale o preço do convênio; sem cliente, o preço do produto
         var clienteId = clienteSelect.val();
-
-        // Se tiver cliente, busca preço por convênio
-        if (clienteId) {
-            $.ajax({
-                url: '/core/get-preco-convenio/',
-                type: 'POST',
-                data: {
-                    cliente_id: clienteId,
-                    produto_id: produtoId,
-                    csrfmiddlewaretoken: getCookie('csrftoken')
-                }
-            }).done(function(data) {
-                if (data && data.preco !== undefined && data.preco !== null) {
-                    var preco = Number(data.preco);
-                    if (Number.isFinite(preco)) {
-                        setPrecoValue(precoInput, preco.toFixed(2));
-                    } else {
-                        alert('Erro: valor de preco invalido recebido.');
-                        setPrecoValue(precoInput, '');
-                    }
-                } else {
-                    var message = data && data.error ? data.error : 'Preco nao encontrado';
-                    alert('Erro: ' + message);
-                    setPrecoValue(precoInput, '');
-                }
-            }).fail(function(xhr, status, error) {
-                console.error('Erro ao buscar preco', status, error);
-                alert('Erro ao buscar preco: ' + error);
-                setPrecoValue(precoInput, '');
-            });
-        } else {
-            // Se não tiver cliente, busca o preço do produto
-            $.ajax({
-                url: '/core/get-preco-produto/',
-                type: 'POST',
-                data: {
-                    produto_id: produtoId,
-                    csrfmiddlewaretoken: getCookie('csrftoken')
+        precos.obter(clienteId, produtoId).done(function(preco) {
+            if (!aplicarPreco(precoInput, preco)) {
+                if (clienteId) {
+                    alert('Erro: Convenio não encontrado para este cliente e grupo');
                 }
-            }).done(function(data) {
-                console.log('Preço de venda obtido:', data);
-                if (data && data.preco !== undefined && data.preco !== null) {
-                    var preco = Number(data.preco);
-                    if (Number.isFinite(preco)) {
-                        setPrecoValue(precoInput, preco.toFixed(2));
-                    } else {
-                        setPrecoValue(precoInput, '');
-                    }
-                } else {
-                    setPrecoValue(precoInput, '');
-                }
-            }).fail(function(xhr, status, error) {
-                console.error('Erro ao buscar preco do produto', status, error);
                 setPrecoValue(precoInput, '');
-            });
-        }
+            }
+        }).fail(function(error) {
+            if (clienteId) {
+                alert('Erro ao buscar preco: ' + error);
+            }
+            setPrecoValue(precoInput, '');
+        });
     });
 
     $(document).on('change', '.field-cliente select', function() {
@@ -205,44 +224,18 @@
             return;
         }
 
-        var instanceId = row.find('input[name$="-id"]').val();
-        if (instanceId) {
-            markAutoPrice(precoInput, false);
-            updateRowTotal(row);
+        if (!precoAutomaticoPermitido(row, precoInput)) {
             return;
         }
 
-        var precoValor = precoInput.val();
-        var autoFlag = precoInput.attr('data-auto-price');
-
-        if (autoFlag === 'false' && precoValor) {
-            updateRowTotal(row);
-            return;
-        }
-
-        // Busca preço por convênio
-        $.ajax({
-            url: '/core/get-preco-convenio/',
-            type: 'POST',
-            data: {
-                cliente_id: clienteId,
-                produto_id: produtoId,
-                csrfmiddlewaretoken: getCookie('csrftoken')
-            }
-        }).done(function(data) {
-            if (data && data.preco !== undefined && data.preco !== null) {
-                var preco = Number(data.preco);
-                if (Number.isFinite(preco)) {
-                    setPrecoValue(precoInput, preco.toFixed(2));
-                }
-            }
-        }).fail(function(xhr, status, error) {
-            console.error('Erro ao buscar preco', status, error);
+        precos.obter(clienteId, produtoId).done(function(preco) {
+            aplicarPreco(precoInput, preco);
         });
     });
 
-    $(document).on('formset:added', function(event, row) {
-        initializeRow($(row));
+    // Django 4.1+ dispara formset:added como evento nativo: a linha nova é o event.target
+    $(document).on('formset:added', function(event, $row) {
+        initializeRow($row && $row.length ? $row : $(event.target));
     });
 
     $('.inline-group tr.form-row').each(function() {
@@ -0,0 +1,15 @@
+from django import template
+from django.utils import timezone
+
+from core.resumos import painel_gerencial
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/core/painel_gerencial.html', takes_context=True)
+def painel_vendas(context):
+    """Painel da página inicial do admin (somente para quem pode ver vendas)."""
+    request = context.get('request')
+    if request is None or not request.user.has_perm('core.view_venda'):
+        return {'painel': None}
+    return {'painel': painel_gerencial(timezone.localdate())}
@@ -6,4 +6,6 @@ app_name = 'core'
 urlpatterns = [
     path('get-preco-convenio/', views.get_preco_convenio, name='get_preco_convenio'),
     path('get-preco-produto/', views.get_preco_produto, name='get_preco_produto'),
+    path('precos/', views.get_precos_lote, name='get_precos_lote'),
+    path('filtro-autocomplete/', views.filtro_autocomplete, name='filtro_autocomplete'),
 ]
\ No newline at end of file
@@ -0,0 +1,162 @@
+# core/versoes.py
+#
+# Contadores de versão gravados no banco (tabela versao_cache) e um LRU em
+# memória invalidado por eles. Cada processo (worker do servidor, comando de
+# fila) guarda sua cópia em memória; quando alguém grava uma alteração,
+# `incrementar_versao` sobe o contador e os demais processos descartam a
+# cópia na próxima verificação (no máximo a cada `intervalo` segundos).
+#
+# `depender_de` associa uma versão às gravações de modelos: os sinais
+# post_save/post_delete chamam `invalidar_por_modelo`, que sobe a versão uma
+# vez por transação, depois do commit. Até o commit, o cache ignora a cópia
+# em memória nessa conexão e lê do banco sem guardar: a transação vê as
+# próprias gravações, e um rollback não deixa dados desfeitos na memória.
+# `verificar_versoes` confere vários caches numa só consulta.
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import VersaoCache
+
+_caches = []
+_versoes_por_modelo = {}
+
+
+def versao_atual(nome):
+    return VersaoCache.objects.filter(versao_cache_nome=nome).values_list('versao_cache_versao', flat=True).first() or 0
+
+
+def verificar_versoes(caches):
+    """Confere numa só consulta as versões de `caches`, como cada um faria por conta própria."""
+    versoes = dict(
+        VersaoCache.objects.filter(versao_cache_nome__in={cache.nome for cache in caches})
+        .values_list('versao_cache_nome', 'versao_cache_versao')
+    )
+    agora = time.monotonic()
+    for cache in caches:
+        cache._aplicar_versao(versoes.get(cache.nome, 0), agora)
+
+
+def incrementar_versao(nome):
+    """Sobe a versão de `nome` e descarta as cópias deste processo (agora e após o commit)."""
+    atualizados = VersaoCache.objects.filter(versao_cache_nome=nome).update(
+        versao_cache_versao=F('versao_cache_versao') + 1
+    )
+    if not atualizados:
+        VersaoCache.objects.get_or_create(versao_cache_nome=nome, defaults={'versao_cache_versao': 1})
+
+    def descartar():
+        for cache in _caches:
+            if cache.nome == nome:
+                cache.limpar()
+
+    descartar()
+    transaction.on_commit(descartar)
+
+
+def depender_de(nome, modelos):
+    """Sobe a versão `nome` quando algum dos `modelos` for gravado ou excluído."""
+    for modelo in modelos:
+        _versoes_por_modelo.setdefault(modelo, set()).add(nome)
+
+
+def _alterado_na_transacao(nome):
+    return any(getattr(funcao, 'versao_cache', None) == nome for _, funcao, _ in connection.run_on_commit)
+
+
+def invalidar_por_modelo(model):
+    """
+    Agenda para depois do commit a subida das versões que dependem de
+    `model`; cada versão é agendada uma só vez por transação.
+    """
+    nomes = _versoes_por_modelo.get(model)
+    if not nomes:
+        return
+    pendentes = {getattr(funcao, 'versao_cache', None) for _, funcao, _ in connection.run_on_commit}
+    for nome in nomes - pendentes:
+        subir = functools.partial(incrementar_versao, nome)
+        subir.versao_cache = nome
+        transaction.on_commit(subir)
+
+
+class CacheVersionado:
+    """LRU em memória associado a um contador de versão do banco."""
+
+    def __init__(self, nome, tamanho=4096, intervalo=2.0):
+        self.nome = nome
+        self.tamanho = tamanho
+        self.intervalo = intervalo
+        self._dados = OrderedDict()
+        self._versao = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+            self._versao = None
+            self._verificado_em = 0.0
+
+    def _verificar_versao(self):
+        agora = time.monotonic()
+        if agora - self._verificado_em < self.intervalo:
+            return
+        self._aplicar_versao(versao_atual(self.nome), agora)
+
+    def _aplicar_versao(self, versao, agora):
+        with self._lock:
+            if versao != self._versao:
+                self._dados.clear()
+                self._versao = versao
+            self._verificado_em = agora
+
+    def obter(self, chave, carregar):
+        """Devolve o valor em cache para `chave` ou chama `carregar()` e guarda o resultado."""
+        if _alterado_na_transacao(self.nome):
+            return carregar()
+        self._verificar_versao()
+        with self._lock:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                return self._dados[chave]
+        valor = carregar()
+        with self._lock:
+            self._dados[chave] = valor
+            if len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+        return valor
+
+    def obter_varios(self, chaves, carregar_varios):
+        """
+        Versão em lote de `obter`: `carregar_varios(faltantes)` recebe as chaves
+        ausentes do cache e devolve um dict {chave: valor} (ausentes valem None).
+        """
+        if _alterado_na_transacao(self.nome):
+            carregados = carregar_varios(list(chaves))
+            return {chave: carregados.get(chave) for chave in chaves}
+        self._verificar_versao()
+        resultado = {}
+        faltantes = []
+        with self._lock:
+            for chave in chaves:
+                if chave in self._dados:
+                    self._dados.move_to_end(chave)
+                    resultado[chave] = self._dados[chave]
+                else:
+                    faltantes.append(chave)
+        if faltantes:
+            carregados = carregar_varios(faltantes)
+            with self._lock:
+                for chave in faltantes:
+                    valor = carregados.get(chave)
+                    resultado[chave] = valor
+                    self._dados[chave] = valor
+                while len(self._dados) > self.tamanho:
+                    self._dados.popitem(last=False)
+        return resultado
@@ -1,8 +1,19 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib import admin
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.cache import patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-from .models import ClienteConvenioGrupoMercadoria, Convenio, Produto
+from django.views.decorators.http import condition, require_GET, require_POST
+from . import metricas as metricas_core
+from .autocomplete import FiltroAutocompleteJsonView
+from .models import Produto
+from .precos import preco_convenio, precos_em_lote, versao_precos
+
+MAX_PARES_PRECO = 200
 
 @csrf_exempt
 @require_POST
@@ -14,25 +25,17 @@ def get_preco_convenio(request):
         return JsonResponse({'error': 'Cliente e produto são obrigatórios'}, status=400)
     
     try:
-        # Get the produto's grupo_mercadoria
-        produto = Produto.objects.get(produto_id=produto_id)
-        grupo_mercadoria = produto.grupo_mercadoria
-        
-        # Find the ClienteConvenioGrupoMercadoria for this cliente and grupo_mercadoria
-        cliente_convenio = ClienteConvenioGrupoMercadoria.objects.filter(
-            cliente_id=cliente_id,
-            convenio_grupo_mercadoria__grupo_mercadoria=grupo_mercadoria
-        ).select_related('convenio_grupo_mercadoria__convenio').first()
-        
-        if cliente_convenio:
-            preco = cliente_convenio.convenio_grupo_mercadoria.convenio.convenio_preco
-            return JsonResponse({'preco': float(preco)})
-        else:
-            return JsonResponse({'error': 'Convenio não encontrado para este cliente e grupo'}, status=404)
-            
+        # Consulta a tabela PrecoConvenio (cliente x grupo) através do cache em memória
+        preco = preco_convenio(cliente_id, produto_id)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Cliente e produto devem ser numéricos'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+    if preco is None:
+        return JsonResponse({'error': 'Convenio não encontrado para este cliente e grupo'}, status=404)
+    return JsonResponse({'preco': float(preco)})
+
 @csrf_exempt
 @require_POST
 def get_preco_produto(request):
@@ -55,4 +58,75 @@ def get_preco_produto(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-# Create your views here.
+
+
+def _ler_pares(request):
+    """Lê `pares=cliente:produto,...` (cliente vazio ou 0 = sem cliente)."""
+    pares = []
+    for item in (request.GET.get('pares') or '').split(','):
+        if not item.strip():
+            continue
+        cliente, _, produto = item.partition(':')
+        cliente = cliente.strip()
+        pares.append((int(cliente) if cliente and cliente != '0' else None, int(produto)))
+    return pares
+
+
+def _etag_precos(request):
+    try:
+        pares = sorted(set(_ler_pares(request)), key=lambda par: (par[0] or 0, par[1]))
+    except ValueError:
+        return None
+    assinatura = hashlib.md5(repr(pares).encode()).hexdigest()[:16]
+    return f'precos-{versao_precos()}-{assinatura}'
+
+
+@require_GET
+@condition(etag_func=_etag_precos)
+def get_precos_lote(request):
+    """
+    Preços de vários itens numa única requisição:
+    GET /core/precos/?pares=12:34,12:35,:36 -> {"precos": {"12:34": 5.5, "12:35": null, ":36": 10.0}}
+    Com cliente vale o preço de convênio; sem cliente, o preço de venda do produto.
+    A resposta leva ETag (versão dos preços + pares), então o navegador recebe
+    304 enquanto nenhum preço mudar.
+    """
+    try:
+        pares = _ler_pares(request)
+    except ValueError:
+        return JsonResponse({'error': 'Pares devem estar no formato cliente:produto'}, status=400)
+    if not pares:
+        return JsonResponse({'error': 'Informe ao menos um par cliente:produto'}, status=400)
+    if len(pares) > MAX_PARES_PRECO:
+        return JsonResponse({'error': f'Máximo de {MAX_PARES_PRECO} pares por requisição'}, status=400)
+
+    precos = precos_em_lote(pares)
+    response = JsonResponse({
+        'precos': {f'{cliente or ""}:{produto}': preco for (cliente, produto), preco in precos.items()},
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _acesso_metricas_permitido(request):
+    token = getattr(settings, 'METRICAS', {}).get('TOKEN')
+    if token:
+        autorizacao = request.META.get('HTTP_AUTHORIZATION', '')
+        return hmac.compare_digest(autorizacao, f'Bearer {token}')
+    if request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1'):
+        return True
+    usuario = getattr(request, 'user', None)
+    return bool(usuario and usuario.is_active and usuario.is_staff)
+
+
+@require_GET
+def metricas(request):
+    """Métricas no formato de exposição do Prometheus (ver core/metricas.py)."""
+    if not _acesso_metricas_permitido(request):
+        return HttpResponseForbidden('Acesso negado.')
+    return HttpResponse(metricas_core.exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Autocomplete dos filtros da lateral (FiltroAutocomplete): mesma view e mesmas
+# permissões do autocomplete do admin, com a contagem de cada opção.
+filtro_autocomplete = admin.site.admin_view(FiltroAutocompleteJsonView.as_view(admin_site=admin.site))